@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import random
+import logging
+import argparse
+from typing import List, Dict
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A4 in Zoll
+PAGE_WIDTH_IN = 8.27
+PAGE_HEIGHT_IN = 11.69
+
+FONT_CANDIDATES = [
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "LiberationSans-Regular.ttf",
+    "Arial.ttf",
+]
+
+ROW_LABELS = [
+    "Umsatzerlöse", "Materialaufwand", "Personalaufwand", "Abschreibungen", "Sonstige Erträge",
+    "Zinsaufwand", "Steuern vom Einkommen", "Jahresüberschuss", "Privatentnahmen", "Rückstellungen",
+    "Forderungen", "Verbindlichkeiten", "Kassenbestand", "Eigenkapital", "Anlagevermögen",
+]
+PROSE = (
+    "Die nachfolgende Übersicht zeigt die Entwicklung der wesentlichen Positionen. "
+    "Alle Beträge sind in Euro angegeben und wurden auf zwei Nachkommastellen gerundet. "
+    "Abweichungen zum Vorjahr ergeben sich aus der geänderten Zuordnung einzelner Konten."
+)
+
+
+def load_font(size_px: int) -> ImageFont.ImageFont:
+    """Load a TrueType font in the given pixel size, falling back to Pillow's default font."""
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size_px)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size_px)
+
+
+def german_number(value: float) -> str:
+    """Format a number the German way: 1.234.567,89"""
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def random_table(rng: random.Random) -> List[List[str]]:
+    """Create the ground-truth cells of a random financial table (header row + label column)."""
+    n_years = rng.randint(2, 5)
+    n_rows = rng.randint(5, 12)
+    first_year = rng.randint(2010, 2020)
+    header = ["Position"] + [str(first_year + i) for i in range(n_years)]
+    rows = [header]
+    for label in rng.sample(ROW_LABELS, n_rows):
+        magnitude = 10 ** rng.randint(2, 6)
+        rows.append([label] + [german_number(rng.uniform(-0.2, 1.0) * magnitude) for _ in range(n_years)])
+    return rows
+
+
+def render_page(cells: List[List[str]], dpi: int, ruled: bool, font_pt: float = 10.0) -> Image.Image:
+    """Render a prose paragraph followed by the table onto a white A4 page at the given DPI."""
+    width, height = int(PAGE_WIDTH_IN * dpi), int(PAGE_HEIGHT_IN * dpi)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = load_font(max(6, int(font_pt * dpi / 72)))
+    margin = int(0.8 * dpi)
+    line_height = int(font_pt * 1.8 * dpi / 72)
+
+    # Fließtext oberhalb der Tabelle
+    y = margin
+    words = PROSE.split()
+    line = ""
+    for word in words:
+        candidate = f"{line} {word}".strip()
+        if draw.textlength(candidate, font=font) > width - 2 * margin:
+            draw.text((margin, y), line, font=font, fill=0)
+            y += line_height
+            line = word
+        else:
+            line = candidate
+    draw.text((margin, y), line, font=font, fill=0)
+    y += 2 * line_height
+
+    # Spaltenbreiten aus dem breitesten Zelleninhalt
+    padding = int(0.08 * dpi)
+    n_cols = len(cells[0])
+    col_widths = [max(draw.textlength(row[c], font=font) for row in cells) + 2 * padding for c in range(n_cols)]
+    x_positions = [margin]
+    for col_width in col_widths:
+        x_positions.append(x_positions[-1] + int(col_width) + (0 if ruled else int(0.15 * dpi)))
+
+    top = y
+    for row in cells:
+        for c, text in enumerate(row):
+            text_width = draw.textlength(text, font=font)
+            if c == 0:
+                x = x_positions[c] + padding
+            else:
+                # Zahlen rechtsbündig
+                x = x_positions[c + 1] - padding - text_width - (0 if ruled else int(0.15 * dpi))
+            draw.text((x, y + padding // 2), text, font=font, fill=0)
+        y += line_height
+
+    if ruled:
+        line_width = max(1, dpi // 150)
+        for r in range(len(cells) + 1):
+            row_y = top + r * line_height
+            draw.line([(x_positions[0], row_y), (x_positions[-1], row_y)], fill=0, width=line_width)
+        for x in x_positions:
+            draw.line([(x, top), (x, top + len(cells) * line_height)], fill=0, width=line_width)
+
+    return page
+
+
+def degrade(page: Image.Image, rng: random.Random, skew_deg: float, noise: float) -> Image.Image:
+    """Make a clean rendering look scanned: rotation, slight blur, Gaussian and salt-and-pepper noise."""
+    if skew_deg:
+        page = page.rotate(skew_deg, resample=Image.BICUBIC, expand=False, fillcolor=255)
+    if noise <= 0:
+        return page
+    page = page.filter(ImageFilter.GaussianBlur(radius=0.6))
+    arr = np.asarray(page, dtype=np.float32)
+    np_rng = np.random.default_rng(rng.getrandbits(32))
+    arr += np_rng.normal(0, 255 * noise, arr.shape)
+    speckles = np_rng.random(arr.shape)
+    arr[speckles < noise / 20] = 0
+    arr[speckles > 1 - noise / 20] = 255
+    return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+
+
+def generate_corpus(output_dir: str, count: int, dpis: List[int], seed: int = 0) -> List[Dict]:
+    """
+    Generate scanned-looking single-page table PDFs with known ground truth.
+
+    Args:
+    output_dir (str): Directory for the PDFs, PNGs and ground-truth JSON files.
+    count (int): Number of samples.
+    dpis (List[int]): Resolutions to cycle through.
+    seed (int): Random seed; the same seed always produces the same corpus.
+
+    Returns:
+    List[Dict]: The manifest entries, also written to manifest.json.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = []
+
+    for i in range(count):
+        cells = random_table(rng)
+        dpi = dpis[i % len(dpis)]
+        ruled = i % 2 == 0
+        skew = round(rng.uniform(-2.0, 2.0), 2) if rng.random() < 0.7 else 0.0
+        noise = round(rng.choice([0.0, 0.02, 0.05, 0.08]), 3)
+
+        page = degrade(render_page(cells, dpi, ruled), rng, skew, noise)
+
+        name = f"sample_{i:04d}_{dpi}dpi_{'ruled' if ruled else 'unruled'}"
+        pdf_path = os.path.join(output_dir, f"{name}.pdf")
+        png_path = os.path.join(output_dir, f"{name}.png")
+        truth_path = os.path.join(output_dir, f"{name}.json")
+        page.save(pdf_path, "PDF", resolution=dpi)
+        page.save(png_path, dpi=(dpi, dpi))
+
+        entry = {
+            "name": name,
+            "pdf": os.path.basename(pdf_path),
+            "image": os.path.basename(png_path),
+            "dpi": dpi,
+            "ruled": ruled,
+            "skew": skew,
+            "noise": noise,
+            "cells": cells,
+        }
+        with open(truth_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        manifest.append(entry)
+
+    with open(os.path.join(output_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    logging.info(f"Generated {count} samples in {output_dir}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus of scanned table PDFs with ground truth.")
+    parser.add_argument("output_dir", help="Output directory")
+    parser.add_argument("--count", type=int, default=20, help="Number of samples")
+    parser.add_argument("--dpis", default="150,200,300", help="Comma-separated list of resolutions")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    generate_corpus(args.output_dir, args.count, [int(d) for d in args.dpis.split(',')], args.seed)
+
+
+if __name__ == "__main__":
+    main()
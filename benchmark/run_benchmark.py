@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import os
+import io
+import re
+import csv
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import contextlib
+import importlib.util
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Callable
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(relative_path: str, module_name: str):
+    """Import one of the repository scripts by file path (the file names contain dots and live in plain folders)."""
+    path = os.path.join(REPO_ROOT, relative_path)
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def dataframe_rows(df) -> List[List[str]]:
+    return df.fillna('').astype(str).values.tolist()
+
+
+# ---------------------------------------------------------------------------
+# Pipelines: each factory loads the models once and returns a function that
+# turns one corpus sample into a list of table rows.
+# ---------------------------------------------------------------------------
+
+def docrt_pipeline(script: str) -> Callable[[Dict, str], List[List[str]]]:
+    module = load_script(os.path.join("docrt", script), script.replace('.', '_')[:-3])
+
+    def run(sample: Dict, corpus_dir: str) -> List[List[str]]:
+        rows = []
+        images = module.convert_pdf_to_images_and_grayscale(os.path.join(corpus_dir, sample["pdf"]))
+        for image in images:
+            corrected_image = module.correct_image_orientation(image)
+            if hasattr(module, 'extract_page_table'):
+                # Gleicher Seitenablauf wie process_pdf des Skripts (v2.15: Raster zuerst, zeilenweise OCR als Rückfall)
+                rows.extend(dataframe_rows(module.extract_page_table(corrected_image)))
+                continue
+            lines = module.segment_image_into_lines(corrected_image)
+            ocr_results = module.ocr_on_lines(lines)
+            rows.extend(dataframe_rows(module.extract_table_structure(corrected_image, ocr_results)))
+        return rows
+
+    return run
+
+
+def tesseract_md_pipeline() -> Callable[[Dict, str], List[List[str]]]:
+    module = load_script(os.path.join("tesseract", "ocr_table_to_md_v2.py"), "ocr_table_to_md_v2")
+
+    def run(sample: Dict, corpus_dir: str) -> List[List[str]]:
+        import fitz  # PyMuPDF
+        from PIL import Image
+
+        rows = []
+        with fitz.open(os.path.join(corpus_dir, sample["pdf"])) as pdf_document:
+            for page in pdf_document:
+                gray, dpi = module.render_page_adaptive(page, engine='tesseract')
+                rows.extend(dataframe_rows(module.extract_tables_from_image(Image.fromarray(gray))))
+        return rows
+
+    return run
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the Ollama/CORS proxy used by ocr_llm_extraction.py.
+    POST / accepts image bytes and returns an id, POST /api/generate echoes the OCR text
+    from the prompt as the single table of the page.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/api/generate':
+            prompt = json.loads(body).get('prompt', '')
+            match = re.search(r"OCR-Text:\n(.*?)\n\nBitte gib", prompt, re.S)
+            ocr_text = match.group(1) if match else ''
+            answer = {"title": "", "content": ocr_text,
+                      "tables": [{"table_title": "", "table_content": ocr_text}]}
+            payload = {"response": json.dumps(answer, ensure_ascii=False)}
+        else:
+            payload = {"id": f"img-{len(body)}"}
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def tesseract_llm_pipeline() -> Callable[[Dict, str], List[List[str]]]:
+    module = load_script(os.path.join("tesseract", "ocr_llm_extraction.py"), "ocr_llm_extraction")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    module.OLLAMA_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    work_dir = tempfile.mkdtemp(prefix="bench_llm_")
+
+    def run(sample: Dict, corpus_dir: str) -> List[List[str]]:
+        output_file = os.path.join(work_dir, f"{sample['name']}.csv")
+        cwd = os.getcwd()
+        # process_pdf legt temporäre Bilder im Arbeitsverzeichnis ab
+        os.chdir(work_dir)
+        try:
+            module.process_pdf(os.path.join(corpus_dir, sample["pdf"]), output_file, "deu")
+        finally:
+            os.chdir(cwd)
+        rows = []
+        with open(output_file, newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                for table in json.loads(record.get("tables") or "[]"):
+                    for line in table.get("table_content", "").split('\n'):
+                        if line.strip():
+                            rows.append(re.split(r'\s{2,}', line.strip()))
+        return rows
+
+    return run
+
+
+def paddleocr_pipeline() -> Callable[[Dict, str], List[List[str]]]:
+    module = load_script(os.path.join("paddleocr", "ocr_table.py"), "paddle_ocr_table")
+    work_dir = tempfile.mkdtemp(prefix="bench_paddle_")
+
+    def run(sample: Dict, corpus_dir: str) -> List[List[str]]:
+        # process_image schreibt CSV/MD/TXT neben das Bild, daher auf einer Kopie arbeiten
+        image_path = os.path.join(work_dir, sample["image"])
+        shutil.copy(os.path.join(corpus_dir, sample["image"]), image_path)
+        module.process_image(image_path)
+        with open(os.path.splitext(image_path)[0] + '.csv', newline='', encoding='utf-8') as f:
+            return [row for row in csv.reader(f)]
+
+    return run
+
+
+PIPELINES = {
+    "docrt_v2.2": lambda: docrt_pipeline("_pdf_table_to_csv_v2.2.py"),
+    "docrt_v2.15": lambda: docrt_pipeline("_pdf_table_to_csv_v2.15.py"),
+    "tesseract_md": tesseract_md_pipeline,
+    "tesseract_llm": tesseract_llm_pipeline,
+    "paddleocr": paddleocr_pipeline,
+}
+
+
+# ---------------------------------------------------------------------------
+# Accuracy
+# ---------------------------------------------------------------------------
+
+def normalize_cell(text: str) -> str:
+    return re.sub(r'\s+', '', str(text)).lower()
+
+
+def row_matches(truth: List[str], predicted: List[str]) -> int:
+    return sum(1 for t, p in zip(truth, predicted) if normalize_cell(t) == normalize_cell(p))
+
+
+def cell_accuracy(truth: List[List[str]], predicted: List[List[str]]) -> float:
+    """
+    Share of ground-truth cells found at the right column of a matching row.
+    Rows are aligned monotonically (like an LCS over rows), so extra prose lines or
+    missing rows in the prediction do not shift the rest of the table.
+    """
+    total = sum(len(row) for row in truth)
+    if not total or not predicted:
+        return 0.0
+    n, m = len(truth), len(predicted)
+    score = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            score[i][j] = max(score[i - 1][j], score[i][j - 1],
+                              score[i - 1][j - 1] + row_matches(truth[i - 1], predicted[j - 1]))
+    return score[n][m] / total
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_pipeline_in_child(name: str, corpus_dir: str, samples: List[Dict], queue):
+    """Child process: load one pipeline, process all samples, report timings, accuracy and peak RSS."""
+    setup_start = time.perf_counter()
+    try:
+        run = PIPELINES[name]()
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    setup_seconds = time.perf_counter() - setup_start
+
+    results = []
+    for sample in samples:
+        start = time.perf_counter()
+        try:
+            # Die Skripte geben viel Debug-Text aus; der soll die Messung nicht verfälschen
+            with contextlib.redirect_stdout(io.StringIO()):
+                predicted = run(sample, corpus_dir)
+            error = None
+        except Exception as e:
+            predicted, error = [], str(e)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "name": sample["name"],
+            "seconds": elapsed,
+            "accuracy": cell_accuracy(sample["cells"], predicted),
+            "error": error,
+        })
+
+    queue.put({
+        "setup_seconds": setup_seconds,
+        "samples": results,
+        # ru_maxrss ist unter Linux in KiB angegeben
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def benchmark(corpus_dir: str, pipelines: List[str], limit: int = 0) -> Dict[str, Dict]:
+    """
+    Run every pipeline in its own process on the corpus and summarize the results.
+
+    Args:
+    corpus_dir (str): Directory created by generate_corpus.py.
+    pipelines (List[str]): Names from PIPELINES.
+    limit (int): Use only the first N samples (0 = all).
+
+    Returns:
+    Dict[str, Dict]: Summary per pipeline (pages/s, peak RSS, mean cell accuracy, per-sample details).
+    """
+    with open(os.path.join(corpus_dir, "manifest.json"), encoding='utf-8') as f:
+        samples = json.load(f)
+    if limit:
+        samples = samples[:limit]
+
+    ctx = multiprocessing.get_context("spawn")
+    summary = {}
+    for name in pipelines:
+        logging.info(f"Running {name} on {len(samples)} pages")
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_pipeline_in_child, args=(name, corpus_dir, samples, queue))
+        process.start()
+        report = queue.get()
+        process.join()
+        if "error" in report:
+            logging.error(f"{name} could not be started: {report['error']}")
+            continue
+
+        total_seconds = sum(r["seconds"] for r in report["samples"])
+        errors = [r for r in report["samples"] if r["error"]]
+        summary[name] = {
+            "pages": len(samples),
+            "pages_per_second": len(samples) / total_seconds if total_seconds else 0.0,
+            "setup_seconds": report["setup_seconds"],
+            "peak_rss_mb": report["peak_rss_mb"],
+            "cell_accuracy": sum(r["accuracy"] for r in report["samples"]) / max(1, len(samples)),
+            "errors": len(errors),
+            "samples": report["samples"],
+        }
+        for error in errors[:3]:
+            logging.warning(f"{name}: {error['name']}: {error['error']}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput, peak memory and cell accuracy of the table pipelines.")
+    parser.add_argument("corpus_dir", help="Corpus directory created by generate_corpus.py")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES),
+                        help=f"Comma-separated subset of: {', '.join(PIPELINES)}")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N samples")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the full results")
+    args = parser.parse_args()
+
+    pipelines = [p for p in args.pipelines.split(',') if p]
+    unknown = [p for p in pipelines if p not in PIPELINES]
+    if unknown:
+        parser.error(f"Unknown pipeline(s): {', '.join(unknown)}")
+
+    summary = benchmark(args.corpus_dir, pipelines, args.limit)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{'Pipeline':<16}{'Seiten/s':>10}{'Peak RSS MB':>14}{'Zellgenauigkeit':>18}{'Fehler':>8}")
+    for name, result in summary.items():
+        print(f"{name:<16}{result['pages_per_second']:>10.3f}{result['peak_rss_mb']:>14.0f}"
+              f"{result['cell_accuracy']:>18.3f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
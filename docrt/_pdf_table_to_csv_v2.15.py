@@ -1,3 +1,6 @@
+import os
+import sys
+import logging
 import cv2
 import doctr
 import pytesseract
@@ -9,6 +12,23 @@ from doctr.models import ocr_predictor
 from PIL import Image
 from io import BytesIO
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from grid_detection import detect_grid, recognize_grid
+from ocr_backends import DoctrBackend
+from autotune import tuned_backend_kwargs
+from cell_index import CellIndex, column_boundaries_from_words
+from word_table import WordTable
+
+# doctr models are loaded once and shared by all pages
+_doctr_backend = None
+
+def get_doctr_backend():
+    """The shared doctr backend, with batch size and threads from this host's autotune profile."""
+    global _doctr_backend
+    if _doctr_backend is None:
+        _doctr_backend = DoctrBackend(**tuned_backend_kwargs('doctr'))
+    return _doctr_backend
+
 def convert_pdf_to_images_and_grayscale(pdf_path):
     """
     Converts each page of the given PDF to a grayscale image and returns a list of images.
@@ -133,63 +153,76 @@ def segment_image_into_lines(image):
     return line_images
 
 
-def extract_table_structure(image, ocr_results):
+def extract_table_structure(image, ocr_results, column_boundaries=None):
     """
     Analyzes the given image and OCR results to extract table structure, identifying columns and rows.
     Input:
     - image: The image to be analyzed (NumPy array)
-    - ocr_results: List of dictionaries containing the OCR text and positions
+    - ocr_results: WordTable from ocr_on_lines (positions relative to each line)
+    - column_boundaries: Optional column borders in pixels; derived from the whitespace between words otherwise
     Output:
     - DataFrame with the structured table data
     """
-    # Placeholder for actual implementation of table structure extraction
-    # For now, we will create an empty DataFrame and populate it later
-    structured_data = []
-
-    # Step 1: Define boundaries for columns (heuristic or predefined positions)
-    # Here we assume some static boundaries for simplicity, normally this would be dynamic
-    column_boundaries = [100, 300, 500, 700]  # Example positions for column borders
+    # Jede segmentierte Zeile ist eine Tabellenzeile; doctr liefert relative Koordinaten der Zeile,
+    # die Zeilen sind so breit wie die Seite, also x * Seitenbreite = Pixel auf der Seite
+    page_width = image.shape[1]
+    if not len(ocr_results):
+        return pd.DataFrame()
+    line = ocr_results.line[:, None].astype(np.float32)
+    words = ocr_results.with_boxes(ocr_results.boxes * np.float32([page_width, 1, page_width, 1])
+                                   + line * np.float32([0, 1, 0, 1]))
+
+    # Step 1: Column borders (dynamic unless given) and row borders (one per line)
+    if column_boundaries is None:
+        column_boundaries = column_boundaries_from_words(words, page_width)
+    else:
+        column_boundaries = [0] + list(column_boundaries)
+    index = CellIndex(range(int(ocr_results.line.max()) + 2), column_boundaries)
 
-    # Step 2: Initialize a DataFrame to hold the table structure
-    table_data = []
+    # Step 2: Assign every word by bisection (also words spanning several columns) and join each cell once
+    assignment = index.assign(words)
+    df = pd.DataFrame(assignment.cells)
 
-    # Step 3: Iterate through OCR results and assign each word to a cell
-    for line_data in ocr_results:
-        row = [''] * len(column_boundaries)
-        for word_data in line_data:
-            word_text = word_data['text']
-            word_position = word_data['geometry']
+    # Dumping the whole table is expensive, so only format it when debug output is enabled
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Extracted table structure ({len(assignment.spans)} spanning cells):\n{df}")
 
-            # Find the appropriate column based on the word's position
-            for i, boundary in enumerate(column_boundaries):
-                if word_position[0][0] < boundary:
-                    row[i] += f"{word_text} "
-                    break
+    return df
 
-        # Clean up and add the row to the table data
-        row = [cell.strip() for cell in row]
-        table_data.append(row)
+def extract_table_by_grid(image):
+    """
+    Detects the cell lattice of the table before OCR and recognizes all cells in one batch.
+    Input:
+    - image: The deskewed page (NumPy array)
+    Output:
+    - DataFrame with one cell per grid position, or None if no table grid was found
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
 
-    # Convert the list of rows into a DataFrame
-    df = pd.DataFrame(table_data)
+    # Ruled tables via morphological line extraction, unruled ones via whitespace projection
+    grid = detect_grid(binary)
+    if grid is None:
+        return None
 
-    # Debug output: Show the structure of the extracted table
-    print(f"[DEBUG] Extracted table structure:\n{df}")
+    df = pd.DataFrame(recognize_grid(image, binary, grid, get_doctr_backend()))
 
+    logging.debug(f"Grid with {grid.shape[0]} rows and {grid.shape[1]} columns ({'ruled' if grid.ruled else 'unruled'})")
     return df
 
+
 def ocr_on_lines(lines):
     """
     Applies OCR on the segmented lines using Doctr.
     Input:
     - lines: List of images, each containing a single line (as NumPy arrays)
     Output:
-    - List of dictionaries containing the extracted text and its position
+    - WordTable with text, confidence and position (relative to its line) of every word; line = index of the line
     """
-    # Initialize the Doctr OCR predictor
-    predictor = ocr_predictor(pretrained=True)
+    # The Doctr OCR predictor is loaded once and shared with the grid path
+    predictor = get_doctr_backend().predictor
     
-    extracted_data = []
+    texts, boxes, confidences, line_ids = [], [], [], []
 
     for idx, line_image in enumerate(lines):
         # Convert NumPy array to PIL Image
@@ -206,26 +239,23 @@ def ocr_on_lines(lines):
         # Apply OCR to the line image
         result = predictor(doc)
 
-        # Extract text and positions directly in a more structured way
-        line_data = [
-            {
-                'text': word.value,
-                'confidence': word.confidence,
-                'geometry': word.geometry
-            }
-            for page in result.pages
-            for block in page.blocks
-            for line in block.lines
-            for word in line.words
-        ]
-
-        extracted_data.append(line_data)
-        
+        # Collect plain columns; the word table is built once for all lines
+        first_word = len(texts)
+        for page in result.pages:
+            for block in page.blocks:
+                for line in block.lines:
+                    for word in line.words:
+                        (x0, y0), (x1, y1) = word.geometry
+                        texts.append(word.value)
+                        boxes.append((x0, y0, x1, y1))
+                        confidences.append(word.confidence)
+                        line_ids.append(idx)
+
         # Debug output: Print the extracted text for this line
-        detected_text = ' '.join([word['text'] for word in line_data])
+        detected_text = ' '.join(texts[first_word:])
         print(f"[DEBUG] Line {idx + 1}: {detected_text}")
 
-    return extracted_data
+    return WordTable.from_columns(texts, boxes, confidences, line_ids)
 
 
 def save_to_csv(extracted_data, output_file):
@@ -241,6 +271,25 @@ def save_to_csv(extracted_data, output_file):
     pass
 
 
+def extract_page_table(corrected_image):
+    """
+    Extracts the table of one deskewed page: grid first, line-by-line OCR as fallback.
+    Input:
+    - corrected_image: The deskewed page (NumPy array)
+    Output:
+    - DataFrame with the table of the page
+    """
+    # Zuerst das Zellraster erkennen; nur wenn keins gefunden wird, zeilenweise OCR
+    structured_data = extract_table_by_grid(corrected_image)
+    if structured_data is None:
+        lines = segment_image_into_lines(corrected_image)
+        ocr_results = ocr_on_lines(lines)
+
+        # Aufruf der Funktion mit den richtigen Argumenten
+        structured_data = extract_table_structure(corrected_image, ocr_results)
+    return structured_data
+
+
 def process_pdf(pdf_path, output_csv):
     # Konvertiere PDF in Bilder und richte sie aus
     images = convert_pdf_to_images_and_grayscale(pdf_path)
@@ -248,12 +297,7 @@ def process_pdf(pdf_path, output_csv):
 
     for image in images:
         corrected_image = correct_image_orientation(image)
-        lines = segment_image_into_lines(corrected_image)
-        ocr_results = ocr_on_lines(lines)
-        
-        # Aufruf der Funktion mit den richtigen Argumenten
-        structured_data = extract_table_structure(corrected_image, ocr_results)
-        all_extracted_data.append(structured_data)
+        all_extracted_data.append(extract_page_table(corrected_image))
 
     # Speichern der Daten in einer CSV-Datei
     save_to_csv(all_extracted_data, output_csv)
@@ -1,25 +1,65 @@
+import os
+import sys
+import logging
+import argparse
+import functools
 import cv2
 import doctr
 import pytesseract
 import numpy as np
 import pandas as pd
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from doctr.io import DocumentFile
 from doctr.models import ocr_predictor
 from PIL import Image
 from io import BytesIO
 from sklearn.cluster import DBSCAN
 
-def convert_pdf_to_images_and_grayscale(pdf_path):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from instrumentation import configure_tracing, get_tracer
+from preprocess_cache import PreprocessCache
+from adaptive_dpi import convert_from_path_adaptive
+from roi_render import render_table_regions
+from shared_pages import create_page, share_array, page_array, release, detach, page_pool, cleanup_orphans
+from stage_pipeline import Stage, StagePipeline, parse_stage_workers
+from onnx_inference import load_doctr_predictor
+from autotune import tuned_backend_kwargs
+from ocr_backends import DoctrBackend
+from word_table import WordTable
+from page_source import open_source
+from memory_budget import MemoryBudget, budgeted_pages, load_page, parse_size
+from tiled_ocr import create_tiled_backend, OVERLAP
+from table_reconstruction import reconstruct_table
+
+# Exported ONNX models (onnx_inference.py) instead of the PyTorch models; set with --onnx or DOCTR_ONNX_DIR
+ONNX_MODEL_DIR = os.environ.get('DOCTR_ONNX_DIR')
+ONNX_QUANTIZED = os.environ.get('DOCTR_ONNX_INT8') == '1'
+# Pages larger than this many pixels are read in overlapping tiles instead of line by line (0 = off); set with --tile
+TILE_SIZE = 0
+TILE_WORKERS = 1
+
+def convert_pdf_to_images_and_grayscale(pdf_path, adaptive_dpi=False, shared=False):
     """
     Converts each page of the given PDF to a grayscale image and returns a list of images.
     Input:
     - pdf_path: Path to the PDF file
+    - adaptive_dpi: Render each page at the lowest DPI that gives doctr its preferred text height
+    - shared: Copy every page into a shared-memory buffer and return handles instead of images
     Output:
-    - List of grayscale images (each image representing a page in the PDF)
+    - List of grayscale images (each image representing a page in the PDF), or list of PageHandles
     """
-    # Convert PDF to list of images
-    images = convert_from_path(pdf_path)
+    # Convert PDF to list of images (multi-page TIFFs and images are decoded directly)
+    if not pdf_path.lower().endswith('.pdf'):
+        with open_source(pdf_path) as source:
+            images = list(source.pages('RGB'))
+    elif adaptive_dpi:
+        images = [image for image, dpi in convert_from_path_adaptive(pdf_path, engine='doctr')]
+    else:
+        images = convert_from_path(pdf_path)
+
+    if shared:
+        # Nur die kleinen Handles wandern zwischen Prozessen, nicht die Seiten selbst
+        return [share_array(np.asarray(image)) for image in images]
 
     grayscale_images = []
     for image in images:
@@ -34,19 +74,19 @@ def convert_pdf_to_images_and_grayscale(pdf_path):
     return images # Das habe ich von gayscale_images nach images geändert, da wir images erwarten
 
 
-def correct_image_orientation(image):
+def correct_image_orientation(image, out=None):
     """
     Corrects the orientation of the given image using OpenCV.
     Input:
-    - image: The image to be corrected (PIL Image)
+    - image: The image to be corrected (PIL Image or NumPy array)
+    - out: Optional array of the same shape to write the result into (e.g. a shared page buffer)
     Output:
     - Rotated image that is aligned properly (NumPy array)
     """
-    # Convert PIL image to NumPy array
-    image_np = np.array(image)
+    # Convert PIL image to NumPy array (arrays, e.g. shared pages, are used without a copy)
+    image_np = np.asarray(image)
 
-    # Debug output: Check the shape of the image
-    print(f"[DEBUG] Image shape: {image_np.shape}")
+    logging.debug(f"Image shape: {image_np.shape}")
 
     # Check if the image is already grayscale or not
     if len(image_np.shape) == 2:  # Image is already in grayscale
@@ -74,34 +114,35 @@ def correct_image_orientation(image):
         # If no lines are found, assume no rotation
         median_angle = 0
 
-    # Debug output: Show the calculated angle
-    print(f"[DEBUG] Calculated rotation angle: {median_angle} degrees")
+    logging.debug(f"Calculated rotation angle: {median_angle} degrees")
 
     # Rotate the image to correct the orientation
     (h, w) = image_np.shape[:2]
     center = (w // 2, h // 2)
     M = cv2.getRotationMatrix2D(center, median_angle, 1.0)
-    rotated_image = cv2.warpAffine(image_np, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    rotated_image = cv2.warpAffine(image_np, M, (w, h), dst=out, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
     
     return rotated_image
 
 
-def segment_image_into_lines(image):
+def segment_image_into_lines(image, binary=None):
     """
     Segments the given image into individual lines.
     Input:
     - image: The image to be segmented (NumPy array)
+    - binary: Optional precomputed inverted Otsu binarization of the image (e.g. from the preprocessing cache)
     Output:
     - List of images, each containing a single line of the original image
     """
-    # Convert image to grayscale (if not already)
-    if len(image.shape) == 3:  # If the image has 3 channels (color image)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
+    if binary is None:
+        # Convert image to grayscale (if not already)
+        if len(image.shape) == 3:  # If the image has 3 channels (color image)
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
 
-    # Apply a binary threshold to the image
-    _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        # Apply a binary threshold to the image
+        _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
 
     # Sum up the pixels in each row to get the horizontal projection
     horizontal_projection = np.sum(binary, axis=1)
@@ -120,16 +161,16 @@ def segment_image_into_lines(image):
     
     lines.append((start_index, line_indices[-1]))  # Append the last line
 
-    # Debug output: Number of lines detected
-    print(f"[DEBUG] Number of lines detected: {len(lines)}")
+    logging.debug(f"Number of lines detected: {len(lines)}")
 
     # Crop the lines from the image
     line_images = []
+    verbose = logging.getLogger().isEnabledFor(logging.DEBUG)
     for i, (start, end) in enumerate(lines):
         line_image = image[start:end, :]
         line_images.append(line_image)
-        # Optional debug: print height of each line
-        print(f"[DEBUG] Line {i + 1} height: {end - start} pixels")
+        if verbose:
+            logging.debug(f"Line {i + 1} height: {end - start} pixels")
 
     return line_images
 
@@ -139,29 +180,27 @@ def extract_table_structure(image, ocr_results):
     Analyzes the given image and OCR results to extract table structure, identifying columns and rows.
     Input:
     - image: The image to be analyzed (NumPy array)
-    - ocr_results: List of dictionaries containing the OCR text and positions
+    - ocr_results: WordTable from ocr_on_lines (positions relative to each line)
     Output:
     - DataFrame with the structured table data
     """
     table_data = []
 
-    for line_data in ocr_results:
-        if not line_data:  # Skip empty lines
-            continue
-        
+    # Lines without words have no entries in the word table, so they are skipped
+    for _, indices in ocr_results.groups(ocr_results.line):
         # Extract the x-coordinates (left position) of each word
-        x_positions = [word_data['geometry'][0][0] for word_data in line_data]
+        x_positions = np.asarray(ocr_results.x0[indices], dtype=np.float64)
         
         # Use DBSCAN clustering to group words into columns based on their x-coordinates
-        clustering = DBSCAN(eps=100, min_samples=1).fit(np.array(x_positions).reshape(-1, 1))
+        clustering = DBSCAN(eps=100, min_samples=1).fit(x_positions.reshape(-1, 1))
         labels = clustering.labels_
         
         # Group words by their cluster label (column)
         columns = {}
-        for word_data, label in zip(line_data, labels):
+        for text, label in zip(ocr_results.texts(indices), labels):
             if label not in columns:
                 columns[label] = []
-            columns[label].append(word_data['text'])
+            columns[label].append(text)
         
         # Create a row with the grouped words, sorting columns by their x-position
         row = [' '.join(columns[label]) for label in sorted(columns)]
@@ -170,24 +209,35 @@ def extract_table_structure(image, ocr_results):
     # Convert the list of rows into a DataFrame
     df = pd.DataFrame(table_data)
 
-    # Debug output: Show the structure of the extracted table
-    print(f"[DEBUG] Extracted table structure:\n{df}")
+    # Dumping the whole table is expensive, so only format it when debug output is enabled
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Extracted table structure:\n{df}")
 
     return df
 
 
+@functools.lru_cache(maxsize=1)
+def get_line_predictor():
+    """Doctr predictor for the line OCR (or its ONNX export); loaded once per process, shared by the pipeline threads."""
+    # Batchgröße und Threads aus dem Autotune-Profil dieses Rechners
+    if ONNX_MODEL_DIR:
+        return load_doctr_predictor(ONNX_MODEL_DIR, ONNX_QUANTIZED, **tuned_backend_kwargs('doctr_onnx'))
+    return DoctrBackend(**tuned_backend_kwargs('doctr')).predictor
+
+
 def ocr_on_lines(lines):
     """
     Applies OCR on the segmented lines using Doctr.
     Input:
     - lines: List of images, each containing a single line (as NumPy arrays)
     Output:
-    - List of dictionaries containing the extracted text and its position
+    - WordTable with text, confidence and position (relative to its line) of every word; line = index of the line
     """
-    # Initialize the Doctr OCR predictor
-    predictor = ocr_predictor(pretrained=True)
+    # The predictor is loaded on the first page and reused for all further pages
+    predictor = get_line_predictor()
     
-    extracted_data = []
+    texts, boxes, confidences, line_ids = [], [], [], []
+    verbose = logging.getLogger().isEnabledFor(logging.DEBUG)
 
     for idx, line_image in enumerate(lines):
         # Convert NumPy array to PIL Image
@@ -204,28 +254,53 @@ def ocr_on_lines(lines):
         # Apply OCR to the line image
         result = predictor(doc)
 
-        # Extract text and positions directly in a more structured way
-        line_data = [
-            {
-                'text': word.value,
-                'confidence': word.confidence,
-                'geometry': word.geometry
-            }
-            for page in result.pages
-            for block in page.blocks
-            for line in block.lines
-            for word in line.words
-        ]
+        # Collect plain columns; the word table is built once for all lines
+        first_word = len(texts)
+        for page in result.pages:
+            for block in page.blocks:
+                for line in block.lines:
+                    for word in line.words:
+                        (x0, y0), (x1, y1) = word.geometry
+                        texts.append(word.value)
+                        boxes.append((x0, y0, x1, y1))
+                        confidences.append(word.confidence)
+                        line_ids.append(idx)
+
+        if verbose:
+            detected_text = ' '.join(texts[first_word:])
+            logging.debug(f"Line {idx + 1}: {detected_text if detected_text else 'EMPTY'}")
+
+    return WordTable.from_columns(texts, boxes, confidences, line_ids)
+
+
+@functools.lru_cache(maxsize=1)
+def get_tiled_backend():
+    """doctr (or its ONNX export) wrapped for tiled recognition; loaded once."""
+    overlap = min(OVERLAP, TILE_SIZE // 4)
+    if ONNX_MODEL_DIR:
+        return create_tiled_backend('doctr_onnx', TILE_SIZE, overlap, TILE_WORKERS,
+                                    model_dir=ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, **tuned_backend_kwargs('doctr_onnx'))
+    return create_tiled_backend('doctr', TILE_SIZE, overlap, TILE_WORKERS, **tuned_backend_kwargs('doctr'))
 
-        # Skip empty lines
-        if line_data:
-            extracted_data.append(line_data)
-        
-        # Debug output: Print the extracted text for this line, or note if it's empty
-        detected_text = ' '.join([word['text'] for word in line_data])
-        print(f"[DEBUG] Line {idx + 1}: {detected_text if detected_text else 'EMPTY'}")
 
-    return extracted_data
+def ocr_page_tiled(image):
+    """
+    Tiled alternative to segment_image_into_lines and ocr_on_lines for oversized pages: the page is
+    read in overlapping tiles at full resolution, so distant columns are not merged into one line.
+    Input:
+    - image: The corrected page image (NumPy array)
+    Output:
+    - WordTable of the page in page coordinates
+    """
+    return get_tiled_backend().recognize_tiles(np.asarray(image))
+
+
+def structure_tiled(words):
+    """Rows of the page from the word positions (table_reconstruction.py) as DataFrame."""
+    df = pd.DataFrame(reconstruct_table(words))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Extracted table structure:\n{df}")
+    return df
 
 
 def save_to_csv(extracted_data, output_file):
@@ -237,34 +312,281 @@ def save_to_csv(extracted_data, output_file):
     Output:
     - CSV file saved at the specified path
     """
-    # Placeholder: Implement saving logic
-    pass
+    # The tables of all pages are written one after another into the same file
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        for df in extracted_data:
+            df.to_csv(f, index=False, header=False)
 
 
-def process_pdf(pdf_path, output_csv):
+def preprocessed_pages(pdf_path, cache_dir=None, adaptive_dpi=False, roi=False):
+    """
+    Yields (corrected_image, binary) per page. With a cache directory the deskewed and binarized
+    pages are read from (or written once to) the shared preprocessing cache; binary is None otherwise.
+    In ROI mode one entry is yielded per table region instead, rendered on its own at high DPI.
+    """
+    tracer = get_tracer()
+    if cache_dir:
+        for page in PreprocessCache(cache_dir).pdf_pages(pdf_path):
+            yield page.gray, page.binary
+        return
+
+    if roi:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as pdf_document:
+            for page_num, page in enumerate(pdf_document, start=1):
+                # Tabellen auf einer Vorschau suchen und nur diese Ausschnitte rastern
+                with tracer.span('rasterize', page=page_num, mode='roi') as span:
+                    regions = render_table_regions(page)
+                    span.items = len(regions)
+                for rect, crop in regions:
+                    with tracer.span('deskew', items=1, page=page_num):
+                        corrected_image = correct_image_orientation(crop)
+                    yield corrected_image, None
+        return
+
     # Konvertiere PDF in Bilder und richte sie aus
-    images = convert_pdf_to_images_and_grayscale(pdf_path)
-    all_extracted_data = []
+    with tracer.span('rasterize', pdf=pdf_path) as span:
+        images = convert_pdf_to_images_and_grayscale(pdf_path, adaptive_dpi)
+        span.items = len(images)
+    for page_num, image in enumerate(images, start=1):
+        with tracer.span('deskew', items=1, page=page_num):
+            corrected_image = correct_image_orientation(image)
+        yield corrected_image, None
 
-    for image in images:
-        corrected_image = correct_image_orientation(image)
+
+def shared_preprocessed_pages(pdf_path, adaptive_dpi=False, roi=False):
+    """
+    Shared-memory variant of preprocessed_pages: yields a PageHandle per corrected page (or table
+    region). The deskew writes straight into the shared buffer; the consumer releases the handle.
+    """
+    tracer = get_tracer()
+    if roi:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as pdf_document:
+            for page_num, page in enumerate(pdf_document, start=1):
+                with tracer.span('rasterize', page=page_num, mode='roi') as span:
+                    regions = render_table_regions(page)
+                    span.items = len(regions)
+                for rect, crop in regions:
+                    with tracer.span('deskew', items=1, page=page_num):
+                        handle, out = create_page(crop.shape, crop.dtype)
+                        correct_image_orientation(crop, out=out)
+                        del out
+                    yield handle
+                    detach(handle)
+        return
+
+    with tracer.span('rasterize', pdf=pdf_path) as span:
+        handles = convert_pdf_to_images_and_grayscale(pdf_path, adaptive_dpi, shared=True)
+        span.items = len(handles)
+    for page_num, source in enumerate(handles, start=1):
+        with tracer.span('deskew', items=1, page=page_num):
+            handle, out = create_page(source.shape, source.dtype)
+            correct_image_orientation(page_array(source), out=out)
+            del out
+        release(source)
+        yield handle
+        # Die Seite gehört jetzt dem Verbraucher; hier nur die Einblendung lösen
+        detach(handle)
+
+
+def process_shared_page(handle):
+    """
+    Pool worker: segment, OCR and structure one shared page and release it.
+    Only the handle comes in and the (small) DataFrame goes back.
+    """
+    try:
+        corrected_image = page_array(handle)
+        if TILE_SIZE:
+            return structure_tiled(ocr_page_tiled(corrected_image))
         lines = segment_image_into_lines(corrected_image)
         ocr_results = ocr_on_lines(lines)
-        
+        return extract_table_structure(corrected_image, ocr_results)
+    finally:
+        # Zeilenausschnitte sind Sichten auf den gemeinsamen Puffer
+        lines = corrected_image = None
+        release(handle)
+
+
+def process_pdf_parallel(pdf_path, output_csv, processes, adaptive_dpi=False, roi=False):
+    """process_pdf with segmentation, OCR and structure in a process pool fed with shared pages."""
+    tracer = get_tracer()
+    cleanup_orphans()
+    with page_pool(processes) as pool:
+        with tracer.span('ocr', pdf=pdf_path, processes=processes) as span:
+            all_extracted_data = list(pool.imap(process_shared_page, shared_preprocessed_pages(pdf_path, adaptive_dpi, roi)))
+            span.items = len(all_extracted_data)
+    with tracer.span('export', items=len(all_extracted_data)):
+        save_to_csv(all_extracted_data, output_csv)
+
+
+def process_pdf(pdf_path, output_csv, cache_dir=None, adaptive_dpi=False, roi=False):
+    tracer = get_tracer()
+    all_extracted_data = []
+
+    for page_num, (corrected_image, binary) in enumerate(preprocessed_pages(pdf_path, cache_dir, adaptive_dpi, roi), start=1):
+        if TILE_SIZE:
+            with tracer.span('ocr', page=page_num, mode='tiled') as span:
+                words = ocr_page_tiled(corrected_image)
+                span.items = len(words)
+            with tracer.span('structure', page=page_num) as span:
+                all_extracted_data.append(structure_tiled(words))
+                span.items = len(all_extracted_data[-1])
+            continue
+
+        with tracer.span('segment', page=page_num) as span:
+            lines = segment_image_into_lines(corrected_image, binary)
+            span.items = len(lines)
+        with tracer.span('ocr', items=len(lines), page=page_num):
+            ocr_results = ocr_on_lines(lines)
+
         # Aufruf der Funktion mit den richtigen Argumenten
-        structured_data = extract_table_structure(corrected_image, ocr_results)
+        with tracer.span('structure', page=page_num) as span:
+            structured_data = extract_table_structure(corrected_image, ocr_results)
+            span.items = len(structured_data)
         all_extracted_data.append(structured_data)
 
     # Speichern der Daten in einer CSV-Datei
-    save_to_csv(all_extracted_data, output_csv)
+    with tracer.span('export', items=len(all_extracted_data)):
+        save_to_csv(all_extracted_data, output_csv)
 
 
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 3:
-        print("Usage: python script.py <path_to_pdf> <output_csv>")
+def iter_rasterized_pages(pdf_path, adaptive_dpi=False):
+    """
+    Lazy counterpart of convert_pdf_to_images_and_grayscale: renders (or, for multi-page TIFFs and
+    images, decodes) one page at a time, so the stage pipeline only holds the pages that are in flight.
+    Input:
+    - pdf_path: Path to the PDF, TIFF or image file
+    - adaptive_dpi: Render each page at the lowest DPI that gives doctr its preferred text height
+    Output:
+    - Iterator of page images (PIL Images for PDFs, RGB arrays otherwise)
+    """
+    if not pdf_path.lower().endswith('.pdf'):
+        with open_source(pdf_path) as source:
+            yield from source.pages('RGB')
+        return
+    if adaptive_dpi:
+        for image, dpi in convert_from_path_adaptive(pdf_path, engine='doctr'):
+            yield image
+        return
+    for page_number in range(1, pdfinfo_from_path(pdf_path)['Pages'] + 1):
+        yield convert_from_path(pdf_path, first_page=page_number, last_page=page_number)[0]
+
+
+def process_pdf_pipelined(pdf_path, output_csv, workers=None, queue_size=2, cache_dir=None, adaptive_dpi=False, roi=False,
+                          budget=None, spill_dir=None, dpi=300):
+    """
+    process_pdf with overlapping stages: rasterize -> deskew -> segment -> OCR -> structure run in
+    their own threads, connected by bounded queues, and each table is written as soon as it and
+    all pages before it are done.
+    Input:
+    - workers: Threads per stage, e.g. {'deskew': 2, 'ocr': 1} (default 1 each)
+    - queue_size: Capacity of each queue between stages (backpressure)
+    - budget: MemoryBudget; pages wait for room before they are rendered, and pages that would not
+      fit are rendered at a lower DPI or split into bands (not with cache_dir or roi)
+    - spill_dir: With a budget, rendered pages wait in this directory instead of in memory under pressure
+    - dpi: Render resolution of PDF pages with a budget, before any reduction
+    Output:
+    - CSV file; the per-stage utilization is logged at the end
+    """
+    workers = workers or {}
+    stages = []
+    page_source = None
+    if cache_dir or roi:
+        # Cache und ROI-Modus liefern bereits ausgerichtete Seiten bzw. Ausschnitte
+        source = preprocessed_pages(pdf_path, cache_dir, adaptive_dpi, roi)
     else:
-        pdf_path = sys.argv[1]
-        output_csv = sys.argv[2]
-        process_pdf(pdf_path, output_csv)
+        if budget is not None:
+            # Die Seitengröße ist vor dem Rendern bekannt; passt eine Seite nicht, wird sie kleiner gerendert
+            page_source = open_source(pdf_path, dpi)
+            source = budgeted_pages(page_source, budget, 'RGB', spill_dir, stop=lambda: pipeline.aborted())
+        else:
+            source = iter_rasterized_pages(pdf_path, adaptive_dpi)
+        stages.append(Stage('deskew', lambda image: (correct_image_orientation(load_page(image)), None),
+                            workers.get('deskew', 1), queue_size))
+    if TILE_SIZE:
+        stages += [
+            Stage('ocr', lambda page: ocr_page_tiled(page[0]), workers.get('ocr', 1), queue_size),
+            Stage('structure', structure_tiled, workers.get('structure', 1), queue_size),
+        ]
+    else:
+        stages += [
+            Stage('segment', lambda page: (page[0], segment_image_into_lines(*page)), workers.get('segment', 1), queue_size),
+            Stage('ocr', lambda page: (page[0], ocr_on_lines(page[1])), workers.get('ocr', 1), queue_size),
+            Stage('structure', lambda page: extract_table_structure(*page), workers.get('structure', 1), queue_size),
+        ]
+
+    tracer = get_tracer()
+    pipeline = StagePipeline(stages, output_queue_size=queue_size, source_name='rasterize')
+    try:
+        with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+            for structured_data in pipeline.run(source):
+                with tracer.span('export', items=1):
+                    structured_data.to_csv(f, index=False, header=False)
+                if page_source is not None:
+                    budget.release()
+    finally:
+        if page_source is not None:
+            page_source.close()
+    pipeline.report()
+    if page_source is not None:
+        budget.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract tables from a scanned PDF into a CSV file.")
+    parser.add_argument("pdf_path", help="Path to the PDF file (or a multi-page TIFF / image; not with --cache or --roi)")
+    parser.add_argument("output_csv", help="Path to the output CSV file")
+    parser.add_argument("--trace", help="Append per-stage spans to this JSON Lines file")
+    parser.add_argument("--metrics", help="Write a Prometheus textfile summary of all stages to this file")
+    parser.add_argument("--verbose", action="store_true", help="Log line heights, recognized text and extracted tables")
+    parser.add_argument("--cache", help="Directory of the shared preprocessing cache (deskewed and binarized pages)")
+    parser.add_argument("--adaptive-dpi", action="store_true",
+                        help="Choose the render resolution per page from a low-resolution probe of the text height")
+    parser.add_argument("--roi", action="store_true",
+                        help="Detect tables on a thumbnail and rasterize, deskew and OCR only those regions")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="OCR pages in this many worker processes; pages are passed via shared memory")
+    parser.add_argument("--workers", help="Run the stages overlapped in threads, e.g. deskew=2,ocr=1 (stages not listed get one worker)")
+    parser.add_argument("--queue-size", type=int, default=2, help="Capacity of the queues between pipelined stages")
+    parser.add_argument("--onnx", help="Directory of the exported ONNX models (onnx_inference.py); must have passed the accuracy guard")
+    parser.add_argument("--int8", action="store_true", help="Use the int8-quantized ONNX models")
+    parser.add_argument("--tile", type=int, default=0,
+                        help="Read pages larger than this many pixels in overlapping tiles (e.g. 1280) instead of line by line")
+    parser.add_argument("--tile-workers", type=int, default=1, help="Tiles of a page recognized in parallel")
+    parser.add_argument("--max-memory", help="Keep the process RSS below this size, e.g. 6G: limits the pages in flight "
+                                             "and renders oversized pages at a lower DPI or in bands (runs the stages pipelined)")
+    parser.add_argument("--spill-dir", help="With --max-memory, park rendered pages in this directory while memory is tight")
+    parser.add_argument("--dpi", type=int, default=300, help="Render resolution of PDF pages with --max-memory")
+    args = parser.parse_args()
+    if args.max_memory and (args.cache or args.roi or args.processes or args.adaptive_dpi):
+        parser.error("--max-memory cannot be combined with --cache, --roi, --processes or --adaptive-dpi")
+    if args.processes and args.cache:
+        parser.error("--processes cannot be combined with --cache (the worker processes render the pages themselves)")
+    if args.processes and args.workers:
+        parser.error("--processes cannot be combined with --workers (choose worker processes or the threaded stage pipeline)")
+    try:
+        max_memory = parse_size(args.max_memory) if args.max_memory else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    tracer = configure_tracing(args.trace, args.metrics)
+    if args.onnx:
+        ONNX_MODEL_DIR, ONNX_QUANTIZED = args.onnx, args.int8
+    TILE_SIZE, TILE_WORKERS = args.tile, args.tile_workers
+    try:
+        if args.max_memory:
+            process_pdf_pipelined(args.pdf_path, args.output_csv, parse_stage_workers(args.workers or ''), args.queue_size,
+                                  budget=MemoryBudget(max_memory), spill_dir=args.spill_dir, dpi=args.dpi)
+        elif args.workers:
+            process_pdf_pipelined(args.pdf_path, args.output_csv, parse_stage_workers(args.workers), args.queue_size,
+                                  cache_dir=args.cache, adaptive_dpi=args.adaptive_dpi, roi=args.roi)
+        elif args.processes:
+            process_pdf_parallel(args.pdf_path, args.output_csv, args.processes, adaptive_dpi=args.adaptive_dpi, roi=args.roi)
+        else:
+            process_pdf(args.pdf_path, args.output_csv, cache_dir=args.cache, adaptive_dpi=args.adaptive_dpi, roi=args.roi)
+    finally:
+        tracer.close()
 
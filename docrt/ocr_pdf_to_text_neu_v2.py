@@ -1,26 +1,55 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import subprocess
 import logging
-from typing import List
+import argparse
+from functools import partial
+from typing import List, Optional
+
+from ocrmypdf_scheduler import CoreBudgetScheduler, OcrTask
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from hocr_stream import hocr_to_csv
+from batch_cli import Claim, add_batch_arguments, parse_batch_args, claimed_inputs, output_path_for
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_user_input(prompt: str, default: str) -> str:
+def build_command(input_file: str, output_file: str, language: str, hocr: bool = False,
+                  jobs: Optional[int] = None) -> List[str]:
     """
-    Prompt the user for input with a default value.
+    Build the OCRmyPDF command line for one file.
     
     Args:
-    prompt (str): The prompt to display to the user.
-    default (str): The default value to use if the user doesn't provide input.
+    input_file (str): Path to the input PDF file.
+    output_file (str): Path to the output text file.
+    language (str): Language code for OCR.
+    hocr (bool): Whether to output hOCR format instead of plain text.
+    jobs (Optional[int]): Number of pages OCRmyPDF processes in parallel (its own default if None).
     
     Returns:
-    str: The user's input or the default value.
+    List[str]: The command line.
     """
-    user_input = input(f"{prompt} [{default}]: ").strip()
-    return user_input if user_input else default
+    # Base command
+    cmd = [
+        "ocrmypdf",
+        "-l", language,
+        "--sidecar", output_file,
+        "--output-type", "none",
+        "--tesseract-config", "tessedit_pageseg_mode=6",
+    ]
+    
+    if jobs:
+        cmd.extend(["--jobs", str(jobs)])
+    
+    # Add hOCR output if requested
+    if hocr:
+        cmd.extend(["--sidecar-format", "hocr"])
+    
+    cmd.extend([input_file, "/dev/null"])  # Discard PDF output
+    return cmd
 
 def process_pdf(input_file: str, output_file: str, language: str, hocr: bool = False) -> bool:
     """
@@ -36,23 +65,8 @@ def process_pdf(input_file: str, output_file: str, language: str, hocr: bool = F
     bool: True if processing was successful, False otherwise.
     """
     try:
-        # Base command
-        cmd = [
-            "ocrmypdf",
-            "-l", language,
-            "--sidecar", output_file,
-            "--output-type", "none",
-            "--tesseract-config", "tessedit_pageseg_mode=6",
-            input_file,
-            "/dev/null"  # Discard PDF output
-        ]
-        
-        # Add hOCR output if requested
-        if hocr:
-            cmd.extend(["--sidecar-format", "hocr"])
-        
         # Run OCRmyPDF command
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        subprocess.run(build_command(input_file, output_file, language, hocr), check=True, capture_output=True, text=True)
         logging.info(f"Successfully processed: {input_file}")
         return True
     except subprocess.CalledProcessError as e:
@@ -62,30 +76,46 @@ def process_pdf(input_file: str, output_file: str, language: str, hocr: bool = F
 
 def main():
     """
-    Main function to process all PDF files in the input directory.
+    Main function to process all PDF files of the input directory or manifest (optionally one shard of it).
     """
-    # Get user input for directories and language
-    input_dir = get_user_input("Enter input directory", "/home/aaron/Anuk_neu_zu_verarbeiten_08_08_24")
-    output_dir = get_user_input("Enter output directory", "/home/aaron/Anuk_neu_hochladen_08_08_24")
-    language = get_user_input("Enter language code for OCR", "deu")
-    hocr_output = get_user_input("Use hOCR output for better table recognition? (yes/no)", "no").lower() == "yes"
-
-    failed_files: List[str] = []
+    parser = argparse.ArgumentParser(description="Run OCRmyPDF on a batch of PDFs and write text or hOCR (plus CSV) sidecars.")
+    add_batch_arguments(parser)
+    parser.add_argument("--language", default="deu", help="Language code for OCR")
+    parser.add_argument("--hocr", action="store_true", help="Use hOCR output for better table recognition (converted to CSV)")
+    parser.add_argument("--core-budget", type=int, default=os.cpu_count() or 1,
+                        help="Total CPU core budget for all OCRmyPDF processes")
+    args = parse_batch_args(parser, engine='ocrmypdf')
 
     # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def finish(output_path: str, claim: Optional[Claim], ok: bool) -> bool:
+        """Runs as soon as the OCRmyPDF process of a file has exited."""
+        try:
+            if ok and args.hocr:
+                # Turn the hOCR sidecar into a CSV table using the word geometry
+                hocr_to_csv(output_path, f"{os.path.splitext(output_path)[0]}.csv")
+        except Exception as e:
+            logging.error(f"Error converting {output_path} to CSV: {e}")
+            ok = False
+        if claim is not None:
+            if ok:
+                claim.done()
+            else:
+                claim.release()
+        return ok
+
+    def tasks():
+        # Claimed lazily: a file is only locked when the scheduler has a free core for it
+        for input_path, claim in claimed_inputs(args):
+            output_ext = ".hocr" if args.hocr else ".txt"
+            output_path = output_path_for(args, input_path, output_ext)
+            yield OcrTask(input_path, partial(build_command, input_path, output_path, args.language, args.hocr),
+                          on_done=partial(finish, output_path, claim))
 
-    # Process each PDF file in the input directory
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            input_path = os.path.join(input_dir, filename)
-            output_ext = ".hocr" if hocr_output else ".txt"
-            output_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}{output_ext}")
-            
-            logging.info(f"Processing: {filename}")
-            
-            if not process_pdf(input_path, output_path, language, hocr_output):
-                failed_files.append(filename)
+    # Several small files run at once, large files get several pages in parallel
+    results = CoreBudgetScheduler(args.core_budget).run(tasks())
+    failed_files: List[str] = [os.path.basename(path) for path, ok in results.items() if not ok]
 
     # Report on failed files
     if failed_files:
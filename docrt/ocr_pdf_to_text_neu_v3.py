@@ -1,27 +1,27 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import subprocess
 import logging
+import argparse
 from typing import List
 import pytesseract
 from pdf2image import convert_from_path
 from PIL import Image
 import re
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from batch_cli import add_batch_arguments, parse_batch_args, claimed_inputs, output_path_for
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_user_input(prompt: str, default: str) -> str:
-    """Prompt the user for input with a default value."""
-    user_input = input(f"{prompt} [{default}]: ").strip()
-    return user_input if user_input else default
-
-def process_pdf(input_file: str, output_file: str, language: str) -> bool:
-    """Process a single PDF file using OCR and convert to Markdown."""
+def process_pdf(input_file: str, output_file: str, language: str, dpi: int = 200) -> bool:
+    """Process a single PDF file using OCR (rendered at dpi) and convert to Markdown."""
     try:
         # Convert PDF to images
-        images = convert_from_path(input_file)
+        images = convert_from_path(input_file, dpi=dpi)
         
         markdown_content = f"# {os.path.basename(input_file)}\n\n"
         
@@ -81,26 +81,31 @@ def convert_to_markdown_table(table_content: List[str]) -> str:
     return '\n'.join(table_content)
 
 def main():
-    """Main function to process all PDF files in the input directory."""
-    input_dir = get_user_input("Enter input directory", "/home/aaron/Anuk_neu_zu_verarbeiten_08_08_24")
-    output_dir = get_user_input("Enter output directory", "/home/aaron/Anuk_neu_hochladen_08_08_24")
-    language = get_user_input("Enter language code for OCR", "deu")
+    """Main function to process all PDF files of the input directory or manifest (optionally one shard of it)."""
+    parser = argparse.ArgumentParser(description="OCR a batch of PDFs and write the tables as Markdown.")
+    add_batch_arguments(parser)
+    parser.add_argument("--language", default="deu", help="Language code for OCR")
+    parser.add_argument("--dpi", type=int, default=200, help="Render resolution of the PDF pages")
+    args = parse_batch_args(parser, engine='tesseract')
 
     failed_files: List[str] = []
 
     # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
 
-    # Process each PDF file in the input directory
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.md")
-            
-            logging.info(f"Processing: {filename}")
-            
-            if not process_pdf(input_path, output_path, language):
-                failed_files.append(filename)
+    # Process each PDF file of this shard that no other node has claimed
+    for input_path, claim in claimed_inputs(args):
+        filename = os.path.basename(input_path)
+        output_path = output_path_for(args, input_path, ".md")
+
+        logging.info(f"Processing: {filename}")
+
+        if not process_pdf(input_path, output_path, args.language, args.dpi):
+            failed_files.append(filename)
+            if claim is not None:
+                claim.release()
+        elif claim is not None:
+            claim.done()
 
     # Report on failed files
     if failed_files:
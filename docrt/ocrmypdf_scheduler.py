@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import tempfile
+import subprocess
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class OcrTask:
+    """
+    One file for OCRmyPDF.
+
+    build_command receives the --jobs value chosen by the scheduler and returns the full
+    command line; pages is filled in by the scheduler if left at 0. on_done is called with the
+    success of the OCRmyPDF run as soon as its process has exited (post-processing, releasing
+    locks); its return value becomes the task's result.
+    """
+    input_file: str
+    build_command: Callable[[int], List[str]]
+    pages: int = 0
+    on_done: Optional[Callable[[bool], bool]] = None
+
+
+@dataclass
+class RunningTask:
+    task: OcrTask
+    process: subprocess.Popen
+    stderr_file: object
+    cores: int
+    started: float = field(default_factory=time.perf_counter)
+
+
+def count_pages(pdf_path: str) -> int:
+    """Return the page count of a PDF (PyMuPDF, falling back to pdfinfo; 1 if both fail)."""
+    try:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception:
+        pass
+    try:
+        output = subprocess.run(["pdfinfo", pdf_path], check=True, capture_output=True, text=True).stdout
+        for line in output.splitlines():
+            if line.startswith("Pages:"):
+                return int(line.split()[1])
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+    return 1
+
+
+class CoreBudgetScheduler:
+    """
+    Runs OCRmyPDF processes side by side within a fixed number of CPU cores.
+
+    Each file gets --jobs (parallel pages) and OMP_THREAD_LIMIT (Tesseract threads per page)
+    so that jobs * threads never exceeds the cores still free. Small files run concurrently
+    with one core each; large files get up to one core per page. stdout and stderr go to
+    temporary files, so a chatty process can never block on a full pipe.
+    """
+
+    def __init__(self, core_budget: int, poll_interval: float = 0.05):
+        self.core_budget = max(1, core_budget)
+        self.poll_interval = poll_interval
+
+    def plan(self, pages: int, free: int, more_waiting: bool) -> Optional[Tuple[int, int]]:
+        """
+        Choose (jobs, omp_threads) for a file, or None if it should wait for cores.
+
+        A file wants one core per page up to the whole budget. It starts as soon as at least
+        half of that is free, so large files neither block the queue nor starve.
+        When nothing else is waiting, spare cores go to Tesseract's OpenMP threads.
+        """
+        desired = max(1, min(pages, self.core_budget))
+        if free < max(1, desired // 2):
+            return None
+        jobs = min(desired, free)
+        omp_threads = 1
+        if not more_waiting and jobs < free:
+            # Tesseract profits little beyond 4 threads per page
+            omp_threads = max(1, min(4, free // jobs))
+        return jobs, omp_threads
+
+    def _start(self, task: OcrTask, jobs: int, omp_threads: int) -> RunningTask:
+        env = dict(os.environ, OMP_THREAD_LIMIT=str(omp_threads))
+        stderr_file = tempfile.TemporaryFile(mode='w+')
+        process = subprocess.Popen(task.build_command(jobs), env=env,
+                                   stdout=subprocess.DEVNULL, stderr=stderr_file, text=True)
+        logging.info(f"Started {task.input_file}: {task.pages} pages, --jobs {jobs}, OMP_THREAD_LIMIT={omp_threads}")
+        return RunningTask(task, process, stderr_file, jobs * omp_threads)
+
+    def _complete(self, task: OcrTask, ok: bool) -> bool:
+        if task.on_done is None:
+            return ok
+        try:
+            return bool(task.on_done(ok))
+        except Exception as e:
+            logging.error(f"Error finishing {task.input_file}: {e}")
+            return False
+
+    def _finish(self, running: RunningTask) -> bool:
+        running.stderr_file.seek(0)
+        stderr = running.stderr_file.read()
+        running.stderr_file.close()
+        elapsed = time.perf_counter() - running.started
+        if running.process.returncode == 0:
+            logging.info(f"Successfully processed: {running.task.input_file} ({elapsed:.1f} s)")
+            return self._complete(running.task, True)
+        logging.error(f"Error processing {running.task.input_file}: exit code {running.process.returncode}")
+        logging.error(f"OCRmyPDF stderr: {stderr}")
+        return self._complete(running.task, False)
+
+    def run(self, tasks: Iterable[OcrTask]) -> Dict[str, bool]:
+        """
+        Process all tasks and return {input_file: success}.
+        Tasks are pulled lazily from the iterable, one at a time, as cores become free.
+        """
+        results: Dict[str, bool] = {}
+        running: List[RunningTask] = []
+        task_iter: Iterator[OcrTask] = iter(tasks)
+        pending: Optional[OcrTask] = next(task_iter, None)
+        upcoming: Optional[OcrTask] = next(task_iter, None) if pending else None
+
+        while pending or running:
+            # Abgeschlossene Prozesse einsammeln
+            for item in [r for r in running if r.process.poll() is not None]:
+                running.remove(item)
+                results[item.task.input_file] = self._finish(item)
+
+            # So viele Dateien starten, wie das Budget zulässt
+            while pending:
+                if not pending.pages:
+                    pending.pages = count_pages(pending.input_file)
+                free = self.core_budget - sum(r.cores for r in running)
+                plan = self.plan(pending.pages, free, more_waiting=upcoming is not None)
+                if plan is None:
+                    break
+                try:
+                    running.append(self._start(pending, *plan))
+                except OSError as e:
+                    logging.error(f"Error starting OCRmyPDF for {pending.input_file}: {e}")
+                    results[pending.input_file] = self._complete(pending, False)
+                pending, upcoming = upcoming, (next(task_iter, None) if upcoming else None)
+
+            if running:
+                time.sleep(self.poll_interval)
+
+        return results
@@ -1,13 +1,49 @@
 import os
+import sys
+import argparse
+from functools import lru_cache
 from paddleocr import PaddleOCR, draw_ocr
 import pandas as pd
 
-# PaddleOCR initialisieren mit deutschem Modell
-ocr = PaddleOCR(use_angle_cls=True, lang='german')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from ocr_backends import to_rgb
+from autotune import tuned_backend_kwargs
+from page_orientation import correct_orientation
+from page_source import open_source
 
-def process_image(image_path):
+@lru_cache(maxsize=None)
+def get_ocr(per_box_cls=False):
+    # PaddleOCR initialisieren mit deutschem Modell
+    # Mit PADDLE_ONNX_DIR laufen die nach ONNX exportierten Modelle (pipeline/onnx_inference.py) auf ONNX Runtime
+    onnx_kwargs = {}
+    if os.environ.get('PADDLE_ONNX_DIR'):
+        from onnx_inference import paddle_onnx_kwargs
+        onnx_kwargs = paddle_onnx_kwargs(os.environ['PADDLE_ONNX_DIR'], 'german', os.environ.get('PADDLE_ONNX_INT8') == '1')
+    # Batchgröße der Erkennung (rec_batch_num) und Threads aus dem Autotune-Profil dieses Rechners
+    tuned = tuned_backend_kwargs('paddle_onnx' if onnx_kwargs else 'paddle')
+    # Winkelklassifikator pro Textbox nur auf Wunsch, sonst wird die Seite einmal als Ganzes ausgerichtet
+    return PaddleOCR(use_angle_cls=per_box_cls, lang='german', **onnx_kwargs, **tuned)
+
+def read_crops(crops):
+    # Nur Erkennung (ohne Detektion) für die Probezeilen der Ausrichtungserkennung
+    results = []
+    for crop in crops:
+        result = get_ocr().ocr(to_rgb(crop), det=False, cls=False)
+        text, conf = result[0][0] if result and result[0] else ('', 0.0)
+        results.append((text, float(conf)))
+    return results
+
+def ocr_page(image, per_box_cls=False, label=''):
     # OCR durchführen
-    result = ocr.ocr(image_path, cls=True)
+    if per_box_cls:
+        # Seiten mit gemischter Ausrichtung: Winkel für jede Textbox einzeln bestimmen
+        result = get_ocr(True).ocr(to_rgb(image), cls=True)
+    else:
+        # Ausrichtung (0/90/180/270) einmal pro Seite bestimmen, danach ohne Winkelklassifikator
+        image, orientation = correct_orientation(image, reader=read_crops)
+        if orientation.angle:
+            print(f"Seite um {orientation.angle}° gedreht: {label}")
+        result = get_ocr().ocr(to_rgb(image), cls=False)
     
     # Ergebnisse extrahieren
     data = []
@@ -16,17 +52,29 @@ def process_image(image_path):
         for word_info in line:
             row.append(word_info[1][0]) # Text extrahieren
         data.append(row)
-    
+    return data
+
+def process_image(image_path, per_box_cls=False):
+    # Bild, mehrseitiges TIFF, PDF oder Verzeichnis: Seiten werden einzeln dekodiert, ohne Umweg über PDF
+    with open_source(image_path) as source:
+        for index, image in enumerate(source):
+            info = source.info(index)
+            base_path = os.path.splitext(info.path)[0]
+            if info.frames > 1:
+                base_path += f"_seite{info.frame + 1}"
+            save_results(ocr_page(image, per_box_cls, f"{info.path} Seite {info.frame + 1}"), base_path)
+
+def save_results(data, base_path):
     # Daten in ein DataFrame konvertieren
     df = pd.DataFrame(data)
     
     # Als CSV speichern
-    csv_path = os.path.splitext(image_path)[0] + '.csv'
+    csv_path = base_path + '.csv'
     df.to_csv(csv_path, index=False, header=False)
     print(f"CSV gespeichert als {csv_path}")
     
     # Als Markdown speichern
-    md_path = os.path.splitext(image_path)[0] + '.md'
+    md_path = base_path + '.md'
     try:
         md_content = df.to_markdown(index=False, headers=False)
         with open(md_path, 'w', encoding='utf-8') as f:
@@ -39,12 +87,20 @@ def process_image(image_path):
             f.write(df.to_string(index=False, header=False))
     
     # Als Text speichern
-    txt_path = os.path.splitext(image_path)[0] + '.txt'
+    txt_path = base_path + '.txt'
     with open(txt_path, 'w', encoding='utf-8') as f:
         for row in data:
             f.write(' '.join(row) + '\n')
     print(f"Text gespeichert als {txt_path}")
 
-# Beispielaufruf
-image_path = '/home/aaron/Anuk_Test_CORS_Pics/Chris_Bilanzvergleich_2013-2017-1.jpg'
-process_image(image_path)
+def main():
+    parser = argparse.ArgumentParser(description="Extract tables from page images with PaddleOCR into CSV, Markdown and text files.")
+    parser.add_argument("images", nargs="+", help="Page images, multi-page TIFFs, PDFs or directories of them")
+    parser.add_argument("--per-box-cls", action="store_true",
+                        help="Classify the angle of every text box (slow; for pages with mixed orientation)")
+    args = parser.parse_args()
+    for image_path in args.images:
+        process_image(image_path, args.per_box_cls)
+
+if __name__ == "__main__":
+    main()
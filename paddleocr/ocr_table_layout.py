@@ -0,0 +1,148 @@
+import os
+import sys
+import argparse
+from html.parser import HTMLParser
+
+import cv2
+import pandas as pd
+from paddleocr import PPStructure
+
+# Layout-Analyse läuft auf einer verkleinerten Seite; das Layout-Modell skaliert
+# intern ohnehin auf ca. 800 Pixel herunter
+LAYOUT_MAX_SIDE = 1024
+# Rand um erkannte Tabellen, damit keine Randzellen abgeschnitten werden
+TABLE_MARGIN = 10
+
+# Nur Layout-Analyse, keine Tabellen- oder Texterkennung
+layout_engine = PPStructure(table=False, ocr=False, show_log=False, use_gpu=False)
+# Nur Tabellenstruktur + OCR, das ganze Eingabebild wird als Tabelle behandelt
+table_engine = PPStructure(layout=False, show_log=False, use_gpu=False)
+
+
+class TableHTMLParser(HTMLParser):
+    """Wandelt das HTML einer PP-Structure-Tabelle in eine Liste von Zeilen um."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._colspan = 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th'):
+            self._cell = []
+            self._colspan = int(dict(attrs).get('colspan') or 1)
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._row is not None:
+            self._row.append(''.join(self._cell).strip())
+            # Verbundene Zellen mit leeren Zellen auffüllen, damit die Spalten stimmen
+            self._row.extend([''] * (self._colspan - 1))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def html_to_rows(html):
+    """Parst eine HTML-Tabelle und gibt rechteckig aufgefüllte Zeilen zurück."""
+    parser = TableHTMLParser()
+    parser.feed(html)
+    rows = parser.rows
+    if not rows:
+        return []
+    max_cols = max(len(row) for row in rows)
+    return [row + [''] * (max_cols - len(row)) for row in rows]
+
+
+def detect_table_regions(image, max_side=LAYOUT_MAX_SIDE, margin=TABLE_MARGIN):
+    """
+    Findet Tabellenbereiche per Layout-Analyse auf einer verkleinerten Kopie der Seite.
+    Input:
+    - image: Seite in voller Auflösung (NumPy-Array, BGR)
+    - max_side: Maximale Kantenlänge der Kopie für die Layout-Analyse
+    - margin: Rand in Pixeln (volle Auflösung) um jede Tabelle
+    Output:
+    - Liste von Bounding-Boxen (x1, y1, x2, y2) in voller Auflösung, von oben nach unten sortiert
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    small = image if scale == 1.0 else cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    regions = []
+    for region in layout_engine(small):
+        if region['type'].lower() != 'table':
+            continue
+        x1, y1, x2, y2 = (c / scale for c in region['bbox'])
+        regions.append((
+            max(0, int(x1) - margin),
+            max(0, int(y1) - margin),
+            min(w, int(x2) + margin),
+            min(h, int(y2) + margin),
+        ))
+
+    regions.sort(key=lambda box: (box[1], box[0]))
+    return regions
+
+
+def recognize_table(crop):
+    """
+    Führt Tabellenstruktur- und Texterkennung nur auf einem Tabellenausschnitt aus.
+    Input:
+    - crop: Ausschnitt der Seite (NumPy-Array, BGR)
+    Output:
+    - Liste von Zeilen (Listen von Zellentexten)
+    """
+    for region in table_engine(crop):
+        res = region.get('res')
+        if isinstance(res, dict) and res.get('html'):
+            return html_to_rows(res['html'])
+    return []
+
+
+def process_image(image_path, max_side=LAYOUT_MAX_SIDE):
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"Fehler: {image_path} konnte nicht gelesen werden.")
+        return []
+
+    regions = detect_table_regions(image, max_side=max_side)
+    if not regions:
+        print(f"Keine Tabelle gefunden in {image_path}")
+        return []
+
+    csv_paths = []
+    for table_index, (x1, y1, x2, y2) in enumerate(regions, start=1):
+        rows = recognize_table(image[y1:y2, x1:x2])
+        if not rows:
+            continue
+
+        # Zellen direkt als CSV speichern
+        df = pd.DataFrame(rows)
+        csv_path = f"{os.path.splitext(image_path)[0]}_tabelle_{table_index}.csv"
+        df.to_csv(csv_path, index=False, header=False, lineterminator='\n')
+        print(f"CSV gespeichert als {csv_path}")
+        csv_paths.append(csv_path)
+
+    return csv_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabellen per Layout-Analyse finden und nur dort OCR ausführen.")
+    parser.add_argument("images", nargs='+', help="Pfad(e) zu den Bildern")
+    parser.add_argument("--layout-max-side", type=int, default=LAYOUT_MAX_SIDE,
+                        help="Maximale Kantenlänge der verkleinerten Seite für die Layout-Analyse")
+    args = parser.parse_args()
+
+    for image_path in args.images:
+        if not os.path.exists(image_path):
+            print(f"Fehler: Die Datei {image_path} existiert nicht.")
+            sys.exit(1)
+        process_image(image_path, max_side=args.layout_max_side)
@@ -0,0 +1,93 @@
+import math
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Preferred x-height (height of lowercase letters) in pixels per engine.
+# Tesseract is most accurate with capital letters of about 30 px, i.e. an x-height of about 20 px;
+# the doctr and PaddleOCR recognizers rescale text crops to 32 px (doctr) or 48 px (Paddle) line height.
+PREFERRED_XHEIGHT_PX = {
+    'tesseract': 20,
+    'ocrmypdf': 20,
+    'doctr': 14,
+    'paddle': 16,
+    'doctr_onnx': 14,
+    'paddle_onnx': 16,
+}
+PROBE_DPI = 96
+MIN_DPI = 100
+MAX_DPI = 600
+DPI_STEP = 25
+# Used when no text can be measured on the probe (blank or image-only pages)
+FALLBACK_DPI = 200
+
+
+def estimate_xheight_pt(probe: np.ndarray, probe_dpi: int = PROBE_DPI) -> Optional[float]:
+    """
+    Estimate the dominant x-height of the text on a low-resolution grayscale rendering.
+
+    Lowercase letters are the most frequent connected components on a text page, so the most
+    common component height is taken as x-height. Lines, specks and merged blobs are filtered out.
+
+    Returns:
+    Optional[float]: x-height in points (1/72 inch), or None if no text was found.
+    """
+    _, binary = cv2.threshold(probe, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    max_height = max(3, probe.shape[0] // 20)
+    glyphs = (heights >= 2) & (heights <= max_height) & (widths <= 8 * heights) & (areas >= 3)
+    if np.count_nonzero(glyphs) < 20:
+        return None
+    dominant = int(np.argmax(np.bincount(heights[glyphs])))
+    return dominant * 72.0 / probe_dpi
+
+
+def choose_dpi(xheight_pt: Optional[float], engine: str = 'tesseract',
+               min_dpi: int = MIN_DPI, max_dpi: int = MAX_DPI, step: int = DPI_STEP) -> int:
+    """Lowest DPI (rounded up to step, clamped to [min_dpi, max_dpi]) that renders the x-height at the engine's preferred size."""
+    if not xheight_pt:
+        return FALLBACK_DPI
+    dpi = PREFERRED_XHEIGHT_PX[engine] * 72.0 / xheight_pt
+    return int(min(max_dpi, max(min_dpi, math.ceil(dpi / step) * step)))
+
+
+def render_page_adaptive(page, engine: str = 'tesseract', probe_dpi: int = PROBE_DPI) -> Tuple[np.ndarray, int]:
+    """
+    Render a PyMuPDF page at the DPI chosen from a low-resolution probe.
+
+    Args:
+    page: PyMuPDF page.
+    engine (str): Key of PREFERRED_XHEIGHT_PX.
+    probe_dpi (int): Resolution of the probe rendering.
+
+    Returns:
+    (np.ndarray, int): Grayscale page image and the DPI it was rendered at.
+    """
+    import fitz  # PyMuPDF
+
+    def render(dpi):
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+    dpi = choose_dpi(estimate_xheight_pt(render(probe_dpi), probe_dpi), engine)
+    return render(dpi), dpi
+
+
+def convert_from_path_adaptive(pdf_path: str, engine: str = 'doctr', probe_dpi: int = PROBE_DPI) -> Iterator[Tuple[object, int]]:
+    """
+    pdf2image counterpart of render_page_adaptive: probes all pages in one low-resolution pass,
+    then renders each page alone at its own DPI.
+
+    Returns:
+    Iterator[Tuple[PIL.Image.Image, int]]: (RGB page image, DPI) per page.
+    """
+    from pdf2image import convert_from_path
+
+    probes = convert_from_path(pdf_path, dpi=probe_dpi, grayscale=True)
+    for page_number, probe in enumerate(probes, start=1):
+        dpi = choose_dpi(estimate_xheight_pt(np.array(probe), probe_dpi), engine)
+        yield convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0], dpi
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import socket
+import difflib
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Environment variable pointing the batch drivers at a profile; the default is one profile per host
+PROFILE_ENV = 'OCR_TUNE_PROFILE'
+# Thread pools of NumPy/OpenBLAS, MKL, PyTorch, ONNX Runtime (OpenMP) and Tesseract
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'OMP_THREAD_LIMIT')
+# A setting replaces the current best only if it is at least this much faster (measurement noise)
+MIN_GAIN = 0.03
+# Largest drop of the text agreement with the reference setting that a lower DPI or another batch size may cause
+DEFAULT_MAX_DELTA = 0.02
+# Recognizer batch sizes tried per engine (doctr reco_bs, PaddleOCR rec_batch_num)
+BATCH_SIZES = {
+    'doctr': [32, 64, 128, 256],
+    'paddle': [6, 12, 24, 48],
+    'paddle_onnx': [6, 12, 24, 48],
+}
+DPIS = [150, 200, 250, 300]
+REFERENCE_DPI = 300
+
+
+def profile_path(path: Optional[str] = None) -> str:
+    """The profile file: explicit path, $OCR_TUNE_PROFILE, or ~/.config/ocr_tables/autotune-<host>.json."""
+    return path or os.environ.get(PROFILE_ENV) or os.path.join(
+        os.path.expanduser('~'), '.config', 'ocr_tables', f"autotune-{socket.gethostname()}.json")
+
+
+def load_profile(path: Optional[str] = None) -> Dict:
+    try:
+        with open(profile_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def engine_settings(engine: str, path: Optional[str] = None) -> Dict:
+    """Tuned settings of one engine ({} if it was never tuned on this host)."""
+    return load_profile(path).get('engines', {}).get(engine, {}).get('settings', {})
+
+
+def save_engine_profile(engine: str, entry: Dict, path: Optional[str] = None) -> str:
+    """Store the result of one engine in the profile, keeping the other engines; written atomically."""
+    path = profile_path(path)
+    profile = load_profile(path)
+    profile.update(host=socket.gethostname(), cpu_count=os.cpu_count())
+    profile.setdefault('engines', {})[engine] = entry
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def apply_thread_settings(threads: Optional[int]):
+    """
+    Limit the intra-op threads of the numeric libraries of this process. Environment variables the
+    user set explicitly are kept; libraries that are already loaded are configured directly.
+    """
+    if not threads:
+        return
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+    # Bereits importierte Bibliotheken lesen die Umgebung nicht erneut
+    if 'cv2' in sys.modules:
+        sys.modules['cv2'].setNumThreads(threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+
+
+def backend_kwargs(engine: str, settings: Dict) -> Dict:
+    """create_backend arguments for the tuned batch size and threads of an engine."""
+    kwargs = {}
+    if settings.get('batch_size'):
+        if engine == 'doctr':
+            kwargs['reco_batch_size'] = settings['batch_size']
+        elif engine in ('paddle', 'paddle_onnx'):
+            kwargs['rec_batch_num'] = settings['batch_size']
+    if engine == 'doctr_onnx' and settings.get('threads'):
+        kwargs['threads'] = settings['threads']
+    return kwargs
+
+
+def tuned_backend_kwargs(engine: str, path: Optional[str] = None) -> Dict:
+    """
+    create_backend arguments from this host's profile for drivers that load a model backend
+    directly (not through batch_cli); also applies the tuned thread count to this process.
+    {} if the engine was never tuned here or the profile is 'none' (argument or $OCR_TUNE_PROFILE).
+    """
+    if (path or os.environ.get(PROFILE_ENV)) == 'none':
+        return {}
+    settings = engine_settings(engine, path)
+    if not settings:
+        return {}
+    apply_thread_settings(settings.get('threads'))
+    kwargs = backend_kwargs(engine, settings)
+    logging.info(f"Autotune profile {profile_path(path)} for {engine}: threads {settings.get('threads')}, {kwargs}")
+    return kwargs
+
+
+def search_space(engine: str, cpus: int) -> Dict[str, List[int]]:
+    """Values tried per setting; workers and threads (or jobs) as powers of two up to the core count."""
+    powers = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpus]
+    if engine == 'ocrmypdf':
+        return {'workers': powers, 'jobs': powers}
+    space = {'workers': powers, 'threads': powers, 'dpi': DPIS}
+    if engine in BATCH_SIZES:
+        space['batch_size'] = BATCH_SIZES[engine]
+    return space
+
+
+def start_settings(engine: str, cpus: int) -> Dict[str, int]:
+    """Library defaults: one process using all cores, 300 dpi."""
+    if engine == 'ocrmypdf':
+        return {'workers': 1, 'jobs': cpus}
+    start = {'workers': 1, 'threads': cpus, 'dpi': REFERENCE_DPI}
+    if engine in BATCH_SIZES:
+        start['batch_size'] = {'doctr': 128, 'paddle': 6, 'paddle_onnx': 6}[engine]
+    return start
+
+
+def fit_cores(settings: Dict[str, int], changed: str, cpus: int) -> Dict[str, int]:
+    """Keep workers x threads (or jobs) within the cores by lowering the setting that was not just changed."""
+    per_worker = 'jobs' if 'jobs' in settings else 'threads'
+    if settings['workers'] * settings[per_worker] <= cpus:
+        return settings
+    other = per_worker if changed == 'workers' else 'workers'
+    fixed = settings['workers'] if other == per_worker else settings[per_worker]
+    return dict(settings, **{other: max(1, cpus // fixed)})
+
+
+def coordinate_descent(space: Dict[str, List[int]], start: Dict[str, int], evaluate: Callable[[Dict], Optional[float]],
+                       rounds: int = 2, deadline: Optional[float] = None,
+                       adjust: Optional[Callable[[Dict, str], Dict]] = None) -> Tuple[Dict[str, int], float]:
+    """
+    Maximize evaluate over the settings, one setting at a time with the others fixed, for up to rounds
+    sweeps (fewer once a sweep brings no gain or the deadline has passed). adjust repairs a candidate
+    after one setting changed (e.g. fit_cores). evaluate returns None for settings that are not
+    allowed or failed; every setting is measured at most once.
+    """
+    cache: Dict[Tuple, Optional[float]] = {}
+
+    def score(settings):
+        key = tuple(sorted(settings.items()))
+        if key not in cache:
+            cache[key] = evaluate(settings)
+        return cache[key]
+
+    best = dict(start)
+    best_score = score(best)
+    if best_score is None:
+        raise RuntimeError(f"Start settings {best} failed; nothing to compare against")
+    for _ in range(rounds):
+        improved = False
+        for knob, values in space.items():
+            for value in values:
+                if deadline is not None and time.time() > deadline:
+                    logging.warning("Time budget used up; keeping the best settings so far")
+                    return best, best_score
+                if value == best[knob]:
+                    continue
+                candidate = dict(best, **{knob: value})
+                if adjust is not None:
+                    candidate = adjust(candidate, knob)
+                result = score(candidate)
+                if result is not None and result > best_score * (1 + MIN_GAIN):
+                    best, best_score, improved = candidate, result, True
+                    logging.info(f"New best {best}: {best_score:.2f} pages/s")
+        if not improved:
+            break
+    return best, best_score
+
+
+def sample_pages(inputs: List[str], count: int) -> List[Tuple[str, int]]:
+    """(path, page index) of up to count pages, spread over the input files (first pages first)."""
+    from batch_cli import iter_inputs
+    from page_source import PAGE_EXTENSIONS, open_source
+
+    files = []
+    for path in inputs:
+        files.extend(iter_inputs(path, extensions=PAGE_EXTENSIONS) if os.path.isdir(path) else [path])
+    files = files[::max(1, len(files) // count)] if files else []
+    sizes = []
+    for path in files:
+        with open_source(path) as source:
+            sizes.append(len(source))
+    pages = []
+    for index in range(max(sizes, default=0)):
+        pages.extend((path, index) for path, size in zip(files, sizes) if index < size)
+        if len(pages) >= count:
+            break
+    return pages[:count]
+
+
+def generated_pages(count: int) -> List[str]:
+    """Render count synthetic table pages with benchmark/generate_corpus.py into a temporary directory."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+    from generate_corpus import generate_corpus
+
+    output_dir = tempfile.mkdtemp(prefix='autotune-')
+    return [os.path.join(output_dir, entry['pdf']) for entry in generate_corpus(output_dir, count, [REFERENCE_DPI])]
+
+
+def render(path: str, index: int, dpi: int):
+    """One page at dpi; image files with a known higher resolution are scaled down to it."""
+    import cv2
+    from page_source import open_source
+
+    with open_source(path, dpi) as source:
+        info = source.info(index)
+        image = source.page(index, 'RGB', dpi)
+    if not path.lower().endswith('.pdf') and info.dpi > dpi:
+        scale = dpi / info.dpi
+        image = cv2.resize(image, (int(image.shape[1] * scale), int(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _backend_worker(engine: str, settings: Dict, pages: List[Tuple[str, int]], barrier, queue):
+    """Child process: load the engine with the settings, warm up, wait for the others, then time the pages."""
+    try:
+        apply_thread_settings(settings.get('threads'))
+        from ocr_backends import create_backend
+
+        backend = create_backend(engine, **backend_kwargs(engine, settings))
+        backend.recognize(render(*pages[0], settings['dpi']))
+        barrier.wait()
+        texts = {}
+        start = time.perf_counter()
+        for path, index in pages:
+            words = backend.recognize(render(path, index, settings['dpi']))
+            texts[f"{path}#{index}"] = ' '.join(w.text for w in words)
+        seconds = time.perf_counter() - start
+        # ru_maxrss ist unter Linux in KiB angegeben
+        queue.put({'pages': len(pages), 'seconds': seconds, 'texts': texts,
+                   'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+    except Exception as e:
+        barrier.abort()
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def _ocrmypdf_worker(files: List[str], settings: Dict, language: str, queue):
+    """Child process: run OCRmyPDF on the files, settings['workers'] at a time with --jobs each."""
+    def run(path):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            subprocess.run(["ocrmypdf", "-l", language, "--jobs", str(settings['jobs']), "--output-type", "none",
+                            "--sidecar", os.path.join(tmp_dir, 'page.txt'), path, "/dev/null"],
+                           check=True, capture_output=True)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(settings['workers']) as pool:
+            list(pool.map(run, files))
+        seconds = time.perf_counter() - start
+        # Nur das Maximum eines Kindprozesses ist bekannt; gleichzeitig laufen bis zu workers davon
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024 * min(settings['workers'], len(files))
+        queue.put({'seconds': seconds, 'peak_rss_mb': peak})
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+class Measurement:
+    """
+    Measures pages per second and peak memory of one engine under given settings, every setting in
+    fresh processes (spawn), so thread settings and model memory of earlier runs do not carry over.
+    """
+
+    def __init__(self, engine: str, pages: List[Tuple[str, int]], cpus: int, max_memory_mb: Optional[float] = None,
+                 max_delta: float = DEFAULT_MAX_DELTA, language: str = 'deu', timeout: float = 600.0):
+        self.engine = engine
+        self.pages = pages
+        self.cpus = cpus
+        self.max_memory_mb = max_memory_mb
+        self.max_delta = max_delta
+        self.language = language
+        self.timeout = timeout
+        self.reference: Optional[Dict[str, str]] = None
+        self.results: List[Dict] = []
+        self._ctx = multiprocessing.get_context('spawn')
+
+    def _allowed(self, settings: Dict) -> bool:
+        per_worker = settings.get('threads', settings.get('jobs', 1))
+        return settings['workers'] * per_worker <= self.cpus
+
+    def _run(self, target, args_per_worker: List[Tuple], barrier=None) -> List[Dict]:
+        queue = self._ctx.Queue()
+        processes = [self._ctx.Process(target=target, args=args + ((barrier,) if barrier else ()) + (queue,))
+                     for args in args_per_worker]
+        for process in processes:
+            process.start()
+        try:
+            return [queue.get(timeout=self.timeout) for _ in processes]
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.kill()
+
+    def pdf_files(self) -> Dict[str, int]:
+        """PDFs of the sample with their page counts; OCRmyPDF always processes whole files."""
+        from page_source import open_source
+
+        files = {}
+        for path in sorted({path for path, _ in self.pages if path.lower().endswith('.pdf')}):
+            with open_source(path) as source:
+                files[path] = len(source)
+        if not files:
+            raise ValueError("Tuning ocrmypdf needs PDFs in the sample")
+        return files
+
+    def agreement(self, texts: Dict[str, str]) -> float:
+        """Mean similarity of the page texts to those of the reference setting (1.0 = identical)."""
+        common = [key for key in texts if key in self.reference]
+        if not common:
+            return 1.0
+        return sum(difflib.SequenceMatcher(None, self.reference[k], texts[k]).ratio() for k in common) / len(common)
+
+    def __call__(self, settings: Dict) -> Optional[float]:
+        if not self._allowed(settings):
+            return None
+        workers = settings['workers']
+        if self.engine == 'ocrmypdf':
+            files = self.pdf_files()
+            reports = self._run(_ocrmypdf_worker, [(list(files), settings, self.language)])
+            pages = sum(files.values())
+        else:
+            # Jeder Prozess braucht mindestens zwei Seiten; bei wenigen Seiten wird die Stichprobe wiederholt
+            per_worker = max(2, len(self.pages) // workers)
+            shares = [[self.pages[(w + i * workers) % len(self.pages)] for i in range(per_worker)] for w in range(workers)]
+            reports = self._run(_backend_worker, [(self.engine, settings, share) for share in shares],
+                                barrier=self._ctx.Barrier(workers))
+            pages = sum(r.get('pages', 0) for r in reports)
+        errors = [r['error'] for r in reports if 'error' in r]
+        if errors:
+            logging.warning(f"{settings} failed: {errors[0]}")
+            return None
+
+        throughput = pages / max(r['seconds'] for r in reports)
+        peak_mb = sum(r['peak_rss_mb'] for r in reports)
+        result = dict(settings=settings, pages_per_second=throughput, peak_rss_mb=peak_mb)
+        if self.engine != 'ocrmypdf':
+            texts = {k: v for r in reports for k, v in r['texts'].items()}
+            if self.reference is None:
+                self.reference = texts
+            result['agreement'] = self.agreement(texts)
+        self.results.append(result)
+        logging.info(f"{settings}: {throughput:.2f} pages/s, peak {peak_mb:.0f} MB"
+                     + (f", agreement {result['agreement']:.3f}" if 'agreement' in result else ""))
+
+        if self.max_memory_mb and peak_mb > self.max_memory_mb:
+            return None
+        if result.get('agreement', 1.0) < 1.0 - self.max_delta:
+            return None
+        return throughput
+
+
+def autotune(engine: str, pages: List[Tuple[str, int]], cpus: Optional[int] = None, max_memory_mb: Optional[float] = None,
+             max_delta: float = DEFAULT_MAX_DELTA, time_budget: float = 900.0, rounds: int = 2) -> Dict:
+    """
+    Search the fastest settings of one engine on sample pages.
+
+    Args:
+    engine (str): Backend name (ocr_backends.BACKEND_CLASSES) or 'ocrmypdf' for the OCRmyPDF command line.
+    pages (List[Tuple[str, int]]): Sample pages as (file, page index).
+    cpus (int): Cores available to the batch drivers (default: all).
+    max_memory_mb (float): Settings whose summed peak RSS exceeds this are not eligible.
+    max_delta (float): Largest allowed drop of text agreement with the 300 dpi reference.
+    time_budget (float): Seconds after which the search stops with the best settings so far.
+    rounds (int): Sweeps over all settings.
+
+    Returns:
+    Dict: Profile entry with the settings, their throughput and peak memory and all measurements.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    measure = Measurement(engine, pages, cpus, max_memory_mb, max_delta)
+    best, throughput = coordinate_descent(search_space(engine, cpus), start_settings(engine, cpus), measure,
+                                          rounds, time.time() + time_budget,
+                                          adjust=lambda settings, knob: fit_cores(settings, knob, cpus))
+    settings = dict(best)
+    if engine == 'ocrmypdf':
+        # ocr_pdf_to_text_neu_v2.py verteilt ein Kernbudget auf Dateien und --jobs
+        settings['core_budget'] = best['workers'] * best['jobs']
+    chosen = next(r for r in measure.results if r['settings'] == best)
+    return {
+        'settings': settings,
+        'pages_per_second': throughput,
+        'peak_rss_mb': chosen['peak_rss_mb'],
+        'sample_pages': len(pages),
+        'tuned': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'measurements': measure.results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the fastest worker, thread, batch size and DPI settings per engine "
+                                                 "on this host and store them in the profile the batch drivers load.")
+    parser.add_argument("engines", nargs="+", help="Engines to tune, e.g. doctr paddle tesseract ocrmypdf")
+    parser.add_argument("--corpus", nargs="*", help="Sample of the real inputs (files or directories); default: generated pages")
+    parser.add_argument("--sample", type=int, default=12, help="Number of pages measured per setting")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1, help="Cores the batch drivers may use")
+    parser.add_argument("--max-memory", help="Upper limit for the peak RSS of all workers together, e.g. 12G")
+    parser.add_argument("--max-delta", type=float, default=DEFAULT_MAX_DELTA,
+                        help="Largest drop of text agreement with the 300 dpi reference a setting may cause")
+    parser.add_argument("--time-budget", type=float, default=900.0, help="Seconds per engine")
+    parser.add_argument("--output", help=f"Profile file (default: ${PROFILE_ENV} or ~/.config/ocr_tables/autotune-<host>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    max_memory_mb = None
+    if args.max_memory:
+        from memory_budget import parse_size
+        max_memory_mb = parse_size(args.max_memory) / 2**20
+    pages = sample_pages(args.corpus or generated_pages(args.sample), args.sample)
+    if not pages:
+        parser.error("No pages found in the corpus")
+    for engine in args.engines:
+        logging.info(f"Tuning {engine} on {len(pages)} pages, {args.cpus} cores")
+        entry = autotune(engine, pages, args.cpus, max_memory_mb, args.max_delta, args.time_budget)
+        path = save_engine_profile(engine, entry, args.output)
+        logging.info(f"{engine}: {entry['settings']} ({entry['pages_per_second']:.2f} pages/s) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
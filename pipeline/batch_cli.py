@@ -0,0 +1,259 @@
+import os
+import glob
+import json
+import time
+import socket
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+from autotune import apply_thread_settings, engine_settings, profile_path
+
+# A lock whose heartbeat is older than this belongs to a crashed node and may be taken over
+DEFAULT_LOCK_TIMEOUT = 600.0
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser):
+    """Add the options shared by all batch scripts: inputs, output, config file, sharding and locking."""
+    group = parser.add_argument_group("batch")
+    group.add_argument("--config", help="JSON file with default values for any option (keys as the option names with _)")
+    group.add_argument("--input-dir", help="Directory with the input files")
+    group.add_argument("--manifest", help="Text file with one input path per line (relative to the manifest), instead of --input-dir")
+    group.add_argument("--output-dir", help="Directory for the results")
+    group.add_argument("--shard", default="0/1", help="Process only shard i of N (0-based, e.g. 2/8), by hash of the file path")
+    group.add_argument("--lock-dir", help="Shared directory for claim lock files; lets several nodes work through one inbox")
+    group.add_argument("--lock-timeout", type=float, default=DEFAULT_LOCK_TIMEOUT,
+                       help="Seconds without heartbeat after which another node may take over a claimed file")
+    group.add_argument("--profile", help="Settings found by autotune.py (default: $OCR_TUNE_PROFILE or the profile of "
+                                         "this host, if any); 'none' ignores it")
+
+
+def parse_batch_args(parser: argparse.ArgumentParser, argv: Optional[Sequence[str]] = None,
+                     engine: Optional[str] = None) -> argparse.Namespace:
+    """
+    Parse the command line; the tuned settings of engine (autotune.py profile) and then the values
+    from --config become defaults, so explicit options win. The profile's thread count is applied
+    to the process. Requires an output directory and either an input directory or a manifest.
+    """
+    pre_args, _ = parser.parse_known_args(argv)
+    if engine and pre_args.profile != 'none':
+        settings = engine_settings(engine, pre_args.profile)
+        if settings:
+            known = {action.dest for action in parser._actions}
+            # Nur Einstellungen übernehmen, die das Skript als Option kennt (z.B. dpi, core_budget)
+            parser.set_defaults(**{key: value for key, value in settings.items() if key in known})
+            apply_thread_settings(settings.get('threads'))
+            logging.info(f"Autotune profile {profile_path(pre_args.profile)} for {engine}: {settings}")
+            if settings.get('workers', 1) > 1:
+                logging.info(f"The profile recommends {settings['workers']} processes of this script per node (same --lock-dir)")
+    if pre_args.config:
+        with open(pre_args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"Unknown keys in {pre_args.config}: {', '.join(unknown)}")
+        parser.set_defaults(**config)
+    args = parser.parse_args(argv)
+    if not args.output_dir:
+        parser.error("--output-dir is required (on the command line or in --config)")
+    if not args.input_dir and not args.manifest:
+        parser.error("--input-dir or --manifest is required")
+    try:
+        args.shard_index, args.shard_count = parse_shard(args.shard)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse 'i/N' into (i, N) with 0 <= i < N."""
+    index, _, count = spec.partition('/')
+    index, count = int(index), int(count or 1)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}: expected i/N with 0 <= i < N")
+    return index, count
+
+
+def path_key(path: str, root: Optional[str] = None) -> str:
+    """Stable key of an input: SHA-1 of its path relative to the input root (same on every node)."""
+    relative = os.path.relpath(path, root) if root else path
+    return hashlib.sha1(relative.replace(os.sep, '/').encode('utf-8')).hexdigest()
+
+
+def in_shard(key: str, index: int, count: int) -> bool:
+    return int(key[:15], 16) % count == index
+
+
+def iter_inputs(input_dir: Optional[str] = None, manifest: Optional[str] = None,
+                extensions: Iterable[str] = ('.pdf',)) -> Iterator[str]:
+    """Input paths from a manifest (one per line, '#' comments) or from a directory, in a stable order."""
+    extensions = tuple(e.lower() for e in extensions)
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line if os.path.isabs(line) else os.path.join(base, line)
+        return
+    # scandir statt listdir: bei 100k Dateien keine zusätzlichen stat-Aufrufe
+    with os.scandir(input_dir) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_file() and entry.name.lower().endswith(extensions))
+    for name in names:
+        yield os.path.join(input_dir, name)
+
+
+class Claim:
+    """
+    Exclusive claim on one input, held as a lock file on a shared filesystem.
+
+    The lock is created with O_CREAT | O_EXCL, which is atomic on local filesystems and NFSv3+.
+    While the claim is held a heartbeat thread refreshes the file's mtime; a lock without
+    heartbeat for longer than the timeout is considered stale and can be taken over by exactly
+    one node (see _take_over).
+    Finished inputs leave a .done marker so no node claims them again.
+    """
+
+    def __init__(self, path: str, lock_path: str, timeout: float):
+        self.path = path
+        self.lock_path = lock_path
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._beat, name=f"claim-{os.path.basename(path)}", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stop.wait(self.timeout / 3):
+            try:
+                os.utime(self.lock_path)
+            except OSError:
+                return
+
+    def _stop_heartbeat(self):
+        self._stop.set()
+        self._heartbeat.join()
+
+    def done(self):
+        """Mark the input as finished and drop the lock."""
+        self._stop_heartbeat()
+        with open(f"{os.path.splitext(self.lock_path)[0]}.done", 'w', encoding='utf-8') as f:
+            f.write(f"{socket.gethostname()} {time.time()} {self.path}\n")
+        self._remove()
+
+    def release(self):
+        """Drop the lock without marking the input done (it can be retried by any node)."""
+        self._stop_heartbeat()
+        self._remove()
+
+    def _remove(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        # Übernahme-Markierungen früherer Lock-Generationen werden nicht mehr gebraucht
+        for marker in glob.glob(f"{glob.escape(self.lock_path)}.takeover.*"):
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+
+
+def _take_over(lock_path: str, generation: int) -> bool:
+    """
+    Remove a stale lock whose mtime is generation (ns). Exactly one node wins a generation: the
+    takeover marker is created with O_EXCL, and a lock that was renamed away although it has been
+    refreshed or re-created in the meantime is put back.
+    """
+    try:
+        os.close(os.open(f"{lock_path}.takeover.{generation}", os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+    except FileExistsError:
+        return False
+    stale_path = f"{lock_path}.stale.{socket.gethostname()}.{os.getpid()}"
+    try:
+        os.rename(lock_path, stale_path)
+    except FileNotFoundError:
+        return False
+    if os.stat(stale_path).st_mtime_ns != generation:
+        # Inzwischen erneuert (Heartbeat) oder neu angelegt: zurücklegen, sofern kein anderer Knoten neu gelockt hat
+        try:
+            os.link(stale_path, lock_path)
+        except FileExistsError:
+            pass
+        os.remove(stale_path)
+        return False
+    os.remove(stale_path)
+    return True
+
+
+def try_claim(path: str, lock_dir: str, key: str, timeout: float = DEFAULT_LOCK_TIMEOUT) -> Optional[Claim]:
+    """Claim an input, or return None if it is done or another node holds a fresh lock."""
+    lock_path = os.path.join(lock_dir, f"{key}.lock")
+    if os.path.exists(os.path.join(lock_dir, f"{key}.done")):
+        return None
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            try:
+                generation = os.stat(lock_path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            age = time.time() - generation / 1e9
+            if age < timeout:
+                return None
+            if _take_over(lock_path, generation):
+                logging.warning(f"Taking over stale lock of {path} ({age:.0f} s without heartbeat)")
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f"{socket.gethostname()} {os.getpid()} {time.time()} {path}\n")
+        return Claim(path, lock_path, timeout)
+    return None
+
+
+def input_root(args: argparse.Namespace) -> str:
+    """Directory the inputs are named relative to: --input-dir, or the directory of the manifest."""
+    return args.input_dir or os.path.dirname(os.path.abspath(args.manifest))
+
+
+def output_path_for(args: argparse.Namespace, path: str, extension: str) -> str:
+    """
+    Output file of an input under --output-dir, mirroring its path relative to the input root, so
+    that manifest entries with the same file name in different directories do not collide. Inputs
+    outside the root keep their absolute path below the output directory.
+    """
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(input_root(args)))
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        relative = os.path.splitdrive(os.path.abspath(path))[1].lstrip(os.sep)
+    output_path = os.path.join(args.output_dir, f"{os.path.splitext(relative)[0]}{extension}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return output_path
+
+
+def claimed_inputs(args: argparse.Namespace, extensions: Iterable[str] = ('.pdf',),
+                   lock_suffix: str = '') -> Iterator[Tuple[str, Optional[Claim]]]:
+    """
+    Yield (path, claim) for every input of this shard that this node gets to process.
+    Without --lock-dir claim is None; otherwise the caller calls claim.done() or claim.release().
+    lock_suffix claims the inputs for a separate pass (own locks and .done markers).
+    """
+    root = input_root(args)
+    if args.lock_dir:
+        os.makedirs(args.lock_dir, exist_ok=True)
+    seen = skipped = 0
+    for path in iter_inputs(args.input_dir, args.manifest, extensions):
+        key = path_key(path, root)
+        if not in_shard(key, args.shard_index, args.shard_count):
+            continue
+        seen += 1
+        claim = None
+        if args.lock_dir:
+            claim = try_claim(path, args.lock_dir, key + lock_suffix, args.lock_timeout)
+            if claim is None:
+                skipped += 1
+                continue
+        yield path, claim
+    logging.info(f"Shard {args.shard_index}/{args.shard_count}: {seen} inputs, {skipped} done or claimed by other nodes")
+
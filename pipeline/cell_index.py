@@ -0,0 +1,126 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ocr_backends import OcrWord
+from grid_detection import Grid, runs
+from word_table import WordTable
+
+# Share of a word's width (height) that has to lie beyond a boundary before the word spans both cells
+SPAN_TOLERANCE = 0.25
+
+
+@dataclass
+class CellAssignment:
+    """
+    Cell texts of one table.
+
+    cells holds the joined text per cell. A word that covers several cells is written to the
+    top-left cell of its span and the span is recorded in spans as (row, col) -> (last row, last col).
+    """
+    cells: List[List[str]]
+    spans: Dict[Tuple[int, int], Tuple[int, int]] = field(default_factory=dict)
+
+
+class CellIndex:
+    """
+    Sorted interval index over the row and column boundaries of one table.
+
+    Built once per table; every word is then located by binary search (np.searchsorted over all
+    words at once), i.e. O(W log(R + C)) instead of a scan over all boundaries per word.
+    """
+
+    def __init__(self, rows: Sequence[float], cols: Sequence[float]):
+        self.rows = np.asarray(rows, dtype=np.float64)
+        self.cols = np.asarray(cols, dtype=np.float64)
+        if len(self.rows) < 2 or len(self.cols) < 2:
+            raise ValueError("A table needs at least two row and two column boundaries")
+
+    @classmethod
+    def from_grid(cls, grid: Grid) -> 'CellIndex':
+        return cls(grid.rows, grid.cols)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.rows) - 1, len(self.cols) - 1
+
+    def _intervals(self, bounds: np.ndarray, start: np.ndarray, end: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """First and last interval touched by [start, end), ignoring overhangs below tolerance * extent."""
+        slack = tolerance * np.maximum(end - start, 0)
+        first = np.searchsorted(bounds, start + slack, side='right') - 1
+        last = np.searchsorted(bounds, end - slack, side='left') - 1
+        n = len(bounds) - 2
+        first = np.clip(first, 0, n)
+        last = np.clip(np.maximum(last, first), 0, n)
+        return first, last
+
+    def locate(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        """Cell (row, col) containing a point, or None outside the table."""
+        r = int(np.searchsorted(self.rows, y, side='right')) - 1
+        c = int(np.searchsorted(self.cols, x, side='right')) - 1
+        if 0 <= r < self.shape[0] and 0 <= c < self.shape[1]:
+            return r, c
+        return None
+
+    def assign(self, words: Union[List[OcrWord], WordTable], tolerance: float = SPAN_TOLERANCE) -> CellAssignment:
+        """
+        Assign words to cells and join the text of each cell in reading order in one pass.
+        Words whose center lies outside the table are dropped.
+        """
+        n_rows, n_cols = self.shape
+        assignment = CellAssignment([[''] * n_cols for _ in range(n_rows)])
+        table = words if isinstance(words, WordTable) else WordTable.from_words(words)
+        if not len(table):
+            return assignment
+
+        boxes = np.asarray(table.boxes, dtype=np.float64)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        inside = (cx >= self.cols[0]) & (cx <= self.cols[-1]) & (cy >= self.rows[0]) & (cy <= self.rows[-1])
+        r0, r1 = self._intervals(self.rows, boxes[:, 1], boxes[:, 3], tolerance)
+        c0, c1 = self._intervals(self.cols, boxes[:, 0], boxes[:, 2], tolerance)
+
+        # Lesereihenfolge: Zeile der Engine (sonst y), dann x; einmal global sortieren
+        lines = np.asarray(table.line)
+        order = np.lexsort((boxes[:, 0], cy if (lines < 0).any() else lines))
+        order = order[inside[order]]
+        for key, text in table.join_groups(r0[order] * n_cols + c0[order], order).items():
+            assignment.cells[key // n_cols][key % n_cols] = text
+
+        # Nur die wenigen Wörter über mehrere Zellen einzeln eintragen
+        for i in order[(r1[order] > r0[order]) | (c1[order] > c0[order])].tolist():
+            key = (int(r0[i]), int(c0[i]))
+            last = assignment.spans.get(key, key)
+            assignment.spans[key] = (max(last[0], int(r1[i])), max(last[1], int(c1[i])))
+        return assignment
+
+
+def column_boundaries_from_words(words: Union[List[OcrWord], WordTable], width: int, min_gap: Optional[float] = None) -> List[float]:
+    """
+    Derive column boundaries from the horizontal whitespace shared by all rows: a boundary is put
+    in the middle of every gap of at least min_gap pixels (default: twice the median character width)
+    that no word covers.
+    """
+    table = words if isinstance(words, WordTable) else WordTable.from_words(words)
+    if not len(table):
+        return [0.0, float(width)]
+    x0 = np.asarray(table.x0, dtype=np.float64)
+    x1 = np.asarray(table.x1, dtype=np.float64)
+    if min_gap is None:
+        min_gap = 2 * float(np.median((x1 - x0) / np.maximum(1, table.char_lengths())))
+    # Abgedeckte Pixel über ein Differenzenfeld statt einer Schleife über die Wörter
+    size = int(width) + 1
+    start = np.clip(x0.astype(np.int64), 0, size)
+    end = np.clip(np.ceil(x1).astype(np.int64) + 1, 0, size)
+    valid = start < end
+    delta = np.zeros(size + 1, dtype=np.int64)
+    np.add.at(delta, start[valid], 1)
+    np.add.at(delta, end[valid], -1)
+    occupied = np.cumsum(delta[:-1]) > 0
+    inked = np.flatnonzero(occupied)
+    if not inked.size:
+        return [0.0, float(width)]
+    left, right = int(inked[0]), int(inked[-1]) + 1
+    gaps = [(left + start, left + end) for start, end in runs(~occupied[left:right]) if end - start >= min_gap]
+    return [float(left)] + [(start + end) / 2 for start, end in gaps] + [float(right)]
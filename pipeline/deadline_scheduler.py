@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from ocr_backends import DEFAULT_PRIORS
+from page_source import PageSource
+
+# Share of the remaining time kept free for export and for pages slower than estimated
+SAFETY_MARGIN = 0.15
+# Smoothing factor for the measured seconds per page of a quality level
+COST_ALPHA = 0.3
+# Render resolution of the degraded levels; still readable for printed tables
+LOW_DPI = 150
+# Resolution assumed for image files without DPI information and for the priors
+REFERENCE_DPI = 300
+# A4 page at REFERENCE_DPI in megapixels
+A4_MEGAPIXELS = 8.7
+# Prior for one page through the LLM (request, answer and the pause between pages)
+LLM_SECONDS = 30.0
+# Engine of the fast levels
+FAST_ENGINE = 'tesseract'
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    """
+    One step of the quality ladder: render resolution (None = the pipeline's default), engine
+    (None = the job's own), whether the LLM refines the page, and the prior seconds per page
+    used until the level has been measured.
+    """
+    name: str
+    dpi: Optional[int] = None
+    engine: Optional[str] = None
+    llm: bool = False
+    cost: float = 1.0
+
+
+def page_seconds(engine: str, dpi: float = REFERENCE_DPI) -> float:
+    """Prior seconds for an A4 page from the router priors (seconds per megapixel)."""
+    priors = DEFAULT_PRIORS.get(engine, DEFAULT_PRIORS['tesseract'])
+    return priors['seconds_per_mp'] * A4_MEGAPIXELS * (dpi / REFERENCE_DPI) ** 2
+
+
+def service_ladder(engine: str) -> List[QualityLevel]:
+    """Levels of the extraction service, best first: own engine, own engine at LOW_DPI, FAST_ENGINE at LOW_DPI."""
+    ladder = [QualityLevel('full', cost=page_seconds(engine)),
+              QualityLevel('low_dpi', LOW_DPI, cost=page_seconds(engine, LOW_DPI))]
+    if engine != FAST_ENGINE:
+        ladder.append(QualityLevel('fast', LOW_DPI, FAST_ENGINE, cost=page_seconds(FAST_ENGINE, LOW_DPI)))
+    return ladder
+
+
+def llm_ladder(dpi: int, cascade: bool = False) -> List[QualityLevel]:
+    """
+    Levels of the LLM extraction, best first: Tesseract with LLM refinement (or the cascade),
+    Tesseract with table reconstruction only, the same at LOW_DPI.
+    """
+    full = (QualityLevel('cascade', dpi, FAST_ENGINE, cost=2 * page_seconds(FAST_ENGINE, dpi)) if cascade
+            else QualityLevel('llm', dpi, FAST_ENGINE, llm=True, cost=LLM_SECONDS))
+    ladder = [full, QualityLevel('no_llm', dpi, FAST_ENGINE, cost=page_seconds(FAST_ENGINE, dpi))]
+    if dpi > LOW_DPI:
+        ladder.append(QualityLevel('low_dpi', LOW_DPI, FAST_ENGINE, cost=page_seconds(FAST_ENGINE, LOW_DPI)))
+    return ladder
+
+
+class CostModel:
+    """
+    Seconds per page of each quality level, exponentially smoothed over the measured pages.
+    Starts from the level's prior; shared by all jobs of a worker, thread-safe.
+    """
+
+    def __init__(self, alpha: float = COST_ALPHA):
+        self.alpha = alpha
+        self._seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, level: QualityLevel) -> float:
+        with self._lock:
+            return self._seconds.get(level.name, level.cost)
+
+    def observe(self, level: QualityLevel, seconds: float):
+        with self._lock:
+            previous = self._seconds.get(level.name)
+            self._seconds[level.name] = seconds if previous is None else (1 - self.alpha) * previous + self.alpha * seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._seconds)
+
+
+@dataclass
+class DeadlinePlan:
+    """
+    Picks the quality level page by page so that a document is done by its deadline.
+
+    A page gets the best level for which this page plus all remaining pages at the cheapest level
+    still fit into the remaining time (less SAFETY_MARGIN). Early pages therefore keep full quality
+    as long as the rest can still be caught up cheaply, and the plan follows the measured costs.
+    Without a deadline every page gets the best level. Pages below the best level are collected
+    in degraded (page number -> level name) for a later full-quality pass.
+    """
+    pages: int
+    deadline: Optional[float]
+    ladder: List[QualityLevel]
+    costs: CostModel
+    clock: Callable[[], float] = time.time
+    done: int = 0
+    degraded: Dict[int, str] = field(default_factory=dict)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - self.clock()
+
+    def next_level(self) -> QualityLevel:
+        remaining = self.remaining()
+        if remaining is None:
+            return self.ladder[0]
+        budget = remaining * (1 - SAFETY_MARGIN)
+        rest = max(0, self.pages - self.done - 1) * self.costs.estimate(self.ladder[-1])
+        for level in self.ladder:
+            if self.costs.estimate(level) + rest <= budget:
+                return level
+        return self.ladder[-1]
+
+    def finish_page(self, page_num: int, level: QualityLevel, seconds: float):
+        self.costs.observe(level, seconds)
+        self.done += 1
+        if level != self.ladder[0]:
+            self.degraded[page_num] = level.name
+
+    def summary(self) -> Dict:
+        remaining = self.remaining()
+        return {'pages': self.done, 'degraded': len(self.degraded),
+                'slack_s': None if remaining is None else round(remaining, 2)}
+
+
+def deadline_in(seconds: Optional[float]) -> Optional[float]:
+    """Absolute deadline (epoch seconds) for a latency budget in seconds from now; None stays None."""
+    if seconds is None:
+        return None
+    if seconds <= 0:
+        raise ValueError(f"Latency budget must be positive, got {seconds}")
+    return time.time() + seconds
+
+
+def render_level(source: PageSource, index: int, level: QualityLevel, mode: str = 'L') -> np.ndarray:
+    """
+    A page at the resolution of a quality level. PDF pages are rendered at level.dpi; image files
+    have a fixed resolution and are scaled down after decoding (unknown DPI counts as REFERENCE_DPI).
+    """
+    image = source.page(index, mode, level.dpi)
+    if level.dpi:
+        info = source.info(index)
+        width = int(info.width * level.dpi / (info.dpi or REFERENCE_DPI))
+        if 0 < width < image.shape[1] - 1:
+            height = max(1, int(image.shape[0] * width / image.shape[1]))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the quality level each page would get under a latency budget (prior costs).")
+    parser.add_argument("--pages", type=int, required=True, help="Pages of the document")
+    parser.add_argument("--deadline", type=float, required=True, help="Latency budget in seconds")
+    parser.add_argument("--engine", default="doctr", help="Engine of the extraction service ladder")
+    parser.add_argument("--llm", action="store_true", help="Use the ladder of the LLM extraction instead")
+    parser.add_argument("--dpi", type=int, default=REFERENCE_DPI, help="Render resolution of the LLM ladder")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ladder = llm_ladder(args.dpi) if args.llm else service_ladder(args.engine)
+    # Simulierte Uhr: jede Seite dauert so lange wie geschätzt
+    now = [0.0]
+    plan = DeadlinePlan(args.pages, args.deadline, ladder, CostModel(), clock=lambda: now[0])
+    for page_num in range(1, args.pages + 1):
+        level = plan.next_level()
+        seconds = plan.costs.estimate(level)
+        now[0] += seconds
+        plan.finish_page(page_num, level, seconds)
+        print(json.dumps({'page': page_num, 'level': level.name, 'seconds': round(seconds, 2), 'elapsed': round(now[0], 2)}))
+    logging.info(f"Plan: {plan.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import time
+import uuid
+import shutil
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from instrumentation import configure_tracing, get_tracer
+from ocr_backends import OcrBackend, create_backend
+from page_source import PAGE_EXTENSIONS, open_source
+from table_reconstruction import reconstruct_table
+from page_dedup import PageIndex, DedupRecognizer, NEAR_THRESHOLD, TEMPLATE_THRESHOLD
+from tiled_ocr import TiledRecognizer, create_tiled_backend, TILE_SIZE, OVERLAP
+from autotune import tuned_backend_kwargs
+from deadline_scheduler import CostModel, DeadlinePlan, deadline_in, render_level, service_ladder
+
+SUPPORTED_EXTENSIONS = PAGE_EXTENSIONS
+# Files younger than this are probably still being copied into the inbox
+INBOX_SETTLE_SECONDS = 2.0
+# Columns added after the first release; older queue files get them on start
+JOB_COLUMNS = {
+    'deadline': 'REAL',
+    'pages': 'TEXT',
+    'pages_done': 'INTEGER NOT NULL DEFAULT 0',
+    'degraded': 'TEXT',
+    'refine_of': 'INTEGER',
+}
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite.
+
+    Jobs with a deadline (epoch seconds) are claimed first, earliest deadline first; the bulk
+    backlog without one follows by priority (highest first), then by age. A job that fails is
+    queued again until it has used up max_attempts. Every call opens its own connection, so the queue can be
+    used from the HTTP threads, the inbox watcher and all workers at the same time.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    engine TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    error TEXT,
+                    result TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in JOB_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, engine, priority DESC, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_deadline ON jobs (status, engine, deadline)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, path: str, engine: str, priority: int = 0, max_attempts: int = 3, deadline: Optional[float] = None,
+                pages: Optional[List[int]] = None, refine_of: Optional[int] = None) -> int:
+        """Queue a job; pages restricts it to these page numbers (1-based), refine_of names the job it improves."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (path, engine, priority, max_attempts, deadline, pages, refine_of, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, engine, priority, max_attempts, deadline, json.dumps(pages) if pages else None, refine_of, now, now))
+            return cursor.lastrowid
+
+    def claim(self, engine: str) -> Optional[Dict]:
+        """Atomically take the next queued job for an engine and mark it as running."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND engine = ? "
+                    "ORDER BY deadline IS NULL, deadline, priority DESC, created LIMIT 1",
+                    (engine,)).fetchone()
+                if job is not None:
+                    conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? WHERE id = ?",
+                                 (time.time(), job['id']))
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            return dict(job) if job else None
+
+    def progress(self, job_id: int, result: str, pages_done: int):
+        """Publish the partial result of a running job."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET result = ?, pages_done = ?, updated = ? WHERE id = ?",
+                         (result, pages_done, time.time(), job_id))
+
+    def complete(self, job_id: int, result: str, degraded: Optional[Dict[int, str]] = None):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', result = ?, degraded = ?, error = NULL, updated = ? WHERE id = ?",
+                         (result, json.dumps(degraded) if degraded else None, time.time(), job_id))
+
+    def fail(self, job_id: int, error: str):
+        """Queue the job again, or mark it as failed once it has used all attempts."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = ?, updated = ? WHERE id = ?",
+                (error, time.time(), job_id))
+
+    def recover(self) -> int:
+        """Put jobs that were running when the service stopped back into the queue."""
+        with self._connect() as conn:
+            return conn.execute("UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running'",
+                                (time.time(),)).rowcount
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ('pages', 'degraded'):
+            if job[key]:
+                job[key] = json.loads(job[key])
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {row['status']: row['n'] for row in
+                    conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+
+def write_tables_csv(tables: List[List[List[str]]], output_path: str):
+    """Write the page tables one after another (separated by an empty row), atomically."""
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for page_index, table in enumerate(tables):
+            if page_index:
+                writer.writerow([])
+            writer.writerows(table)
+    os.replace(tmp_path, output_path)
+
+
+def read_tables_csv(path: str) -> List[List[List[str]]]:
+    """Read the page tables of write_tables_csv back, one list of rows per page."""
+    tables = [[]]
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if row:
+                tables[-1].append(row)
+            else:
+                tables.append([])
+    return tables
+
+
+class Worker(threading.Thread):
+    """
+    Keeps one warm backend and processes the jobs of its engine until the service stops.
+
+    Jobs with a deadline are planned page by page (deadline_scheduler.py): when the remaining time
+    gets short, pages are rendered at a lower DPI or read by the fast engine, and the CSV is
+    rewritten after every page so the client can fetch the partial result. Degraded pages are
+    recorded with the job and queued again as a bulk job that redoes only them at full quality.
+    """
+
+    def __init__(self, name: str, engine: str, queue: JobQueue, outbox: str, stop: threading.Event,
+                 poll_interval: float = 0.5, dedup_index: Optional[PageIndex] = None, dedup_thresholds=None,
+                 tile_size: int = 0, tile_workers: int = 1, backend_kwargs: Optional[Dict] = None):
+        super().__init__(name=name, daemon=True)
+        self.engine = engine
+        self.queue = queue
+        self.outbox = outbox
+        self.stop = stop
+        self.poll_interval = poll_interval
+        # Modelle einmal laden; danach kostet jede Seite nur noch Inferenz
+        if tile_size:
+            # Übergroße Seiten in Kacheln lesen; die Dedup-Schicht speichert die zusammengeführte Seite
+            self.backend = create_tiled_backend(engine, tile_size, min(OVERLAP, tile_size // 4), tile_workers,
+                                                **(backend_kwargs or {}))
+        else:
+            self.backend = create_backend(engine, **(backend_kwargs or {}))
+        self.base_backend = self.backend
+        if dedup_index is not None:
+            self.backend = DedupRecognizer(self.backend, dedup_index, *(dedup_thresholds or ()))
+        self.ladder = service_ladder(engine)
+        self.costs = CostModel()
+        self._fast_backends: Dict[str, OcrBackend] = {}
+
+    def backend_for(self, level) -> OcrBackend:
+        """Backend of a quality level; degraded pages bypass the dedup index, so they are never reused as full results."""
+        if level == self.ladder[0]:
+            return self.backend
+        if level.engine is None or level.engine == self.engine:
+            return self.base_backend
+        if level.engine not in self._fast_backends:
+            logging.info(f"{self.name}: loading {level.engine} for degraded pages")
+            self._fast_backends[level.engine] = create_backend(level.engine)
+        return self._fast_backends[level.engine]
+
+    def process(self, job: Dict) -> Tuple[str, Dict[int, str]]:
+        """Process a job; returns the CSV path and the degraded pages (page number -> level)."""
+        tracer = get_tracer()
+        path = job['path']
+        selected = json.loads(job['pages']) if job['pages'] else None
+        tables = []
+        if job['refine_of']:
+            # Nachlauf: nur die ausgewählten Seiten neu lesen und in das Ergebnis des ursprünglichen Auftrags einsetzen
+            original = self.queue.get(job['refine_of'])
+            if not original or not original['result'] or not os.path.exists(original['result']):
+                raise FileNotFoundError(f"Result of job {job['refine_of']} to refine is missing")
+            output_path = original['result']
+            tables = read_tables_csv(output_path)
+        else:
+            # Job-ID im Namen: gleichnamige Dateien aus verschiedenen Ordnern überschreiben sich nicht
+            output_path = os.path.join(self.outbox, f"{job['id']}_{os.path.splitext(os.path.basename(path))[0]}.csv")
+        with open_source(path, engine=self.engine) as source:
+            infos = source.infos()
+            logging.info(f"{os.path.basename(path)}: {len(infos)} pages, {sum(i.megapixels for i in infos):.1f} MP")
+            tables.extend([] for _ in range(len(source) - len(tables)))
+            numbers = selected or list(range(1, len(source) + 1))
+            plan = DeadlinePlan(len(numbers), job['deadline'], self.ladder, self.costs)
+            for page_num in numbers:
+                level = plan.next_level()
+                start = time.perf_counter()
+                image = render_level(source, page_num - 1, level)
+                backend = self.backend_for(level)
+                with tracer.span('ocr', page=page_num, engine=level.engine or self.engine, level=level.name) as span:
+                    if isinstance(backend, DedupRecognizer):
+                        words = backend.recognize(image, source=f"{path}#{page_num}")
+                    else:
+                        words = backend.recognize(image)
+                    span.items = len(words)
+                with tracer.span('structure', page=page_num) as span:
+                    tables[page_num - 1] = reconstruct_table(words)
+                    span.items = len(tables[page_num - 1])
+                plan.finish_page(page_num, level, time.perf_counter() - start)
+                if job['deadline'] is not None:
+                    # Teilergebnis nach jeder Seite veröffentlichen; noch nicht gelesene Seiten bleiben leer
+                    write_tables_csv(tables, output_path)
+                    self.queue.progress(job['id'], output_path, plan.done)
+        with tracer.span('export', items=len(tables)):
+            write_tables_csv(tables, output_path)
+        if job['deadline'] is not None:
+            summary = plan.summary()
+            log = logging.warning if summary['slack_s'] < 0 else logging.info
+            log(f"{self.name}: job {job['id']} {'missed' if summary['slack_s'] < 0 else 'met'} its deadline: {summary}")
+        return output_path, plan.degraded
+
+    def run(self):
+        while not self.stop.is_set():
+            job = self.queue.claim(self.engine)
+            if job is None:
+                self.stop.wait(self.poll_interval)
+                continue
+            logging.info(f"{self.name}: job {job['id']} ({job['path']})")
+            try:
+                result, degraded = self.process(job)
+                self.queue.complete(job['id'], result, degraded)
+                logging.info(f"{self.name}: job {job['id']} done -> {result}")
+                if degraded:
+                    refine_id = self.queue.enqueue(job['path'], job['engine'], job['priority'], job['max_attempts'],
+                                                   pages=sorted(degraded), refine_of=job['id'])
+                    logging.info(f"{self.name}: {len(degraded)} degraded page(s) of job {job['id']} "
+                                 f"queued for a full-quality pass as job {refine_id}")
+            except Exception as e:
+                logging.error(f"{self.name}: job {job['id']} failed: {e}")
+                self.queue.fail(job['id'], str(e))
+
+
+class InboxWatcher(threading.Thread):
+    """Moves new files from the inbox into inbox/.accepted and enqueues them."""
+
+    def __init__(self, inbox: str, queue: JobQueue, engine: str, priority: int, stop: threading.Event,
+                 poll_interval: float = 2.0):
+        super().__init__(name="inbox", daemon=True)
+        self.inbox = inbox
+        self.accepted = os.path.join(inbox, '.accepted')
+        self.queue = queue
+        self.engine = engine
+        self.priority = priority
+        self.stop = stop
+        self.poll_interval = poll_interval
+        os.makedirs(self.accepted, exist_ok=True)
+
+    def scan(self):
+        now = time.time()
+        for entry in os.scandir(self.inbox):
+            if not entry.is_file() or not entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            if now - entry.stat().st_mtime < INBOX_SETTLE_SECONDS:
+                continue
+            # Eindeutiger Name, damit gleichnamige Dateien sich nicht überschreiben
+            target = os.path.join(self.accepted, f"{uuid.uuid4().hex[:8]}_{entry.name}")
+            shutil.move(entry.path, target)
+            job_id = self.queue.enqueue(target, self.engine, self.priority)
+            logging.info(f"Inbox: {entry.name} queued as job {job_id}")
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                self.scan()
+            except OSError as e:
+                logging.error(f"Inbox scan failed: {e}")
+            self.stop.wait(self.poll_interval)
+
+
+def make_handler(queue: JobQueue, engines: List[str], default_engine: str):
+    class JobHandler(BaseHTTPRequestHandler):
+        """
+        POST /jobs {"path", "engine", "priority", "deadline"} enqueues a job (deadline: latency budget
+        in seconds, makes it an urgent job); GET /jobs/<id> (with the partial result while it runs)
+        and GET /status report.
+        """
+
+        def _send(self, status: int, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                return self._send(404, {'error': 'not found'})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                path = request['path']
+            except (ValueError, KeyError):
+                return self._send(400, {'error': 'expected JSON with "path"'})
+            engine = request.get('engine', default_engine)
+            if engine not in engines:
+                return self._send(400, {'error': f'engine must be one of {engines}'})
+            if not os.path.isfile(path):
+                return self._send(400, {'error': f'file not found: {path}'})
+            try:
+                deadline = deadline_in(float(request['deadline'])) if request.get('deadline') is not None else None
+            except (TypeError, ValueError):
+                return self._send(400, {'error': '"deadline" must be a positive number of seconds'})
+            try:
+                priority = int(request.get('priority', 0))
+            except (TypeError, ValueError):
+                return self._send(400, {'error': '"priority" must be an integer'})
+            job_id = queue.enqueue(os.path.abspath(path), engine, priority, deadline=deadline)
+            self._send(201, {'id': job_id})
+
+        def do_GET(self):
+            if self.path == '/status':
+                return self._send(200, queue.counts())
+            if self.path.startswith('/jobs/'):
+                try:
+                    job = queue.get(int(self.path.rsplit('/', 1)[-1]))
+                except ValueError:
+                    job = None
+                return self._send(200, job) if job else self._send(404, {'error': 'unknown job'})
+            self._send(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return JobHandler
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """Parse 'doctr=1,tesseract=2' into {'doctr': 1, 'tesseract': 2}."""
+    workers = {}
+    for part in spec.split(','):
+        engine, _, count = part.partition('=')
+        workers[engine.strip()] = int(count or 1)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction daemon with warm OCR models, inbox watcher and HTTP job API.")
+    parser.add_argument("--inbox", required=True, help="Watched input directory")
+    parser.add_argument("--outbox", required=True, help="Directory for the resulting CSV files")
+    parser.add_argument("--db", default="jobs.sqlite", help="SQLite file of the job queue")
+    parser.add_argument("--workers", default="tesseract=1", help="Warm workers per engine, e.g. doctr=1,paddle=1,tesseract=2")
+    parser.add_argument("--engine", help="Engine for files arriving in the inbox (default: first engine in --workers)")
+    parser.add_argument("--inbox-priority", type=int, default=0, help="Priority of inbox jobs")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP bind address")
+    parser.add_argument("--port", type=int, default=8765, help="HTTP port (0 disables the endpoint)")
+    parser.add_argument("--trace", help="Append per-stage spans to this JSON Lines file")
+    parser.add_argument("--metrics", help="Prometheus textfile summary, rewritten every minute")
+    parser.add_argument("--dedup-index", help="Directory of the page hash index; repeated pages reuse earlier results")
+    parser.add_argument("--dedup-near", type=int, default=NEAR_THRESHOLD, help="Max. Hamming distance for reusing a page as is")
+    parser.add_argument("--dedup-template", type=int, default=TEMPLATE_THRESHOLD,
+                        help="Max. Hamming distance for template pages, of which only changed regions are OCRed again")
+    parser.add_argument("--tile-size", type=int, default=0,
+                        help=f"Recognize pages larger than this many pixels in overlapping tiles (e.g. {TILE_SIZE}; 0 = off)")
+    parser.add_argument("--tile-workers", type=int, default=1, help="Tiles of a page recognized in parallel per worker")
+    parser.add_argument("--profile", help="Settings found by autotune.py (default: $OCR_TUNE_PROFILE or the profile of "
+                                          "this host; 'none' disables it)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    os.makedirs(args.inbox, exist_ok=True)
+    os.makedirs(args.outbox, exist_ok=True)
+    tracer = configure_tracing(args.trace, args.metrics)
+
+    queue = JobQueue(args.db)
+    recovered = queue.recover()
+    if recovered:
+        logging.info(f"{recovered} interrupted jobs queued again")
+
+    stop = threading.Event()
+    worker_counts = parse_workers(args.workers)
+    engines = list(worker_counts)
+    dedup_index = PageIndex(args.dedup_index) if args.dedup_index else None
+    threads: List[threading.Thread] = []
+    for engine, count in worker_counts.items():
+        # Batchgröße und Threads aus dem Autotune-Profil dieses Rechners
+        backend_kwargs = tuned_backend_kwargs(engine, args.profile)
+        for i in range(count):
+            logging.info(f"Loading {engine} worker {i + 1}/{count}")
+            threads.append(Worker(f"{engine}-{i + 1}", engine, queue, args.outbox, stop,
+                                  dedup_index=dedup_index, dedup_thresholds=(args.dedup_near, args.dedup_template),
+                                  tile_size=args.tile_size, tile_workers=args.tile_workers, backend_kwargs=backend_kwargs))
+    threads.append(InboxWatcher(args.inbox, queue, args.engine or engines[0], args.inbox_priority, stop))
+
+    server = None
+    if args.port:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(queue, engines, args.engine or engines[0]))
+        threads.append(threading.Thread(target=server.serve_forever, name="http", daemon=True))
+        logging.info(f"HTTP endpoint on http://{args.host}:{args.port}/jobs")
+
+    def shutdown(signum, frame):
+        logging.info("Stopping ...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for thread in threads:
+        thread.start()
+    while not stop.wait(60):
+        tracer.write_prometheus()
+
+    if server:
+        server.shutdown()
+    for thread in threads:
+        if isinstance(thread, Worker):
+            thread.join()
+            backend = thread.backend
+            if isinstance(backend, DedupRecognizer):
+                backend.report()
+                backend = backend.backend
+            if isinstance(backend, TiledRecognizer):
+                backend.report()
+    tracer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ocr_backends import OcrBackend, OcrWord
+
+
+@dataclass
+class Grid:
+    """Cell lattice of a table: row and column boundaries in page pixels."""
+    rows: List[int]
+    cols: List[int]
+    ruled: bool
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.rows) - 1, len(self.cols) - 1
+
+    def cells(self) -> Iterator[Tuple[int, int, int, int, int, int]]:
+        """Yield (row, col, x0, y0, x1, y1) for every cell, row by row."""
+        for r in range(len(self.rows) - 1):
+            for c in range(len(self.cols) - 1):
+                yield r, c, self.cols[c], self.rows[r], self.cols[c + 1], self.rows[r + 1]
+
+
+def extract_ruling_lines(binary: np.ndarray, min_length_ratio: float = 1 / 30) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract horizontal and vertical ruling lines with morphological opening.
+
+    Args:
+    binary (np.ndarray): Inverted binarization (ink = 255).
+    min_length_ratio (float): Minimum line length relative to the page width/height.
+
+    Returns:
+    (np.ndarray, np.ndarray): Masks of the horizontal and of the vertical lines.
+    """
+    h, w = binary.shape
+    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(2, int(w * min_length_ratio)), 1))
+    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(2, int(h * min_length_ratio))))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, horizontal_kernel)
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, vertical_kernel)
+    return horizontal, vertical
+
+
+def runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Return (start, end) index pairs (end exclusive) of the True runs in a 1-D boolean array."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def line_positions(mask: np.ndarray, axis: int, min_coverage: float) -> List[int]:
+    """Centers of the lines in a ruling mask whose projection covers at least min_coverage of the longest line."""
+    projection = np.count_nonzero(mask, axis=axis)
+    if not projection.any():
+        return []
+    return [int((start + end - 1) // 2) for start, end in runs(projection >= min_coverage * projection.max())]
+
+
+def detect_ruled_grid(binary: np.ndarray, min_coverage: float = 0.5) -> Optional[Grid]:
+    """Find a ruled table from its horizontal and vertical lines; None if there are fewer than 2 of either."""
+    horizontal, vertical = extract_ruling_lines(binary)
+    rows = line_positions(horizontal, axis=1, min_coverage=min_coverage)
+    cols = line_positions(vertical, axis=0, min_coverage=min_coverage)
+    if len(rows) < 2 or len(cols) < 2:
+        return None
+    return Grid(rows, cols, ruled=True)
+
+
+def count_segments(inked: np.ndarray, min_gap: int) -> int:
+    """Number of ink segments in a row when gaps narrower than min_gap (word spaces) are bridged."""
+    ink_runs = runs(inked)
+    if not ink_runs:
+        return 0
+    return 1 + sum(1 for (_, end), (start, _) in zip(ink_runs, ink_runs[1:]) if start - end >= min_gap)
+
+
+def detect_unruled_grid(binary: np.ndarray, min_gap: Optional[int] = None, max_column_ink: float = 0.1) -> Optional[Grid]:
+    """
+    Find an unruled table from whitespace.
+
+    Rows are the horizontal ink bands (like segment_image_into_lines). The table is the largest
+    block of bands that split into at least two segments at gaps of min_gap pixels (default:
+    twice the median band height), so prose above or below it is left out. Inside that block a
+    column boundary is placed in every vertical whitespace gap of at least min_gap pixels that
+    at least (1 - max_column_ink) of the rows leave empty.
+    """
+    # Einzelne Störpixel entfernen, damit sie keine Spalten oder Zeilen vortäuschen
+    clean = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    bands = runs(np.count_nonzero(clean, axis=1) > 0)
+    if len(bands) < 2:
+        return None
+    if min_gap is None:
+        min_gap = 2 * int(np.median([end - start for start, end in bands]))
+
+    # Tabellenzeilen: mehrere durch breite Lücken getrennte Segmente; Fließtext hat nur eines
+    table_rows = [i for i, (start, end) in enumerate(bands)
+                  if count_segments(np.count_nonzero(clean[start:end], axis=0) > 0, min_gap) >= 2]
+    if len(table_rows) < 2:
+        return None
+    clusters = [[table_rows[0]]]
+    for i in table_rows[1:]:
+        # Einzelne Zeilen mit nur einem Segment (z.B. leere Beträge) gehören noch zur Tabelle
+        if i - clusters[-1][-1] <= 2:
+            clusters[-1].append(i)
+        else:
+            clusters.append([i])
+    block = max(clusters, key=len)
+    bands = bands[block[0]:block[-1] + 1]
+    if len(bands) < 2:
+        return None
+
+    # Pro Zeile: welche Pixelspalten enthalten Tinte?
+    occupancy = np.zeros(clean.shape[1], dtype=np.int32)
+    for start, end in bands:
+        occupancy += np.count_nonzero(clean[start:end], axis=0) > 0
+    inked = np.flatnonzero(occupancy)
+    left, right = int(inked[0]), int(inked[-1]) + 1
+
+    gaps = runs(occupancy[left:right] <= max_column_ink * len(bands))
+    cols = [left] + [left + (start + end) // 2 for start, end in gaps if end - start >= min_gap] + [right]
+    if len(cols) < 3:
+        return None
+
+    rows = [bands[0][0]]
+    for (_, prev_end), (next_start, _) in zip(bands, bands[1:]):
+        rows.append((prev_end + next_start) // 2)
+    rows.append(bands[-1][1])
+    return Grid(rows, cols, ruled=False)
+
+
+def detect_grid(binary: np.ndarray) -> Optional[Grid]:
+    """Detect the cell lattice of the table on a binarized page: ruled tables first, then whitespace."""
+    return detect_ruled_grid(binary) or detect_unruled_grid(binary)
+
+
+def words_to_text(words: List[OcrWord]) -> str:
+    """Join the words of one cell in reading order."""
+    return ' '.join(w.text for w in sorted(words, key=lambda w: (w.line, w.x0)))
+
+
+def recognize_grid(image: np.ndarray, binary: np.ndarray, grid: Grid, backend: OcrBackend,
+                   inset: int = 3) -> List[List[str]]:
+    """
+    Crop all non-empty cells and recognize them in one batch.
+
+    Args:
+    image (np.ndarray): Page image the grid was detected on.
+    binary (np.ndarray): Its inverted binarization; cells without ink are not sent to OCR.
+    grid (Grid): Detected cell lattice.
+    backend (OcrBackend): Engine used for the batch.
+    inset (int): Pixels cut from each cell border so ruling lines stay out of the crop.
+
+    Returns:
+    List[List[str]]: Cell texts, one list per table row.
+    """
+    n_rows, n_cols = grid.shape
+    table = [[''] * n_cols for _ in range(n_rows)]
+    positions, crops = [], []
+    for r, c, x0, y0, x1, y1 in grid.cells():
+        if grid.ruled:
+            x0, y0, x1, y1 = x0 + inset, y0 + inset, x1 - inset, y1 - inset
+        if x1 <= x0 or y1 <= y0 or not binary[y0:y1, x0:x1].any():
+            continue
+        positions.append((r, c))
+        crops.append(image[y0:y1, x0:x1])
+
+    for (r, c), words in zip(positions, backend.recognize_batch(crops)):
+        table[r][c] = words_to_text(words)
+    return table
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import re
+import csv
+import logging
+import argparse
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Optional, Tuple
+
+from ocr_backends import OcrWord
+from table_reconstruction import reconstruct_table
+
+BBOX_RE = re.compile(r'bbox\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)')
+WCONF_RE = re.compile(r'x_wconf\s+(-?[\d.]+)')
+PAGENO_RE = re.compile(r'ppageno\s+(\d+)')
+LINE_CLASSES = {'ocr_line', 'ocr_caption', 'ocr_header', 'ocr_textfloat'}
+
+
+def local_name(tag: str) -> str:
+    """Strip the XHTML namespace from an ElementTree tag."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_word(elem: ET.Element, line_id: int) -> Optional[OcrWord]:
+    """Turn an ocrx_word span into an OcrWord, or None if it has no text or no bounding box."""
+    title = elem.get('title', '')
+    bbox = BBOX_RE.search(title)
+    text = ''.join(elem.itertext()).strip()
+    if not bbox or not text:
+        return None
+    wconf = WCONF_RE.search(title)
+    confidence = float(wconf.group(1)) / 100.0 if wconf else 0.0
+    x0, y0, x1, y1 = (float(v) for v in bbox.groups())
+    return OcrWord(text, x0, y0, x1, y1, confidence, line_id)
+
+
+def iter_hocr_pages(source) -> Iterator[Tuple[int, List[OcrWord]]]:
+    """
+    Stream the words of an hOCR file page by page without building the full DOM.
+
+    Every page element is removed from the tree as soon as its words are yielded,
+    so memory stays bounded by the size of one page however large the file is.
+
+    Args:
+    source: Path or binary file object of the hOCR (XHTML) document.
+
+    Returns:
+    Iterator[Tuple[int, List[OcrWord]]]: (page number starting at 1, words in page pixel coordinates).
+    """
+    stack: List[ET.Element] = []
+    words: List[OcrWord] = []
+    line_id = -1
+    page_number = 0
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            css_class = elem.get('class', '')
+            if css_class in LINE_CLASSES:
+                line_id += 1
+            elif css_class == 'ocr_page':
+                pageno = PAGENO_RE.search(elem.get('title', ''))
+                page_number = int(pageno.group(1)) + 1 if pageno else page_number + 1
+                words, line_id = [], -1
+            continue
+
+        stack.pop()
+        css_class = elem.get('class', '')
+        if css_class == 'ocrx_word':
+            word = parse_word(elem, line_id)
+            if word:
+                words.append(word)
+        elif css_class == 'ocr_page':
+            yield page_number, words
+            words = []
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+
+def hocr_to_csv(hocr_path: str, csv_path: str, min_confidence: float = 0.0) -> int:
+    """
+    Convert an OCRmyPDF/Tesseract hOCR sidecar into a CSV table, page by page.
+    Pages are separated by an empty row.
+
+    Args:
+    hocr_path (str): Path to the hOCR file.
+    csv_path (str): Path to the output CSV file.
+    min_confidence (float): Words below this confidence (0-1) are dropped.
+
+    Returns:
+    int: Number of pages written.
+    """
+    pages = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for page_number, words in iter_hocr_pages(hocr_path):
+            if pages:
+                writer.writerow([])
+            writer.writerows(reconstruct_table([w for w in words if w.confidence >= min_confidence]))
+            pages += 1
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert hOCR sidecars into CSV tables with constant memory.")
+    parser.add_argument("hocr", help="Input hOCR file")
+    parser.add_argument("output_csv", help="Output CSV file")
+    parser.add_argument("--min-confidence", type=float, default=0.0, help="Drop words below this confidence (0-1)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    pages = hocr_to_csv(args.hocr, args.output_csv, args.min_confidence)
+    logging.info(f"{pages} pages written to {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
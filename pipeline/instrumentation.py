@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Stages used by all pipelines, so traces of different engines can be compared
+STAGES = ('rasterize', 'deskew', 'segment', 'ocr', 'structure', 'llm', 'export')
+
+# Environment variables that switch tracing on for scripts without command-line options
+TRACE_ENV = 'OCR_TRACE_FILE'
+METRICS_ENV = 'OCR_METRICS_FILE'
+
+
+def current_rss_bytes() -> int:
+    """Return the current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss ist unter Linux in KiB, unter macOS in Byte angegeben
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """Handle yielded by Tracer.span; the caller can set the number of processed items and extra attributes."""
+
+    def __init__(self, stage: str, items: int = 0, **attrs):
+        self.stage = stage
+        self.items = items
+        self.attrs = attrs
+
+
+class Tracer:
+    """
+    Records wall time, CPU time, processed items and memory delta per pipeline stage.
+
+    Each finished span is appended as one JSON line to the trace file (if any), and the
+    totals per stage can be written as a Prometheus textfile-collector summary.
+    CPU time is process-wide, so spans that overlap in threads share it.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, metrics_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self._trace_file = open(trace_path, 'a', encoding='utf-8', buffering=1) if trace_path else None
+        self._lock = threading.Lock()
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def span(self, stage: str, items: int = 0, **attrs):
+        span = Span(stage, items, **attrs)
+        rss_before = current_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield span
+        finally:
+            self._finish(span, time.perf_counter() - wall_start, time.process_time() - cpu_start,
+                         current_rss_bytes() - rss_before)
+
+    def _finish(self, span: Span, wall: float, cpu: float, mem_delta: int):
+        record = {
+            'ts': time.time(),
+            'stage': span.stage,
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'items': span.items,
+            'mem_delta_bytes': mem_delta,
+            **span.attrs,
+        }
+        with self._lock:
+            totals = self.totals.setdefault(span.stage, {
+                'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'items': 0, 'mem_delta_max_bytes': 0})
+            totals['calls'] += 1
+            totals['wall_s'] += wall
+            totals['cpu_s'] += cpu
+            totals['items'] += span.items
+            totals['mem_delta_max_bytes'] = max(totals['mem_delta_max_bytes'], mem_delta)
+            if self._trace_file:
+                self._trace_file.write(json.dumps(record, default=str) + '\n')
+
+    def write_prometheus(self, path: Optional[str] = None):
+        """Write the per-stage totals in the Prometheus textfile format (atomically, for node_exporter)."""
+        path = path or self.metrics_path
+        if not path:
+            return
+        metrics = [
+            ('ocr_stage_calls_total', 'counter', 'Number of spans per pipeline stage.', 'calls'),
+            ('ocr_stage_wall_seconds_total', 'counter', 'Wall-clock time spent per pipeline stage.', 'wall_s'),
+            ('ocr_stage_cpu_seconds_total', 'counter', 'Process CPU time spent per pipeline stage.', 'cpu_s'),
+            ('ocr_stage_items_total', 'counter', 'Items (pages, lines, words, rows) processed per stage.', 'items'),
+            ('ocr_stage_memory_delta_max_bytes', 'gauge', 'Largest RSS increase of a single span per stage.', 'mem_delta_max_bytes'),
+        ]
+        lines = []
+        with self._lock:
+            for metric, kind, help_text, key in metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for stage, totals in sorted(self.totals.items()):
+                    lines.append(f'{metric}{{stage="{stage}"}} {totals[key]}')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.write_prometheus()
+        if self._trace_file:
+            self._trace_file.close()
+            self._trace_file = None
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(trace_path: Optional[str] = None, metrics_path: Optional[str] = None) -> Tracer:
+    """
+    Replace the process-wide tracer. Paths default to the OCR_TRACE_FILE and
+    OCR_METRICS_FILE environment variables; without any path spans are only summed up in memory.
+    """
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(trace_path or os.environ.get(TRACE_ENV), metrics_path or os.environ.get(METRICS_ENV))
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
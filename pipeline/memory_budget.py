@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import math
+import logging
+import argparse
+import tempfile
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterator, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from instrumentation import current_rss_bytes
+from adaptive_dpi import MIN_DPI
+from page_source import PageInfo, PageSource, open_source
+
+# Working set of one page in the doctr table pipeline in bytes per rendered pixel: RGB render (3),
+# grayscale (1), deskewed copy (3), binarization and dilation (2), line crops and recognizer input (~5)
+BYTES_PER_PIXEL = 14
+# Share of the budget the live RSS may reach before rendered pages waiting in the queues go to disk
+SPILL_RATIO = 0.75
+# Lowest scale for images without a known DPI; below it the page is split into bands instead
+MIN_SCALE = 0.5
+# Upper limit for the number of bands of one page
+MAX_BANDS = 8
+# The cut between two bands is searched within this share of the band height around the even split
+CUT_WINDOW = 0.1
+
+_SIZE = re.compile(r'^\s*([0-9]*\.?[0-9]+)\s*([KMGT]?)(?:I?B)?\s*$', re.IGNORECASE)
+_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(spec: str) -> int:
+    """Parse a memory size like '6G', '512M', '1.5GiB' or '800000000' (binary units) into bytes."""
+    match = _SIZE.match(spec)
+    if not match:
+        raise ValueError(f"Invalid memory size {spec!r}: expected e.g. 6G, 512M or a number of bytes")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+@dataclass
+class PagePlan:
+    """
+    How one page is processed under the budget: scaled by scale (rendered at dpi for PDF pages,
+    resized after decoding for images) to width x height pixels and split into bands horizontal
+    strips. estimate is the expected working set of one band in bytes.
+    """
+    index: int
+    scale: float
+    dpi: Optional[float]
+    width: int
+    height: int
+    bands: int
+    estimate: int
+
+    @property
+    def degraded(self) -> bool:
+        return self.scale < 1.0 or self.bands > 1
+
+
+class MemoryBudget:
+    """
+    Upper bound for the resident memory of the process, enforced page by page.
+
+    Every page reserves its estimated working set before it is rendered and gives it back once its
+    result is written. A page is admitted while the live RSS - or, if higher, the RSS of the idle
+    process plus all reservations, which do not show in the RSS until the pages are rendered - leaves
+    room for it. The first page in flight is always admitted, so a page that does not fit on its own
+    cannot stall the run; plan() makes such pages smaller beforehand. The idle RSS is measured again
+    whenever no page is in flight, so models loaded lazily by the first page are accounted for.
+    """
+
+    def __init__(self, limit: int, bytes_per_pixel: float = BYTES_PER_PIXEL, max_pages: Optional[int] = None):
+        self.limit = limit
+        self.bytes_per_pixel = bytes_per_pixel
+        self.max_pages = max_pages
+        self.floor = current_rss_bytes()
+        self.peak_rss = self.floor
+        self.degraded = 0
+        self.spilled = 0
+        self._reserved = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._reserved)
+
+    def rss(self) -> int:
+        rss = current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def estimate(self, width: int, height: int) -> int:
+        return int(width * height * self.bytes_per_pixel)
+
+    def plan(self, info: PageInfo) -> PagePlan:
+        """
+        Fit one page into the room the idle process leaves: lower the resolution (not below MIN_DPI,
+        or MIN_SCALE for images without a DPI) and, if that is not enough, split it into bands.
+        """
+        room = max(self.limit - self.floor, self.limit // 10)
+        estimate = self.estimate(info.width, info.height)
+        min_scale = min(1.0, MIN_DPI / info.dpi) if info.dpi else MIN_SCALE
+        scale = max(min_scale, min(1.0, math.sqrt(room / estimate))) if estimate else 1.0
+        width, height = max(1, int(info.width * scale)), max(1, int(info.height * scale))
+        estimate = self.estimate(width, height)
+        bands = min(MAX_BANDS, max(1, math.ceil(estimate / room)))
+        plan = PagePlan(info.index, scale, info.dpi * scale if info.dpi else None, width, height, bands,
+                        math.ceil(estimate / bands))
+        if plan.degraded:
+            self.degraded += 1
+            logging.info(f"Page {info.index + 1} of {info.path} ({info.megapixels:.1f} MP) exceeds the memory budget: "
+                         f"scaled to {scale:.2f}" + (f" ({plan.dpi:.0f} dpi)" if plan.dpi else "") + f", {bands} band(s)")
+        return plan
+
+    def _admissible(self, nbytes: int) -> bool:
+        if not self._reserved:
+            return True
+        if self.max_pages and len(self._reserved) >= self.max_pages:
+            return False
+        projected = max(self.rss(), self.floor + sum(self._reserved))
+        return projected + nbytes <= self.limit
+
+    def reserve(self, nbytes: int, stop: Optional[Callable[[], bool]] = None) -> bool:
+        """Wait until nbytes fit into the budget and reserve them; False if stop() turned true while waiting."""
+        with self._cond:
+            while not self._admissible(nbytes):
+                if stop is not None and stop():
+                    return False
+                # Der RSS sinkt auch ohne release (freigegebene Zwischenbilder), daher regelmäßig neu prüfen
+                self._cond.wait(0.1)
+            self._reserved.append(nbytes)
+            return True
+
+    def release(self):
+        """Give back the oldest reservation; pipelines return their results in input order."""
+        with self._cond:
+            if self._reserved:
+                self._reserved.popleft()
+            if not self._reserved:
+                self.floor = self.rss()
+            self._cond.notify_all()
+
+    def under_pressure(self) -> bool:
+        return self.rss() > SPILL_RATIO * self.limit
+
+    def report(self):
+        logging.info(f"Memory budget {self.limit / 2**20:.0f} MiB: peak RSS {self.peak_rss / 2**20:.0f} MiB, "
+                     f"{self.degraded} page(s) degraded, {self.spilled} spilled to disk")
+
+
+@dataclass
+class SpilledPage:
+    """A page written to disk while it waits in a queue; load() maps it back and removes the file."""
+    path: str
+
+    def load(self) -> np.ndarray:
+        # Copy-on-write: schreibbar für OpenCV, ohne die Datei zu ändern
+        image = np.load(self.path, mmap_mode='c')
+        # Unter Linux bleibt die eingeblendete Datei nach dem Löschen lesbar, bis die Abbildung freigegeben wird
+        os.remove(self.path)
+        return image
+
+
+def spill_page(image: np.ndarray, directory: str) -> SpilledPage:
+    fd, path = tempfile.mkstemp(prefix='page-', suffix='.npy', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, np.ascontiguousarray(image))
+    return SpilledPage(path)
+
+
+def load_page(item: Union[np.ndarray, SpilledPage]) -> np.ndarray:
+    """The page image of an item of budgeted_pages, spilled or not."""
+    return item.load() if isinstance(item, SpilledPage) else item
+
+
+def split_bands(image: np.ndarray, count: int) -> List[np.ndarray]:
+    """
+    Split a page into count horizontal bands (views, no copies). Each cut is placed on the brightest
+    row near the even split, i.e. between text lines or table rows rather than through them.
+    """
+    height = image.shape[0]
+    if count <= 1 or height < 2 * count:
+        return [image]
+    brightness = image.reshape(height, -1).mean(axis=1)
+    window = max(1, int(height / count * CUT_WINDOW))
+    cuts = [0]
+    for k in range(1, count):
+        center = k * height // count
+        lo, hi = max(cuts[-1] + 1, center - window), min(height - 1, center + window)
+        cuts.append(lo + int(np.argmax(brightness[lo:hi + 1])))
+    cuts.append(height)
+    return [image[a:b] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def budgeted_pages(source: PageSource, budget: MemoryBudget, mode: str = 'RGB', spill_dir: Optional[str] = None,
+                   stop: Optional[Callable[[], bool]] = None) -> Iterator[Union[np.ndarray, SpilledPage]]:
+    """
+    Render the pages of a source one at a time under a memory budget.
+
+    Args:
+    source (PageSource): Pages to render.
+    budget (MemoryBudget): Budget every page (and every further band) reserves its working set from.
+    mode (str): 'L' or 'RGB'.
+    spill_dir (str): Write pages to this directory while the RSS is above SPILL_RATIO of the budget.
+    stop (Callable): Polled while waiting for the budget; rendering ends when it returns True.
+
+    Returns:
+    Iterator: Page images, bands of oversized pages or SpilledPages; the consumer passes each item
+    through load_page() and calls budget.release() once its result is written.
+    """
+    for index in range(len(source)):
+        plan = budget.plan(source.info(index))
+        if not budget.reserve(plan.estimate, stop):
+            return
+        image = source.page(index, mode, plan.dpi)
+        if plan.scale < 1.0 and image.shape[1] > plan.width + 1:
+            # Bilddateien haben eine feste Auflösung und werden nach dem Dekodieren verkleinert
+            image = cv2.resize(image, (plan.width, max(1, int(image.shape[0] * plan.width / image.shape[1]))),
+                               interpolation=cv2.INTER_AREA)
+        bands = split_bands(image, plan.bands)
+        del image
+        for number in range(len(bands)):
+            # Jedes weitere Band wartet, bis die vorherigen fertig sind; alle auf einmal passen nicht
+            if number and not budget.reserve(plan.estimate, stop):
+                return
+            band = bands.pop(0)
+            if spill_dir and budget.under_pressure():
+                budget.spilled += 1
+                yield spill_page(band, spill_dir)
+            else:
+                yield band
+            del band
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how the pages of inputs would be rendered under a memory budget.")
+    parser.add_argument("inputs", nargs="+", help="PDFs, image files, multi-page TIFFs or directories")
+    parser.add_argument("--max-memory", required=True, help="Budget for the process RSS, e.g. 4G")
+    parser.add_argument("--dpi", type=int, default=300, help="Render resolution of PDF pages before degradation")
+    parser.add_argument("--bytes-per-pixel", type=float, default=BYTES_PER_PIXEL, help="Working set per rendered pixel")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    budget = MemoryBudget(parse_size(args.max_memory), args.bytes_per_pixel)
+    for path in args.inputs:
+        with open_source(path, args.dpi) as source:
+            for info in source.infos():
+                print(json.dumps(dict(asdict(budget.plan(info)), path=path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import sys
+import json
+import argparse
+import time
+import logging
+import tempfile
+import subprocess
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class OcrWord:
+    """One recognized word in page pixel coordinates with a confidence in [0, 1]."""
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    confidence: float
+    line: int = -1
+
+
+@dataclass
+class PageFeatures:
+    """Cheap per-page features used for routing."""
+    has_text_layer: bool
+    scan_quality: float
+    table_density: float
+    megapixels: float
+
+
+def to_rgb(image: np.ndarray) -> np.ndarray:
+    """Return a 3-channel copy of a grayscale image, or the image itself if it already has 3 channels."""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    return image
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    """Return a grayscale view of the image."""
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+class OcrBackend:
+    """
+    Base class of all OCR engines.
+
+    Every backend takes a page image (NumPy array, grayscale or RGB) and returns a list of
+    OcrWord records in the pixel coordinates of that image. Backends that read an existing
+    text layer additionally receive the PyMuPDF page.
+    """
+    name = 'base'
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        raise NotImplementedError
+
+    def recognize_batch(self, images: List[np.ndarray]) -> List[List[OcrWord]]:
+        """Recognize several crops (e.g. table cells); engines with batched inference override this."""
+        return [self.recognize(image) for image in images]
+
+    def read_crops(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        Read the text of small crops that each hold one word or cell (no layout needed).
+        Returns (text, confidence) per crop; engines with a recognition-only model override this.
+        """
+        results = []
+        for words in self.recognize_batch(crops):
+            text = ' '.join(w.text for w in sorted(words, key=lambda w: (w.line, w.x0)))
+            results.append((text, min((w.confidence for w in words), default=0.0)))
+        return results
+
+
+class TextLayerBackend(OcrBackend):
+    """Reads words from the embedded PDF text layer; costs no OCR at all."""
+    name = 'text_layer'
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        if pdf_page is None:
+            return []
+        sx = image.shape[1] / pdf_page.rect.width
+        sy = image.shape[0] / pdf_page.rect.height
+        words = []
+        for x0, y0, x1, y1, text, block_no, line_no, _ in pdf_page.get_text('words'):
+            words.append(OcrWord(text, x0 * sx, y0 * sy, x1 * sx, y1 * sy, 1.0, block_no * 1000 + line_no))
+        return words
+
+
+class TesseractBackend(OcrBackend):
+    """Tesseract via pytesseract.image_to_data (same engine as perform_ocr)."""
+    name = 'tesseract'
+
+    def __init__(self, lang: str = 'deu', psm: int = 6):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.lang = lang
+        self.config = f'--psm {psm}'
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        data = self._pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                               output_type=self._pytesseract.Output.DICT)
+        words = []
+        line_ids: Dict[Tuple[int, int, int], int] = {}
+        for i, text in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if conf < 0 or not text.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            line = line_ids.setdefault(key, len(line_ids))
+            x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+            words.append(OcrWord(text, x, y, x + w, y + h, conf / 100.0, line))
+        return words
+
+
+class DoctrBackend(OcrBackend):
+    """doctr ocr_predictor (same models as ocr_on_lines), loaded once per backend instance."""
+    name = 'doctr'
+
+    def __init__(self, reco_batch_size: Optional[int] = None, det_arch: Optional[str] = None, reco_arch: Optional[str] = None):
+        from doctr.models import ocr_predictor
+        # Batchgröße der Erkennung und Architekturen; None lässt den doctr-Standard (siehe autotune.py, onnx_inference.py)
+        options = {'reco_bs': reco_batch_size, 'det_arch': det_arch, 'reco_arch': reco_arch}
+        self.predictor = ocr_predictor(pretrained=True, **{key: value for key, value in options.items() if value})
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        return self.recognize_batch([image])[0]
+
+    def recognize_batch(self, images: List[np.ndarray]) -> List[List[OcrWord]]:
+        if not images:
+            return []
+        # Alle Bilder in einem Aufruf: doctr bildet daraus Batches für Detektion und Erkennung
+        result = self.predictor([to_rgb(image) for image in images])
+        batch = []
+        for image, page in zip(images, result.pages):
+            h, w = image.shape[:2]
+            words = []
+            line_id = 0
+            for block in page.blocks:
+                for line in block.lines:
+                    for word in line.words:
+                        (x0, y0), (x1, y1) = word.geometry
+                        words.append(OcrWord(word.value, x0 * w, y0 * h, x1 * w, y1 * h, float(word.confidence), line_id))
+                    line_id += 1
+            batch.append(words)
+        return batch
+
+    def read_crops(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        if not crops:
+            return []
+        # Nur das Erkennungsmodell; die Textdetektion ist bei Wortausschnitten überflüssig
+        return [(text, float(conf)) for text, conf in self.predictor.reco_predictor([to_rgb(crop) for crop in crops])]
+
+
+class PaddleBackend(OcrBackend):
+    """
+    PaddleOCR text detection + recognition (same engine as ocr_table.py).
+
+    Pages are expected upright (see page_orientation.py); per_box_cls runs the angle classifier
+    on every text box instead, for pages with mixed orientation.
+    """
+    name = 'paddle'
+
+    def __init__(self, lang: str = 'german', per_box_cls: bool = False, rec_batch_num: Optional[int] = None):
+        from paddleocr import PaddleOCR
+        self.per_box_cls = per_box_cls
+        self.ocr = PaddleOCR(use_angle_cls=per_box_cls, lang=lang, show_log=False,
+                             **({'rec_batch_num': rec_batch_num} if rec_batch_num else {}))
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        result = self.ocr.ocr(to_rgb(image), cls=self.per_box_cls)
+        words = []
+        for page in result:
+            for line_id, (bbox, (text, conf)) in enumerate(page or []):
+                xs = [p[0] for p in bbox]
+                ys = [p[1] for p in bbox]
+                words.append(OcrWord(text, min(xs), min(ys), max(xs), max(ys), float(conf), line_id))
+        return words
+
+    def read_crops(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        results = []
+        for crop in crops:
+            # det=False: nur Erkennung, der Ausschnitt ist bereits eine Textzeile
+            result = self.ocr.ocr(to_rgb(crop), det=False, cls=False)
+            text, conf = result[0][0] if result and result[0] else ('', 0.0)
+            results.append((text, float(conf)))
+        return results
+
+
+class OnnxDoctrBackend(DoctrBackend):
+    """doctr models exported to ONNX Runtime, optionally int8 (see onnx_inference.py); same output as DoctrBackend."""
+    name = 'doctr_onnx'
+
+    def __init__(self, model_dir: str = 'onnx_models', quantized: bool = False, threads: Optional[int] = None,
+                 allow_unverified: bool = False):
+        from onnx_inference import load_doctr_predictor
+        self.predictor = load_doctr_predictor(model_dir, quantized, threads, allow_unverified)
+
+
+class OnnxPaddleBackend(PaddleBackend):
+    """PaddleOCR on the paddle2onnx-converted models, optionally int8 (see onnx_inference.py)."""
+    name = 'paddle_onnx'
+
+    def __init__(self, lang: str = 'german', model_dir: str = 'onnx_models', quantized: bool = False,
+                 allow_unverified: bool = False, per_box_cls: bool = False, rec_batch_num: Optional[int] = None):
+        from paddleocr import PaddleOCR
+        from onnx_inference import paddle_onnx_kwargs
+        self.per_box_cls = per_box_cls
+        self.ocr = PaddleOCR(use_angle_cls=per_box_cls, lang=lang, show_log=False,
+                             **paddle_onnx_kwargs(model_dir, lang, quantized, allow_unverified),
+                             **({'rec_batch_num': rec_batch_num} if rec_batch_num else {}))
+
+
+class OcrmypdfBackend(OcrBackend):
+    """
+    OCRmyPDF on a single page image. Words, boxes and confidences are streamed from the
+    hOCR sidecar, whose coordinates are the pixel coordinates of the page image.
+    """
+    name = 'ocrmypdf'
+
+    def __init__(self, language: str = 'deu', dpi: int = 300):
+        self.language = language
+        self.dpi = dpi
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        from hocr_stream import iter_hocr_pages
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image_path = os.path.join(tmp_dir, 'page.png')
+            hocr_path = os.path.join(tmp_dir, 'page.hocr')
+            cv2.imwrite(image_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR) if image.ndim == 3 else image)
+            cmd = [
+                "ocrmypdf",
+                "-l", self.language,
+                "--image-dpi", str(self.dpi),
+                "--sidecar", hocr_path,
+                "--sidecar-format", "hocr",
+                "--output-type", "none",
+                "--tesseract-config", "tessedit_pageseg_mode=6",
+                image_path,
+                "/dev/null",
+            ]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            return [word for _, page_words in iter_hocr_pages(hocr_path) for word in page_words]
+
+
+BACKEND_CLASSES = {
+    cls.name: cls for cls in (TextLayerBackend, TesseractBackend, DoctrBackend, PaddleBackend, OcrmypdfBackend,
+                              OnnxDoctrBackend, OnnxPaddleBackend)
+}
+
+
+def create_backend(name: str, **kwargs) -> OcrBackend:
+    """Instantiate a backend by name; raises KeyError for unknown names and ImportError if the engine is missing."""
+    return BACKEND_CLASSES[name](**kwargs)
+
+
+def compute_page_features(image: np.ndarray, pdf_page=None, thumb_side: int = 512) -> PageFeatures:
+    """
+    Compute cheap routing features on a thumbnail of the page.
+
+    Args:
+    image (np.ndarray): Page image in full resolution.
+    pdf_page: Optional PyMuPDF page, used to detect an existing text layer.
+    thumb_side (int): Longest side of the thumbnail the features are computed on.
+
+    Returns:
+    PageFeatures: Text layer presence, scan quality in [0, 1] and table density in [0, 1].
+    """
+    gray = to_gray(image)
+    h, w = gray.shape
+    scale = min(1.0, thumb_side / max(h, w))
+    thumb = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    has_text_layer = pdf_page is not None and len(pdf_page.get_text('words')) >= 5
+
+    # Scan quality: sharpness (variance of the Laplacian) and contrast between ink and paper
+    sharpness = min(1.0, cv2.Laplacian(thumb, cv2.CV_64F).var() / 1000.0)
+    contrast = min(1.0, float(thumb.std()) / 64.0)
+    scan_quality = 0.5 * sharpness + 0.5 * contrast
+
+    # Table density: share of ink pixels that belong to long horizontal or vertical rulings
+    _, binary = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    ink = int(np.count_nonzero(binary))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(2, thumb.shape[1] // 20), 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(2, thumb.shape[0] // 20))))
+    rulings = int(np.count_nonzero(horizontal | vertical))
+    table_density = min(1.0, 4.0 * rulings / ink) if ink else 0.0
+
+    return PageFeatures(has_text_layer, scan_quality, table_density, h * w / 1e6)
+
+
+# Prior cost (seconds per megapixel on one CPU core) and expected mean word confidence per
+# scan-quality bucket. Measured values replace the priors as pages are processed.
+DEFAULT_PRIORS = {
+    'text_layer': {'seconds_per_mp': 0.001, 'confidence': {'low': 1.0, 'mid': 1.0, 'high': 1.0}, 'table_penalty': 0.0},
+    'tesseract': {'seconds_per_mp': 0.25, 'confidence': {'low': 0.60, 'mid': 0.80, 'high': 0.90}, 'table_penalty': 0.10},
+    'paddle': {'seconds_per_mp': 0.40, 'confidence': {'low': 0.75, 'mid': 0.88, 'high': 0.93}, 'table_penalty': 0.03},
+    'doctr': {'seconds_per_mp': 0.80, 'confidence': {'low': 0.80, 'mid': 0.90, 'high': 0.95}, 'table_penalty': 0.02},
+    'ocrmypdf': {'seconds_per_mp': 1.00, 'confidence': {'low': 0.60, 'mid': 0.80, 'high': 0.90}, 'table_penalty': 0.10},
+    'paddle_onnx': {'seconds_per_mp': 0.15, 'confidence': {'low': 0.74, 'mid': 0.87, 'high': 0.93}, 'table_penalty': 0.03},
+    'doctr_onnx': {'seconds_per_mp': 0.30, 'confidence': {'low': 0.79, 'mid': 0.89, 'high': 0.95}, 'table_penalty': 0.02},
+}
+# Weight of the prior in pseudo-observations
+PRIOR_WEIGHT = 3.0
+# Smoothing factor for the measured throughput
+THROUGHPUT_ALPHA = 0.2
+
+
+def quality_bucket(features: PageFeatures) -> str:
+    if features.scan_quality < 0.35:
+        return 'low'
+    if features.scan_quality < 0.65:
+        return 'mid'
+    return 'high'
+
+
+def density_bucket(features: PageFeatures) -> str:
+    return 'table' if features.table_density >= 0.2 else 'prose'
+
+
+class BackendRouter:
+    """
+    Picks the cheapest backend per page that is expected to reach a confidence target.
+
+    Cost is the measured seconds per megapixel of each backend times the page size. The
+    expected confidence is the mean word confidence the backend reached on earlier pages
+    with the same scan-quality and table-density bucket, blended with a prior.
+    """
+
+    def __init__(self, backends: Dict[str, OcrBackend], confidence_target: float = 0.85,
+                 stats_path: Optional[str] = None):
+        self.backends = backends
+        self.confidence_target = confidence_target
+        self.stats_path = stats_path
+        self.stats = {'throughput': {}, 'confidence': {}}
+        if stats_path and os.path.exists(stats_path):
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+
+    def expected_cost(self, name: str, features: PageFeatures) -> float:
+        seconds_per_mp = self.stats['throughput'].get(name, DEFAULT_PRIORS[name]['seconds_per_mp'])
+        return seconds_per_mp * features.megapixels
+
+    def expected_confidence(self, name: str, features: PageFeatures) -> float:
+        if name == TextLayerBackend.name and not features.has_text_layer:
+            return 0.0
+        prior = DEFAULT_PRIORS[name]
+        prior_conf = prior['confidence'][quality_bucket(features)]
+        if density_bucket(features) == 'table':
+            prior_conf -= prior['table_penalty']
+        key = f"{quality_bucket(features)}:{density_bucket(features)}"
+        observed = self.stats['confidence'].get(name, {}).get(key)
+        if not observed:
+            return prior_conf
+        n, mean = observed
+        return (PRIOR_WEIGHT * prior_conf + n * mean) / (PRIOR_WEIGHT + n)
+
+    def route(self, features: PageFeatures) -> str:
+        """Return the name of the cheapest backend whose expected confidence reaches the target."""
+        candidates = sorted(self.backends, key=lambda name: self.expected_cost(name, features))
+        for name in candidates:
+            if self.expected_confidence(name, features) >= self.confidence_target:
+                return name
+        # Nobody reaches the target: take the most accurate backend
+        return max(candidates, key=lambda name: self.expected_confidence(name, features))
+
+    def record(self, name: str, features: PageFeatures, seconds: float, words: List[OcrWord]):
+        """Update throughput and confidence statistics with one processed page."""
+        if features.megapixels > 0:
+            measured = seconds / features.megapixels
+            previous = self.stats['throughput'].get(name)
+            self.stats['throughput'][name] = measured if previous is None else (
+                (1 - THROUGHPUT_ALPHA) * previous + THROUGHPUT_ALPHA * measured)
+        if words:
+            mean_conf = float(np.mean([word.confidence for word in words]))
+            key = f"{quality_bucket(features)}:{density_bucket(features)}"
+            n, mean = self.stats['confidence'].setdefault(name, {}).get(key, (0, 0.0))
+            self.stats['confidence'][name][key] = (n + 1, mean + (mean_conf - mean) / (n + 1))
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> Tuple[str, List[OcrWord]]:
+        """Route one page, run the chosen backend and record its measurements."""
+        features = compute_page_features(image, pdf_page)
+        name = self.route(features)
+        start = time.perf_counter()
+        words = self.backends[name].recognize(image, pdf_page)
+        self.record(name, features, time.perf_counter() - start, words)
+        logging.debug(f"Routed page to {name}: {asdict(features)}")
+        return name, words
+
+    def save(self):
+        """Persist the measured statistics so the next run starts from them."""
+        if not self.stats_path:
+            return
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+
+def main():
+    """Route every page of a PDF to a backend and write all words to a CSV file."""
+    import fitz  # PyMuPDF
+
+    parser = argparse.ArgumentParser(description="Run each PDF page through the cheapest sufficient OCR backend.")
+    parser.add_argument("pdf", help="Input PDF file")
+    parser.add_argument("output_csv", help="Output CSV with one row per word")
+    parser.add_argument("--backends", default="text_layer,tesseract,paddle,doctr",
+                        help="Comma-separated list of backends the router may use")
+    parser.add_argument("--target", type=float, default=0.85, help="Confidence target per page")
+    parser.add_argument("--dpi", type=int, default=300, help="Render resolution")
+    parser.add_argument("--stats", default="router_stats.json", help="File with measured backend statistics")
+    parser.add_argument("--cache", help="Read deskewed pages from this preprocessing cache instead of rendering them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    backends = {}
+    for name in args.backends.split(','):
+        try:
+            backends[name] = create_backend(name)
+        except ImportError as e:
+            logging.warning(f"Backend {name} not available: {e}")
+    if not backends:
+        logging.error("No OCR backend available.")
+        sys.exit(1)
+
+    router = BackendRouter(backends, confidence_target=args.target, stats_path=args.stats)
+    cached_pages = None
+    if args.cache:
+        from preprocess_cache import PreprocessCache, DEFAULT_PARAMS
+        cached_pages = PreprocessCache(args.cache).pdf_pages(args.pdf, dict(DEFAULT_PARAMS, dpi=args.dpi))
+
+    with fitz.open(args.pdf) as doc, open(args.output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["page", "backend", "line", "text", "x0", "y0", "x1", "y1", "confidence"])
+        for page_num, page in enumerate(doc, start=1):
+            if cached_pages is not None:
+                image = next(cached_pages).gray
+            else:
+                pix = page.get_pixmap(dpi=args.dpi, colorspace=fitz.csGRAY)
+                image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+            name, words = router.recognize(image, page)
+            logging.info(f"Page {page_num}: {name}, {len(words)} words")
+            for word in words:
+                writer.writerow([page_num, name, word.line, word.text,
+                                 round(word.x0, 1), round(word.y0, 1), round(word.x1, 1), round(word.y1, 1),
+                                 round(word.confidence, 4)])
+    router.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import time
+import base64
+import logging
+import argparse
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ocr_backends import OcrBackend, OcrWord, create_backend, to_gray
+from table_reconstruction import reconstruct_table
+
+# Words below this confidence go to the heavy engine, below LLM_THRESHOLD (after it) to the LLM
+CONFIDENCE_THRESHOLD = 0.80
+LLM_THRESHOLD = 0.50
+# Confidence assigned to text read by the LLM, which reports none
+LLM_CONFIDENCE = 0.75
+# Pixels of context around each crop
+CROP_PADDING = 4
+
+# (crop) -> text; used as last resort
+LlmReader = Callable[[np.ndarray], str]
+
+
+def group_weak_words(words: List[OcrWord], weak: List[int]) -> List[List[int]]:
+    """
+    Group weak words that touch on the same line into one crop, so a cell that the fast engine
+    split into several tokens (e.g. '1. 234,5 6') is read again as a whole.
+    """
+    groups: List[List[int]] = []
+    for i in sorted(weak, key=lambda i: (words[i].line, words[i].x0)):
+        if groups:
+            last = words[groups[-1][-1]]
+            word = words[i]
+            gap = word.x0 - last.x1
+            if word.line == last.line and gap < (last.y1 - last.y0):
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+    return groups
+
+
+def union_box(words: List[OcrWord]) -> Tuple[float, float, float, float]:
+    return min(w.x0 for w in words), min(w.y0 for w in words), max(w.x1 for w in words), max(w.y1 for w in words)
+
+
+def crop_box(image: np.ndarray, box, padding: int = CROP_PADDING) -> np.ndarray:
+    h, w = image.shape[:2]
+    x0, y0, x1, y1 = box
+    return image[max(0, int(y0) - padding):min(h, int(y1) + padding + 1),
+                 max(0, int(x0) - padding):min(w, int(x1) + padding + 1)]
+
+
+def ollama_crop_reader(url: str, model: str = 'llava', timeout: float = 60.0) -> LlmReader:
+    """LLM reader for an Ollama server: sends the crop as base64 PNG to /api/generate."""
+    import requests
+    from PIL import Image
+
+    def read(crop: np.ndarray) -> str:
+        buffer = io.BytesIO()
+        Image.fromarray(crop).save(buffer, format='PNG')
+        response = requests.post(f"{url}/api/generate", timeout=timeout, json={
+            'model': model,
+            'prompt': "Gib ausschließlich den Text in diesem Bildausschnitt wieder, ohne Erklärung.",
+            'images': [base64.b64encode(buffer.getvalue()).decode('ascii')],
+            'stream': False,
+        })
+        response.raise_for_status()
+        return response.json()['response'].strip()
+
+    return read
+
+
+class CascadeRecognizer(OcrBackend):
+    """
+    Confidence-driven cascade of engines.
+
+    The fast backend reads the whole page. Words (grouped into cells) below threshold are cropped
+    and read again in one batch by the heavy backend; what is still below llm_threshold goes to
+    the LLM reader. A re-read replaces the fast result only if it is more confident, and keeps the
+    box of the fast engine, so reconstruct_table sees the same layout.
+    """
+    name = 'cascade'
+
+    def __init__(self, fast: OcrBackend, heavy: Optional[OcrBackend] = None, llm: Optional[LlmReader] = None,
+                 threshold: float = CONFIDENCE_THRESHOLD, llm_threshold: float = LLM_THRESHOLD,
+                 padding: int = CROP_PADDING):
+        self.fast = fast
+        self.heavy = heavy
+        self.llm = llm
+        self.threshold = threshold
+        self.llm_threshold = llm_threshold
+        self.padding = padding
+        self.name = '>'.join(b.name for b in (fast, heavy) if b) + ('>llm' if llm else '')
+        self.stats = {'pages': 0, 'words': 0, 'heavy_crops': 0, 'heavy_improved': 0, 'llm_crops': 0,
+                      'fast_s': 0.0, 'heavy_s': 0.0, 'llm_s': 0.0}
+        self._lock = threading.Lock()
+
+    def _add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self.stats[key] += value
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        start = time.perf_counter()
+        words = self.fast.recognize(image, pdf_page)
+        self._add(pages=1, words=len(words), fast_s=time.perf_counter() - start)
+
+        groups = group_weak_words(words, [i for i, w in enumerate(words) if w.confidence < self.threshold])
+        if not groups:
+            return words
+        # Zusammengefasste Zellen: ein Wort mit der Box aller Teile
+        merged = {}
+        for group in groups:
+            parts = [words[i] for i in group]
+            merged[group[0]] = OcrWord(' '.join(w.text for w in parts), *union_box(parts),
+                                       min(w.confidence for w in parts), parts[0].line)
+        gray = to_gray(image)
+
+        if self.heavy is not None:
+            start = time.perf_counter()
+            results = self.heavy.read_crops([crop_box(gray, union_box([merged[g[0]]]), self.padding) for g in groups])
+            improved = 0
+            for group, (text, conf) in zip(groups, results):
+                current = merged[group[0]]
+                if text.strip() and conf > current.confidence:
+                    merged[group[0]] = OcrWord(text.strip(), current.x0, current.y0, current.x1, current.y1, conf, current.line)
+                    improved += 1
+            self._add(heavy_crops=len(groups), heavy_improved=improved, heavy_s=time.perf_counter() - start)
+
+        if self.llm is not None:
+            start = time.perf_counter()
+            asked = 0
+            for group in groups:
+                current = merged[group[0]]
+                if current.confidence >= self.llm_threshold:
+                    continue
+                asked += 1
+                try:
+                    text = self.llm(crop_box(gray, union_box([current]), self.padding))
+                except Exception as e:
+                    logging.warning(f"LLM could not read crop: {e}")
+                    continue
+                if text:
+                    merged[group[0]] = OcrWord(text, current.x0, current.y0, current.x1, current.y1,
+                                               max(current.confidence, LLM_CONFIDENCE), current.line)
+            self._add(llm_crops=asked, llm_s=time.perf_counter() - start)
+
+        replaced = {i for group in groups for i in group}
+        result = [w for i, w in enumerate(words) if i not in replaced] + list(merged.values())
+        return sorted(result, key=lambda w: (w.line, w.x0))
+
+    def report(self) -> Dict[str, float]:
+        """How much of the work went to which level."""
+        with self._lock:
+            report = dict(self.stats)
+        report['heavy_share'] = report['heavy_crops'] / report['words'] if report['words'] else 0.0
+        report['llm_share'] = report['llm_crops'] / report['words'] if report['words'] else 0.0
+        logging.info(f"OCR cascade: {report}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the table of page images with a fast engine, re-reading only weak words with a heavier one.")
+    parser.add_argument("images", nargs="+", help="Page images")
+    parser.add_argument("--fast", default="tesseract", help="Backend for the full page")
+    parser.add_argument("--heavy", default="doctr", help="Backend for weak words ('' to skip)")
+    parser.add_argument("--llm-url", help="Ollama URL for words that stay weak (last resort)")
+    parser.add_argument("--llm-model", default="llava", help="Ollama model with image input")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="Confidence below which words are re-read")
+    parser.add_argument("--llm-threshold", type=float, default=LLM_THRESHOLD, help="Confidence below which the LLM is asked")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    import cv2
+
+    cascade = CascadeRecognizer(create_backend(args.fast), create_backend(args.heavy) if args.heavy else None,
+                                ollama_crop_reader(args.llm_url, args.llm_model) if args.llm_url else None,
+                                args.threshold, args.llm_threshold)
+    for path in args.images:
+        table = reconstruct_table(cascade.recognize(cv2.imread(path, cv2.IMREAD_GRAYSCALE)))
+        print(f"# {path}")
+        for row in table:
+            print('\t'.join(row))
+    print(json.dumps(cascade.report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
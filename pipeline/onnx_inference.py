@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Optional
+
+import cv2
+
+from ocr_backends import create_backend
+from table_reconstruction import reconstruct_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+DEFAULT_MODEL_DIR = 'onnx_models'
+# Architectures exported for doctr; they must exist under the same name in onnxtr.models
+DOCTR_DET_ARCH = 'db_resnet50'
+DOCTR_RECO_ARCH = 'crnn_vgg16_bn'
+# Largest acceptable drop in cell accuracy on the benchmark corpus before a variant is approved
+DEFAULT_MAX_DELTA = 0.01
+MANIFEST = 'manifest.json'
+
+
+def engine_dir(model_dir: str, engine: str, lang: str = 'german') -> str:
+    return os.path.join(model_dir, 'doctr' if engine == 'doctr' else f"paddle_{lang}")
+
+
+def load_manifest(directory: str) -> Dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No exported models in {directory}; run onnx_inference.py export first")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(directory: str, manifest: Dict):
+    tmp_path = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+
+def session_options(threads: Optional[int] = None):
+    """ONNX Runtime session options: all graph optimizations (constant folding, node fusion), fixed thread count."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if threads:
+        options.intra_op_num_threads = threads
+    return options
+
+
+def quantize_model(model_path: str) -> str:
+    """
+    Dynamic int8 quantization of the weights (activations are quantized at runtime, no calibration data needed).
+    Returns the path of the quantized model next to the original.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = model_path.replace('.onnx', '.int8.onnx')
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8, per_channel=True)
+    return output_path
+
+
+def variant(quantized: bool) -> str:
+    return 'int8' if quantized else 'fp32'
+
+
+def model_paths(directory: str, manifest: Dict, quantized: bool, allow_unverified: bool = False) -> Dict[str, str]:
+    """Paths of the model files of one variant; refuses variants that have not passed the accuracy guard."""
+    guard = manifest.get('guard', {}).get(variant(quantized))
+    if not allow_unverified and not (guard and guard['approved']):
+        raise RuntimeError(f"{variant(quantized)} models in {directory} have not passed the accuracy guard "
+                           f"(run onnx_inference.py guard) - {guard or 'not checked'}")
+    return {role: os.path.join(directory, name) for role, name in manifest['models'][variant(quantized)].items()}
+
+
+def export_doctr(model_dir: str = DEFAULT_MODEL_DIR, det_arch: str = DOCTR_DET_ARCH, reco_arch: str = DOCTR_RECO_ARCH,
+                 quantize: bool = True) -> Dict:
+    """
+    Export doctr's detection and recognition models to ONNX (and int8).
+
+    Args:
+    model_dir (str): Root directory of the exported models.
+    det_arch (str): doctr detection architecture.
+    reco_arch (str): doctr recognition architecture.
+    quantize (bool): Also write int8 versions.
+
+    Returns:
+    Dict: The manifest written to <model_dir>/doctr/manifest.json.
+    """
+    import torch
+    from doctr.models import ocr_predictor
+    from doctr.models.utils import export_model_to_onnx
+
+    directory = engine_dir(model_dir, 'doctr')
+    os.makedirs(directory, exist_ok=True)
+    predictor = ocr_predictor(det_arch=det_arch, reco_arch=reco_arch, pretrained=True)
+    # Eingabegrößen wie im Predictor: Seiten auf 1024x1024, Wortausschnitte auf 32x128
+    models = {
+        'det': export_model_to_onnx(predictor.det_predictor.model, os.path.join(directory, 'det'),
+                                    torch.rand((1, 3, 1024, 1024), dtype=torch.float32)),
+        'reco': export_model_to_onnx(predictor.reco_predictor.model, os.path.join(directory, 'reco'),
+                                     torch.rand((1, 3, 32, 128), dtype=torch.float32)),
+    }
+    manifest = {'engine': 'doctr', 'det_arch': det_arch, 'reco_arch': reco_arch,
+                'models': {'fp32': {role: os.path.basename(path) for role, path in models.items()}}, 'guard': {}}
+    if quantize:
+        manifest['models']['int8'] = {role: os.path.basename(quantize_model(path)) for role, path in models.items()}
+    save_manifest(directory, manifest)
+    logging.info(f"doctr models exported to {directory}")
+    return manifest
+
+
+def export_paddle(model_dir: str = DEFAULT_MODEL_DIR, lang: str = 'german', quantize: bool = True) -> Dict:
+    """
+    Convert the PaddleOCR detection, recognition and angle classifier inference models with paddle2onnx.
+
+    Returns:
+    Dict: The manifest written to <model_dir>/paddle_<lang>/manifest.json.
+    """
+    from paddleocr import PaddleOCR
+
+    directory = engine_dir(model_dir, 'paddle', lang)
+    os.makedirs(directory, exist_ok=True)
+    # Lädt die Inferenzmodelle herunter, falls sie noch nicht lokal liegen
+    ocr = PaddleOCR(use_angle_cls=True, lang=lang, show_log=False)
+    models = {}
+    for role, source_dir in (('det', ocr.args.det_model_dir), ('rec', ocr.args.rec_model_dir), ('cls', ocr.args.cls_model_dir)):
+        models[role] = os.path.join(directory, f"{role}.onnx")
+        subprocess.run(['paddle2onnx', '--model_dir', source_dir,
+                        '--model_filename', 'inference.pdmodel', '--params_filename', 'inference.pdiparams',
+                        '--save_file', models[role], '--opset_version', '11', '--enable_onnx_checker', 'True'],
+                       check=True, capture_output=True)
+    manifest = {'engine': 'paddle', 'lang': lang,
+                'models': {'fp32': {role: os.path.basename(path) for role, path in models.items()}}, 'guard': {}}
+    if quantize:
+        manifest['models']['int8'] = {role: os.path.basename(quantize_model(path)) for role, path in models.items()}
+    save_manifest(directory, manifest)
+    logging.info(f"PaddleOCR models exported to {directory}")
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def load_doctr_predictor(model_dir: str = DEFAULT_MODEL_DIR, quantized: bool = False, threads: Optional[int] = None,
+                         allow_unverified: bool = False):
+    """
+    onnxtr predictor (same pre- and post-processing and output classes as doctr) on the exported models.
+    Cached per configuration; ONNX Runtime sessions can be shared between threads.
+    """
+    import onnxtr.models as onnxtr_models
+    from onnxtr.models import EngineConfig, ocr_predictor
+
+    directory = engine_dir(model_dir, 'doctr')
+    manifest = load_manifest(directory)
+    paths = model_paths(directory, manifest, quantized, allow_unverified)
+    config = EngineConfig(providers=[('CPUExecutionProvider', {})], session_options=session_options(threads))
+    det = getattr(onnxtr_models, manifest['det_arch'])(paths['det'], engine_cfg=config)
+    reco = getattr(onnxtr_models, manifest['reco_arch'])(paths['reco'], engine_cfg=config)
+    return ocr_predictor(det_arch=det, reco_arch=reco)
+
+
+def paddle_onnx_kwargs(model_dir: str = DEFAULT_MODEL_DIR, lang: str = 'german', quantized: bool = False,
+                       allow_unverified: bool = False) -> Dict:
+    """Keyword arguments that make PaddleOCR run the exported models on ONNX Runtime."""
+    directory = engine_dir(model_dir, 'paddle', lang)
+    paths = model_paths(directory, load_manifest(directory), quantized, allow_unverified)
+    return {'use_onnx': True, 'det_model_dir': paths['det'], 'rec_model_dir': paths['rec'], 'cls_model_dir': paths['cls']}
+
+
+def words_text(words) -> str:
+    return ' '.join(w.text for w in sorted(words, key=lambda w: (w.line, w.x0)))
+
+
+def accuracy_guard(corpus_dir: str, engine: str = 'doctr', model_dir: str = DEFAULT_MODEL_DIR, quantized: bool = False,
+                   lang: str = 'german', max_delta: float = DEFAULT_MAX_DELTA, limit: int = 0) -> Dict:
+    """
+    Compare an exported variant with the reference model on the benchmark corpus and record the verdict.
+
+    Both backends recognize every corpus page (as RGB); tables are rebuilt with reconstruct_table and
+    scored against the ground truth. For doctr the reference is built from the architectures recorded
+    at export, so only the export and quantization loss is measured. The variant is approved if its
+    mean cell accuracy is at most max_delta below the reference.
+
+    Returns:
+    Dict: Accuracy of both models, text agreement, pages per second and the verdict (also stored in the manifest).
+    """
+    from run_benchmark import cell_accuracy
+
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        samples = json.load(f)
+    if limit:
+        samples = samples[:limit]
+
+    onnx_kwargs = {'model_dir': model_dir, 'quantized': quantized, 'allow_unverified': True}
+    directory = engine_dir(model_dir, engine, lang)
+    architectures = {}
+    if engine == 'doctr':
+        # Gleiche Architekturen wie exportiert: der Standard-Detektor von doctr ist je nach Version ein anderer
+        manifest = load_manifest(directory)
+        architectures = {'det_arch': manifest['det_arch'], 'reco_arch': manifest['reco_arch']}
+        reference, candidate = create_backend('doctr', **architectures), create_backend('doctr_onnx', **onnx_kwargs)
+    else:
+        reference, candidate = create_backend('paddle', lang=lang), create_backend('paddle_onnx', lang=lang, **onnx_kwargs)
+
+    totals = {'reference': [0.0, 0.0], 'candidate': [0.0, 0.0]}
+    agreement = 0.0
+    for sample in samples:
+        # cv2 liest BGR, die Backends erwarten RGB
+        image = cv2.cvtColor(cv2.imread(os.path.join(corpus_dir, sample['image'])), cv2.COLOR_BGR2RGB)
+        texts = {}
+        for key, backend in (('reference', reference), ('candidate', candidate)):
+            start = time.perf_counter()
+            words = backend.recognize(image)
+            totals[key][0] += time.perf_counter() - start
+            totals[key][1] += cell_accuracy(sample['cells'], reconstruct_table(words))
+            texts[key] = words_text(words)
+        agreement += SequenceMatcher(None, texts['reference'], texts['candidate']).ratio()
+
+    pages = max(1, len(samples))
+    result = {
+        'pages': len(samples),
+        'reference_accuracy': totals['reference'][1] / pages,
+        'accuracy': totals['candidate'][1] / pages,
+        'text_agreement': agreement / pages,
+        'reference_pages_per_second': len(samples) / totals['reference'][0] if totals['reference'][0] else 0.0,
+        'pages_per_second': len(samples) / totals['candidate'][0] if totals['candidate'][0] else 0.0,
+        'max_delta': max_delta,
+        'reference': dict(architectures, engine=engine),
+        'checked': time.time(),
+    }
+    result['delta'] = result['reference_accuracy'] - result['accuracy']
+    result['approved'] = result['delta'] <= max_delta
+
+    manifest = load_manifest(directory)
+    manifest.setdefault('guard', {})[variant(quantized)] = result
+    save_manifest(directory, manifest)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export doctr/PaddleOCR models to ONNX Runtime and check them against the reference models.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export (and quantize) the models")
+    export_parser.add_argument("engine", choices=["doctr", "paddle"])
+    export_parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="Root directory of the exported models")
+    export_parser.add_argument("--lang", default="german", help="PaddleOCR language")
+    export_parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 versions")
+
+    guard_parser = subparsers.add_parser("guard", help="Compare an exported variant with the reference model on the benchmark corpus")
+    guard_parser.add_argument("engine", choices=["doctr", "paddle"])
+    guard_parser.add_argument("corpus_dir", help="Corpus directory created by benchmark/generate_corpus.py")
+    guard_parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="Root directory of the exported models")
+    guard_parser.add_argument("--lang", default="german", help="PaddleOCR language")
+    guard_parser.add_argument("--int8", action="store_true", help="Check the quantized variant")
+    guard_parser.add_argument("--max-delta", type=float, default=DEFAULT_MAX_DELTA, help="Largest acceptable drop in cell accuracy")
+    guard_parser.add_argument("--limit", type=int, default=0, help="Only use the first N samples")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "export":
+        if args.engine == "doctr":
+            export_doctr(args.model_dir, quantize=not args.no_quantize)
+        else:
+            export_paddle(args.model_dir, args.lang, quantize=not args.no_quantize)
+        return
+
+    result = accuracy_guard(args.corpus_dir, args.engine, args.model_dir, args.int8, args.lang, args.max_delta, args.limit)
+    print(json.dumps(result, indent=2))
+    if not result['approved']:
+        logging.warning(f"{variant(args.int8)} rejected: accuracy drops by {result['delta']:.3f} (allowed {args.max_delta})")
+        sys.exit(1)
+    speedup = result['pages_per_second'] / result['reference_pages_per_second'] if result['reference_pages_per_second'] else 0.0
+    logging.info(f"{variant(args.int8)} approved, {speedup:.1f}x pages per second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import os
+import json
+import argparse
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ocr_backends import OcrBackend, OcrWord, to_gray, create_backend
+from word_table import WordTable
+
+# Width of the normalized reference thumbnail kept per page for template diffs
+REFERENCE_WIDTH = 320
+# Hamming distance (of 64 bits) up to which a page counts as a near duplicate / as the same template.
+# The hashes do not see changed figures on a template, so near duplicates are reused only if the
+# pixel diff finds no changed tile; 0 until the threshold is calibrated on real scans.
+NEAR_THRESHOLD = 0
+TEMPLATE_THRESHOLD = 14
+# Template diff: tile grid and mean absolute gray difference that marks a tile as changed
+TILE_GRID = (16, 12)
+TILE_DIFF_THRESHOLD = 12.0
+
+
+def normalize_page(gray: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+    """
+    Crop a page to the bounding box of its ink, so rescans with other margins or offsets
+    hash alike. Returns the crop and its box (x0, y0, x1, y1) in page pixels.
+    """
+    h, w = gray.shape
+    scale = min(1.0, 1000 / max(h, w))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    points = cv2.findNonZero(binary)
+    if points is None:
+        return gray, (0, 0, w, h)
+    x, y, bw, bh = cv2.boundingRect(points)
+    box = (int(x / scale), int(y / scale), min(w, int((x + bw) / scale) + 1), min(h, int((y + bh) / scale) + 1))
+    return gray[box[1]:box[3], box[0]:box[2]], box
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64-bit difference hash: sign of the horizontal gradient on a 9x8 thumbnail."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def phash(gray: np.ndarray) -> int:
+    """64-bit perceptual hash: low-frequency DCT coefficients of a 32x32 thumbnail against their median."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(values: np.ndarray, query: int) -> np.ndarray:
+    """Hamming distances between an array of uint64 hashes and one hash."""
+    xor = np.bitwise_xor(values, np.uint64(query))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class PageIndex:
+    """
+    Persistent index of already recognized pages, kept across runs.
+
+    Hashes live in SQLite and, for lookups, in NumPy arrays (a linear Hamming scan over a
+    million pages takes milliseconds). Results (as WordTable columns, memory-mapped on load)
+    and reference thumbnails are stored as files next to the database.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, 'pages'), exist_ok=True)
+        self.db_path = os.path.join(root, 'index.sqlite')
+        self._lock = threading.Lock()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dhash INTEGER NOT NULL,
+                    phash INTEGER NOT NULL,
+                    box TEXT NOT NULL,
+                    source TEXT,
+                    created REAL NOT NULL
+                )""")
+            rows = conn.execute("SELECT id, dhash, phash FROM pages ORDER BY id").fetchall()
+        self.ids = [row[0] for row in rows]
+        self.dhashes = np.array([row[1] for row in rows], dtype=np.int64).view(np.uint64)
+        self.phashes = np.array([row[2] for row in rows], dtype=np.int64).view(np.uint64)
+
+    def _page_path(self, page_id: int, name: str) -> str:
+        return os.path.join(self.root, 'pages', f"{page_id}.{name}")
+
+    def nearest(self, d: int, p: int) -> Optional[Tuple[int, int]]:
+        """Return (page id, distance) of the closest stored page; distance is the larger of both hash distances."""
+        with self._lock:
+            if not self.ids:
+                return None
+            distances = np.maximum(hamming(self.dhashes, d), hamming(self.phashes, p))
+            best = int(np.argmin(distances))
+            return self.ids[best], int(distances[best])
+
+    def load(self, page_id: int) -> Tuple[WordTable, np.ndarray, Tuple[int, int, int, int]]:
+        with open(self._page_path(page_id, 'json'), 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        reference = np.load(self._page_path(page_id, 'npy'))
+        if 'words' in stored:
+            # Index aus älteren Versionen: Wörter noch als JSON gespeichert
+            words = WordTable.from_words([OcrWord(**word) for word in stored['words']])
+        else:
+            words = WordTable.load(self._page_path(page_id, 'words'))
+        return words, reference, tuple(stored['box'])
+
+    def add(self, d: int, p: int, box, reference: np.ndarray, words: Union[List[OcrWord], WordTable], source: str = '') -> int:
+        with self._lock:
+            with sqlite3.connect(self.db_path) as conn:
+                page_id = conn.execute(
+                    "INSERT INTO pages (dhash, phash, box, source, created) VALUES (?, ?, ?, ?, ?)",
+                    (to_signed(d), to_signed(p), json.dumps(box), source, time.time())).lastrowid
+            np.save(self._page_path(page_id, 'npy'), reference)
+            (words if isinstance(words, WordTable) else WordTable.from_words(words)).save(self._page_path(page_id, 'words'))
+            with open(self._page_path(page_id, 'json'), 'w', encoding='utf-8') as f:
+                json.dump({'box': list(box)}, f)
+            self.ids.append(page_id)
+            self.dhashes = np.append(self.dhashes, np.uint64(d))
+            self.phashes = np.append(self.phashes, np.uint64(p))
+            return page_id
+
+
+def map_words(words: WordTable, src_box, dst_box) -> WordTable:
+    """Move words from the content box of a stored page onto the content box of the current page."""
+    sx = (dst_box[2] - dst_box[0]) / max(1, src_box[2] - src_box[0])
+    sy = (dst_box[3] - dst_box[1]) / max(1, src_box[3] - src_box[1])
+    src = np.array([src_box[0], src_box[1], src_box[0], src_box[1]], dtype=np.float64)
+    dst = np.array([dst_box[0], dst_box[1], dst_box[0], dst_box[1]], dtype=np.float64)
+    return words.with_boxes(dst + (words.boxes - src) * np.array([sx, sy, sx, sy]))
+
+
+def changed_regions(reference: np.ndarray, current: np.ndarray, box) -> List[Tuple[int, int, int, int]]:
+    """
+    Compare the normalized thumbnails tile by tile and return the changed tiles as
+    (x0, y0, x1, y1) rectangles in page pixels of the current page.
+    """
+    current = cv2.resize(current, (reference.shape[1], reference.shape[0]), interpolation=cv2.INTER_AREA)
+    diff = cv2.absdiff(cv2.GaussianBlur(reference, (3, 3), 0), cv2.GaussianBlur(current, (3, 3), 0))
+    cols, rows = TILE_GRID
+    th, tw = reference.shape[0] / rows, reference.shape[1] / cols
+    sx = (box[2] - box[0]) / reference.shape[1]
+    sy = (box[3] - box[1]) / reference.shape[0]
+    regions = []
+    for r in range(rows):
+        for c in range(cols):
+            y0, y1, x0, x1 = int(r * th), int((r + 1) * th), int(c * tw), int((c + 1) * tw)
+            if diff[y0:y1, x0:x1].mean() > TILE_DIFF_THRESHOLD:
+                # Eine halbe Kachel Rand, damit Wörter an der Kachelgrenze vollständig erfasst werden
+                regions.append((int(box[0] + (x0 - tw / 2) * sx), int(box[1] + (y0 - th / 2) * sy),
+                                int(box[0] + (x1 + tw / 2) * sx), int(box[1] + (y1 + th / 2) * sy)))
+    return regions
+
+
+def center_in(word: OcrWord, regions) -> bool:
+    cx, cy = (word.x0 + word.x1) / 2, (word.y0 + word.y1) / 2
+    return any(x0 <= cx < x1 and y0 <= cy < y1 for x0, y0, x1, y1 in regions)
+
+
+def centers_in(words: WordTable, regions) -> np.ndarray:
+    """Mask of the words whose center lies in one of the regions."""
+    cx, cy = words.cx, words.cy
+    mask = np.zeros(len(words), dtype=bool)
+    for x0, y0, x1, y1 in regions:
+        mask |= (x0 <= cx) & (cx < x1) & (y0 <= cy) & (cy < y1)
+    return mask
+
+
+class DedupRecognizer(OcrBackend):
+    """
+    Wraps a backend and reuses the results of identical, near-identical and template pages.
+
+    - exact (distance 0) and near duplicates (distance <= near_threshold) reuse the stored words
+      if no tile differs from the stored reference; equal hashes alone do not suffice.
+    - template pages (distance <= template_threshold) reuse the stored words outside the changed
+      tiles; only the changed tiles are OCRed again.
+    - everything else is OCRed in full and added to the index.
+    """
+
+    def __init__(self, backend: OcrBackend, index: PageIndex, near_threshold: int = NEAR_THRESHOLD,
+                 template_threshold: int = TEMPLATE_THRESHOLD):
+        self.backend = backend
+        self.name = f"dedup+{backend.name}"
+        self.index = index
+        self.near_threshold = near_threshold
+        self.template_threshold = template_threshold
+        self.stats = {'exact': 0, 'near': 0, 'template': 0, 'miss': 0, 'reocr_area': 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str, area: float = 0.0):
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats['reocr_area'] += area
+
+    def recognize(self, image: np.ndarray, pdf_page=None, source: str = '') -> List[OcrWord]:
+        gray = to_gray(image)
+        crop, box = normalize_page(gray)
+        reference = cv2.resize(crop, (REFERENCE_WIDTH, max(1, int(crop.shape[0] * REFERENCE_WIDTH / max(1, crop.shape[1])))),
+                               interpolation=cv2.INTER_AREA)
+        d, p = dhash(reference), phash(reference)
+        match = self.index.nearest(d, p)
+
+        if match and match[1] <= self.template_threshold:
+            page_id, distance = match
+            stored_words, stored_reference, stored_box = self.index.load(page_id)
+            words = map_words(stored_words, stored_box, box)
+            # Die Hashes sind zu grob für geänderte Beträge auf derselben Vorlage, daher immer die Pixel vergleichen
+            regions = changed_regions(stored_reference, reference, box)
+            if not regions and distance <= self.near_threshold:
+                self._count('exact' if distance == 0 else 'near')
+                return words.to_words()
+            page_area = gray.shape[0] * gray.shape[1]
+            kept = words.filter(~centers_in(words, regions))
+            fresh = []
+            for x0, y0, x1, y1 in regions:
+                x0, y0 = max(0, x0), max(0, y0)
+                x1, y1 = min(gray.shape[1], x1), min(gray.shape[0], y1)
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                for w in self.backend.recognize(image[y0:y1, x0:x1]):
+                    word = OcrWord(w.text, w.x0 + x0, w.y0 + y0, w.x1 + x0, w.y1 + y0, w.confidence, w.line)
+                    # Nur Wörter übernehmen, deren Mitte im geänderten Bereich liegt
+                    if center_in(word, [(x0, y0, x1, y1)]) and not center_in(word, [(f.x0, f.y0, f.x1, f.y1) for f in fresh]):
+                        fresh.append(word)
+            self._count('template', sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions) / page_area)
+            words = WordTable.concat([kept, WordTable.from_words(fresh)])
+            self.index.add(d, p, box, reference, words, source)
+            return words.to_words()
+
+        self._count('miss', 1.0)
+        words = self.backend.recognize(image, pdf_page)
+        self.index.add(d, p, box, reference, words, source)
+        return words
+
+    def report(self) -> Dict[str, float]:
+        """Hit rates per kind and the share of page area that still had to be OCRed."""
+        with self._lock:
+            total = sum(self.stats[k] for k in ('exact', 'near', 'template', 'miss'))
+            report = {k: self.stats[k] for k in ('exact', 'near', 'template', 'miss')}
+            report['pages'] = total
+            report['hit_rate'] = (total - self.stats['miss']) / total if total else 0.0
+            report['reocr_area_share'] = self.stats['reocr_area'] / total if total else 0.0
+        logging.info(f"Page dedup: {report}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR PDFs through the page hash index and report how many pages were reused.")
+    parser.add_argument("index_dir", help="Directory of the page hash index (created if missing)")
+    parser.add_argument("pdfs", nargs="+", help="PDF files")
+    parser.add_argument("--engine", default="tesseract", help="OCR backend for pages that are not in the index")
+    parser.add_argument("--near", type=int, default=NEAR_THRESHOLD, help="Max. Hamming distance for reusing a page as is")
+    parser.add_argument("--template", type=int, default=TEMPLATE_THRESHOLD,
+                        help="Max. Hamming distance for template pages (only changed regions are OCRed again)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    import fitz  # PyMuPDF
+    from adaptive_dpi import render_page_adaptive
+
+    recognizer = DedupRecognizer(create_backend(args.engine), PageIndex(args.index_dir), args.near, args.template)
+    for pdf_path in args.pdfs:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                gray, _ = render_page_adaptive(page, engine=args.engine)
+                recognizer.recognize(gray, page, source=f"{pdf_path}#{page.number + 1}")
+    print(json.dumps(recognizer.report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ocr_backends import create_backend, to_gray
+from grid_detection import extract_ruling_lines, runs
+
+# Longest side of the thumbnail the line direction is measured on
+THUMB_SIDE = 1024
+# Edge energy of one projection has to exceed the other by this factor before the page is turned by 90°
+AXIS_MARGIN = 1.25
+# Text lines read upright and turned by 180° to tell 0 from 180 (and 90 from 270)
+SAMPLE_LINES = 6
+# Mean confidence the 180° reading has to gain before the page is flipped
+FLIP_MARGIN = 0.05
+
+# (crops) -> [(text, confidence)], e.g. OcrBackend.read_crops
+CropReader = Callable[[List[np.ndarray]], List[Tuple[str, float]]]
+
+
+@dataclass
+class PageOrientation:
+    """
+    Orientation of one page.
+
+    angle is the clockwise rotation of the page content in degrees (0, 90, 180 or 270);
+    rotate_upright undoes it. axis_ratio is the edge energy of the row projection over that of the
+    column projection (> 1: text lines run horizontally). upright and flipped hold the mean recognition
+    confidence of the sample lines as found and turned by 180°, or None if no reader was given.
+    """
+    angle: int
+    axis_ratio: float
+    upright: Optional[float] = None
+    flipped: Optional[float] = None
+
+
+def rotate_upright(image: np.ndarray, angle: int) -> np.ndarray:
+    """Turn an image counter-clockwise by angle (multiple of 90), i.e. undo a clockwise rotation of the content."""
+    if angle % 360 == 0:
+        return image
+    return np.ascontiguousarray(np.rot90(image, (angle // 90) % 4))
+
+
+def text_mask(gray: np.ndarray) -> np.ndarray:
+    """Inverted binarization without ruling lines, so table grids do not count as text lines."""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    horizontal, vertical = extract_ruling_lines(binary, min_length_ratio=1 / 20)
+    return cv2.subtract(binary, cv2.bitwise_or(horizontal, vertical))
+
+
+def profile_energy(mask: np.ndarray, axis: int) -> float:
+    """Mean squared difference of neighbouring values of the ink projection; high where lines and gaps alternate sharply."""
+    profile = np.count_nonzero(mask, axis=axis).astype(np.float64)
+    return float(np.mean(np.diff(profile) ** 2)) if len(profile) > 1 else 0.0
+
+
+def line_axis_ratio(gray: np.ndarray, thumb_side: int = THUMB_SIDE) -> float:
+    """Edge energy of the row projection over that of the column projection, measured on a thumbnail."""
+    h, w = gray.shape
+    scale = min(1.0, thumb_side / max(h, w))
+    thumb = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    mask = text_mask(thumb)
+    rows, cols = profile_energy(mask, 1), profile_energy(mask, 0)
+    if not cols:
+        return float('inf') if rows else 1.0
+    return rows / cols
+
+
+def sample_lines(gray: np.ndarray, count: int = SAMPLE_LINES, padding: int = 4) -> List[np.ndarray]:
+    """
+    Crop up to count typical text lines of an (axis-corrected) page: bands of the row projection with
+    median height and the most ink, each cut to a stretch of about 16 line heights ending in a gap.
+    """
+    mask = text_mask(gray)
+    profile = np.count_nonzero(mask, axis=1)
+    bands = [(int(y0), int(y1)) for y0, y1 in runs(profile >= 2) if y1 - y0 >= 8]
+    if not bands:
+        return []
+    median = float(np.median([y1 - y0 for y0, y1 in bands]))
+    bands = [b for b in bands if 0.6 * median <= b[1] - b[0] <= 1.8 * median]
+    bands.sort(key=lambda b: int(profile[b[0]:b[1]].sum()), reverse=True)
+
+    h, w = gray.shape
+    crops = []
+    for y0, y1 in bands[:count]:
+        inked = np.flatnonzero(mask[y0:y1].any(axis=0))
+        if not inked.size:
+            continue
+        x0 = int(inked[0])
+        limit = min(w, x0 + 16 * (y1 - y0))
+        # Am letzten Zwischenraum vor der Grenze schneiden, nicht mitten im Zeichen
+        gaps = np.flatnonzero(~mask[y0:y1, x0:limit].any(axis=0))
+        x1 = x0 + int(gaps[-1]) if gaps.size and gaps[-1] > 4 * (y1 - y0) else limit
+        crops.append(gray[max(0, y0 - padding):min(h, y1 + padding), max(0, x0 - padding):min(w, x1 + padding)])
+    return crops
+
+
+def detect_orientation(image: np.ndarray, reader: Optional[CropReader] = None,
+                       thumb_side: int = THUMB_SIDE, sample: int = SAMPLE_LINES) -> PageOrientation:
+    """
+    Determine the orientation of a whole page once.
+
+    The line direction (0/180 vs. 90/270) comes from the projection profiles of a thumbnail.
+    Up and down cannot be told from the profiles, so a few text lines are read by the recognition
+    model as found and turned by 180°; the more confident reading wins. Without reader only the
+    axis is corrected (0 or 90).
+
+    Args:
+    image (np.ndarray): Page image, grayscale or color.
+    reader (CropReader): Recognition-only reader, e.g. backend.read_crops.
+    thumb_side (int): Longest side of the thumbnail for the projection profiles.
+    sample (int): Number of text lines read for the 180° decision.
+
+    Returns:
+    PageOrientation: Detected angle and the measurements behind it.
+    """
+    gray = to_gray(image)
+    ratio = line_axis_ratio(gray, thumb_side)
+    orientation = PageOrientation(90 if ratio * AXIS_MARGIN < 1.0 else 0, ratio)
+    if reader is None:
+        return orientation
+
+    crops = sample_lines(rotate_upright(gray, orientation.angle), sample)
+    if not crops:
+        return orientation
+    results = reader(crops + [np.ascontiguousarray(crop[::-1, ::-1]) for crop in crops])
+    orientation.upright = float(np.mean([conf for _, conf in results[:len(crops)]]))
+    orientation.flipped = float(np.mean([conf for _, conf in results[len(crops):]]))
+    if orientation.flipped > orientation.upright + FLIP_MARGIN:
+        orientation.angle = (orientation.angle + 180) % 360
+    return orientation
+
+
+def correct_orientation(image: np.ndarray, reader: Optional[CropReader] = None, **kwargs) -> Tuple[np.ndarray, PageOrientation]:
+    """Detect the page orientation and return the upright page together with the detection result."""
+    orientation = detect_orientation(image, reader, **kwargs)
+    if orientation.angle:
+        logging.info(f"Page turned by {orientation.angle}° (axis ratio {orientation.axis_ratio:.2f}, "
+                     f"confidence {orientation.upright} upright vs. {orientation.flipped} flipped)")
+    return rotate_upright(image, orientation.angle), orientation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect the page orientation (0/90/180/270) of page images.")
+    parser.add_argument("images", nargs="+", help="Page images")
+    parser.add_argument("--engine", default="paddle", help="Backend whose recognition model decides 0 vs. 180 ('' for axis only)")
+    parser.add_argument("--output-dir", help="Write the upright pages to this directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    reader = create_backend(args.engine).read_crops if args.engine else None
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for path in args.images:
+        image = cv2.imread(path)
+        upright, orientation = correct_orientation(image, reader)
+        print(f"{path}\t{orientation.angle}\t{orientation.axis_ratio:.2f}")
+        if args.output_dir:
+            cv2.imwrite(os.path.join(args.output_dir, os.path.basename(path)), upright)
+
+
+if __name__ == "__main__":
+    main()
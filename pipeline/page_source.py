@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import argparse
+import threading
+from dataclasses import dataclass, asdict, replace
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.tif', '.tiff', '.png', '.jpg', '.jpeg', '.bmp')
+PAGE_EXTENSIONS = PDF_EXTENSIONS + IMAGE_EXTENSIONS
+# Same default as pdf2image.convert_from_path
+DEFAULT_DPI = 200
+
+
+@dataclass(frozen=True)
+class PageInfo:
+    """
+    One page without its pixels: position in the source, the file and frame it comes from
+    (frames = pages of that file), its size in pixels and its resolution (0 if unknown).
+    """
+    index: int
+    path: str
+    frame: int
+    frames: int
+    width: int
+    height: int
+    dpi: float
+
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1e6
+
+
+class PageSource:
+    """
+    Pages of one input, decoded one at a time on demand.
+
+    Page count (len) and page sizes (info) come from the file structure only - PDF page boxes,
+    TIFF directories, image headers - so work can be planned before any pixels are loaded.
+    page() decodes a single page as a grayscale ('L') or RGB array, PDF pages optionally at another
+    DPI than the source's; iterating a source yields the grayscale pages in order. Sources hold
+    open files: use them as context managers.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def info(self, index: int) -> PageInfo:
+        raise NotImplementedError
+
+    def page(self, index: int, mode: str = 'L', dpi: Optional[float] = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def infos(self) -> List[PageInfo]:
+        return [self.info(index) for index in range(len(self))]
+
+    def pages(self, mode: str = 'L') -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self.page(index, mode)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return self.pages()
+
+    def _check(self, index: int):
+        if not 0 <= index < len(self):
+            raise IndexError(f"Page {index} out of range (source has {len(self)} pages)")
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> 'PageSource':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ImageFileSource(PageSource):
+    """A single image file or a multi-page TIFF; Pillow reads only the header and decodes one frame per page()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._image = Image.open(path)
+        self._frames = getattr(self._image, 'n_frames', 1)
+        # Ein Pillow-Bild hat einen Frame-Zeiger; seek und Dekodieren gehören zusammen
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._frames
+
+    def info(self, index: int) -> PageInfo:
+        self._check(index)
+        with self._lock:
+            self._image.seek(index)
+            width, height = self._image.size
+            dpi = self._image.info.get('dpi', (0, 0))[0]
+        return PageInfo(index, self.path, index, self._frames, width, height, float(dpi or 0))
+
+    def page(self, index: int, mode: str = 'L', dpi: Optional[float] = None) -> np.ndarray:
+        # Pixelbilder haben eine feste Auflösung; dpi gilt nur für PDF-Seiten
+        self._check(index)
+        with self._lock:
+            self._image.seek(index)
+            return np.array(self._image.convert(mode))
+
+    def close(self):
+        self._image.close()
+
+
+class PdfSource(PageSource):
+    """
+    PDF pages rendered with PyMuPDF at a fixed DPI, or at the adaptive DPI of adaptive_dpi.py if an
+    engine is given (info then reports the size at the nominal DPI, the rendered size follows the probe).
+    An explicit dpi passed to page() overrides both.
+    """
+
+    def __init__(self, path: str, dpi: int = DEFAULT_DPI, engine: Optional[str] = None):
+        import fitz  # PyMuPDF
+
+        self.path = path
+        self.dpi = dpi
+        self.engine = engine
+        self._doc = fitz.open(path)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._doc.page_count
+
+    def info(self, index: int) -> PageInfo:
+        self._check(index)
+        with self._lock:
+            rect = self._doc[index].rect
+        scale = self.dpi / 72.0
+        return PageInfo(index, self.path, index, len(self), int(round(rect.width * scale)),
+                        int(round(rect.height * scale)), float(self.dpi))
+
+    def page(self, index: int, mode: str = 'L', dpi: Optional[float] = None) -> np.ndarray:
+        import fitz  # PyMuPDF
+
+        self._check(index)
+        with self._lock:
+            page = self._doc[index]
+            if self.engine and dpi is None:
+                from adaptive_dpi import render_page_adaptive
+                gray = render_page_adaptive(page, engine=self.engine)[0]
+                return gray if mode == 'L' else np.repeat(gray[:, :, None], 3, axis=2)
+            pix = page.get_pixmap(dpi=int(round(dpi or self.dpi)), colorspace=fitz.csGRAY if mode == 'L' else fitz.csRGB, alpha=False)
+        # Zeilen können aufgefüllt sein (stride), daher über stride zuschneiden
+        samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+        image = samples.reshape(pix.height, pix.width, pix.n)
+        return np.array(image[:, :, 0] if pix.n == 1 else image)
+
+    def close(self):
+        self._doc.close()
+
+
+class DirectorySource(PageSource):
+    """
+    All supported files of a directory in name order as one source (a multi-page TIFF contributes
+    all its frames). Only the file the current page comes from is kept open.
+    """
+
+    def __init__(self, path: str, **options):
+        self.path = path
+        self.options = options
+        self.files = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                      if name.lower().endswith(PAGE_EXTENSIONS) and os.path.isfile(os.path.join(path, name))]
+        counts = []
+        for file in self.files:
+            with open_source(file, **options) as source:
+                counts.append(len(source))
+        self._starts = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        self._current: Tuple[int, Optional[PageSource]] = (-1, None)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def _source(self, index: int) -> Tuple[PageSource, int]:
+        """Open source of the file holding page index and the page's index within that file."""
+        file = int(np.searchsorted(self._starts, index, side='right')) - 1
+        if self._current[0] != file:
+            if self._current[1] is not None:
+                self._current[1].close()
+            self._current = (file, open_source(self.files[file], **self.options))
+        return self._current[1], index - int(self._starts[file])
+
+    def info(self, index: int) -> PageInfo:
+        self._check(index)
+        with self._lock:
+            source, local = self._source(index)
+            return replace(source.info(local), index=index)
+
+    def page(self, index: int, mode: str = 'L', dpi: Optional[float] = None) -> np.ndarray:
+        self._check(index)
+        with self._lock:
+            source, local = self._source(index)
+            return source.page(local, mode, dpi)
+
+    def close(self):
+        if self._current[1] is not None:
+            self._current[1].close()
+        self._current = (-1, None)
+
+
+def open_source(path: str, dpi: int = DEFAULT_DPI, engine: Optional[str] = None) -> PageSource:
+    """
+    Open a PDF, a (multi-page) image file or a directory of them as a page source.
+
+    Args:
+    path (str): File or directory.
+    dpi (int): Render resolution of PDF pages.
+    engine (str): Render PDF pages at the adaptive DPI for this engine instead of a fixed DPI.
+
+    Returns:
+    PageSource: The source; raises ValueError for unsupported file types.
+    """
+    if os.path.isdir(path):
+        return DirectorySource(path, dpi=dpi, engine=engine)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return PdfSource(path, dpi, engine)
+    if extension in IMAGE_EXTENSIONS:
+        return ImageFileSource(path)
+    raise ValueError(f"Unsupported input {path}; expected one of {', '.join(PAGE_EXTENSIONS)} or a directory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the pages of inputs (page count, sizes) without decoding them.")
+    parser.add_argument("inputs", nargs="+", help="PDFs, image files, multi-page TIFFs or directories")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="Render resolution assumed for PDF pages")
+    parser.add_argument("--pages", action="store_true", help="List every page, not only the totals")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        with open_source(path, args.dpi) as source:
+            infos = source.infos()
+        summary = {'path': path, 'pages': len(infos), 'megapixels': round(sum(i.megapixels for i in infos), 1)}
+        if args.pages:
+            summary['page_info'] = [asdict(i) for i in infos]
+        print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
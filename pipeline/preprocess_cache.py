@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from instrumentation import get_tracer
+
+# Parameters of the preprocessing; they are part of the cache key
+DEFAULT_PARAMS = {
+    'dpi': 200,
+    'canny_low': 50,
+    'canny_high': 150,
+    'hough_threshold': 200,
+}
+
+
+@dataclass
+class PreprocessedPage:
+    """Deskewed grayscale page and its Otsu binarization (both read-only memory maps when loaded from the cache)."""
+    key: str
+    gray: np.ndarray
+    binary: np.ndarray
+    angle: float
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_key(source_digest: str, page_index: int, params: Dict) -> str:
+    """Cache key of one page: content hash of the source, page number and preprocessing parameters."""
+    material = f"{source_digest}:{page_index}:{json.dumps(params, sort_keys=True)}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def deskew(gray: np.ndarray, params: Dict = DEFAULT_PARAMS, out: Optional[np.ndarray] = None):
+    """
+    Rotate a grayscale page so that its dominant lines are horizontal.
+    Same method as correct_image_orientation: Canny edges, Hough lines, median angle.
+    With out (same shape and dtype, e.g. a shared page buffer) the result is written into it.
+
+    Returns:
+    (np.ndarray, float): Rotated image and the applied angle in degrees.
+    """
+    edges = cv2.Canny(gray, params['canny_low'], params['canny_high'], apertureSize=3)
+    lines = cv2.HoughLines(edges, 1, np.pi / 180, params['hough_threshold'])
+    angle = float(np.median(lines[:, 0, 1] * 180 / np.pi - 90)) if lines is not None else 0.0
+    if angle == 0.0:
+        if out is not None:
+            out[...] = gray
+            return out, angle
+        return gray, angle
+    (h, w) = gray.shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    return cv2.warpAffine(gray, M, (w, h), dst=out, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE), angle
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Inverted Otsu binarization (ink = 255), as used by segment_image_into_lines."""
+    _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binary
+
+
+class PreprocessCache:
+    """
+    On-disk store of preprocessed pages.
+
+    Every page lives in its own directory <root>/<key[:2]>/<key>/ with gray.npy, binary.npy
+    and meta.json. Pages are loaded with np.load(mmap_mode='r'), so all engines reading the
+    same page share the page cache of the operating system instead of private copies.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _page_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[PreprocessedPage]:
+        page_dir = self._page_dir(key)
+        try:
+            with open(os.path.join(page_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            gray = np.load(os.path.join(page_dir, 'gray.npy'), mmap_mode='r')
+            binary = np.load(os.path.join(page_dir, 'binary.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        return PreprocessedPage(key, gray, binary, meta['angle'])
+
+    def put(self, key: str, gray: np.ndarray, binary: np.ndarray, meta: Dict) -> PreprocessedPage:
+        """Store a page atomically: write into a temporary directory and rename it into place."""
+        page_dir = self._page_dir(key)
+        os.makedirs(os.path.dirname(page_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(page_dir))
+        try:
+            np.save(os.path.join(tmp_dir, 'gray.npy'), np.ascontiguousarray(gray))
+            np.save(os.path.join(tmp_dir, 'binary.npy'), np.ascontiguousarray(binary))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, page_dir)
+        except OSError:
+            # Another process stored the same page first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return self.get(key)
+
+    def pdf_pages(self, pdf_path: str, params: Dict = DEFAULT_PARAMS) -> Iterator[PreprocessedPage]:
+        """
+        Yield all pages of a PDF, preprocessing and storing only the pages that are not cached yet.
+
+        Args:
+        pdf_path (str): Path to the PDF file.
+        params (Dict): Preprocessing parameters (see DEFAULT_PARAMS).
+
+        Returns:
+        Iterator[PreprocessedPage]: One entry per page, in page order.
+        """
+        tracer = get_tracer()
+        digest = file_digest(pdf_path)
+        page_count = pdfinfo_from_path(pdf_path)['Pages']
+        for page_index in range(page_count):
+            key = page_key(digest, page_index, params)
+            page = self.get(key)
+            if page is None:
+                with tracer.span('rasterize', items=1, page=page_index + 1, cache='miss'):
+                    image = convert_from_path(pdf_path, dpi=params['dpi'], grayscale=True,
+                                              first_page=page_index + 1, last_page=page_index + 1)[0]
+                    gray = np.array(image)
+                with tracer.span('deskew', items=1, page=page_index + 1, cache='miss'):
+                    gray, angle = deskew(gray, params)
+                    binary = binarize(gray)
+                page = self.put(key, gray, binary, {'source': os.path.basename(pdf_path), 'page': page_index,
+                                                    'angle': angle, 'params': params})
+            yield page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess PDF pages once into the shared memory-mapped cache.")
+    parser.add_argument("cache_dir", help="Cache directory")
+    parser.add_argument("pdfs", nargs='+', help="PDF files to preprocess")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_PARAMS['dpi'], help="Render resolution")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    cache = PreprocessCache(args.cache_dir)
+    params = dict(DEFAULT_PARAMS, dpi=args.dpi)
+    for pdf_path in args.pdfs:
+        pages = sum(1 for _ in cache.pdf_pages(pdf_path, params))
+        logging.info(f"{pdf_path}: {pages} pages cached")
+
+
+if __name__ == "__main__":
+    main()
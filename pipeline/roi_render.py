@@ -0,0 +1,100 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from grid_detection import extract_ruling_lines, detect_unruled_grid
+
+THUMB_DPI = 72
+RENDER_DPI = 300
+# Rand um jede Tabelle in Punkten (1/72 Zoll)
+MARGIN_PT = 6
+# Ruled regions smaller than this share of the page are treated as noise (logos, underlines)
+MIN_AREA_RATIO = 0.01
+
+
+def merge_boxes(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """Merge overlapping (x0, y0, x1, y1) boxes until none overlap."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+
+def detect_table_boxes(thumb: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Find table bounding boxes on a grayscale thumbnail.
+
+    Ruled tables are the connected regions of horizontal and vertical ruling lines. If there are
+    none, the whitespace grid of an unruled table is used.
+
+    Returns:
+    List[Tuple[int, int, int, int]]: (x0, y0, x1, y1) boxes in thumbnail pixels, top to bottom.
+    """
+    _, binary = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    horizontal, vertical = extract_ruling_lines(binary, min_length_ratio=1 / 15)
+    rulings = cv2.dilate(horizontal | vertical, np.ones((5, 5), np.uint8))
+
+    page_area = thumb.shape[0] * thumb.shape[1]
+    boxes = []
+    contours, _ = cv2.findContours(rulings, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Einzelne Linien (Unterstreichungen) haben keine Fläche
+        if w * h >= MIN_AREA_RATIO * page_area and min(w, h) > 10:
+            boxes.append((x, y, x + w, y + h))
+    if boxes:
+        return merge_boxes(boxes)
+
+    grid = detect_unruled_grid(binary)
+    if grid is None:
+        return []
+    return [(grid.cols[0], grid.rows[0], grid.cols[-1], grid.rows[-1])]
+
+
+def render_table_regions(page, dpi: int = RENDER_DPI, thumb_dpi: int = THUMB_DPI,
+                         margin_pt: float = MARGIN_PT, fallback_full_page: bool = True) -> List[Tuple[object, np.ndarray]]:
+    """
+    Rasterize only the table areas of a PDF page.
+
+    A cheap thumbnail is searched for tables; each table rectangle (plus margin) is then
+    rendered on its own at full resolution with PyMuPDF's clip rendering.
+
+    Args:
+    page: PyMuPDF page.
+    dpi (int): Resolution of the table crops.
+    thumb_dpi (int): Resolution of the detection thumbnail.
+    margin_pt (float): Margin around each table in points.
+    fallback_full_page (bool): Render the whole page if no table is found (otherwise return []).
+
+    Returns:
+    List[Tuple[fitz.Rect, np.ndarray]]: Clip rectangle in PDF points and grayscale crop per table.
+    """
+    import fitz  # PyMuPDF
+
+    def render(clip=None, resolution=dpi):
+        pix = page.get_pixmap(dpi=resolution, clip=clip, colorspace=fitz.csGRAY)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+    scale = 72.0 / thumb_dpi
+    regions = []
+    for x0, y0, x1, y1 in detect_table_boxes(render(resolution=thumb_dpi)):
+        rect = fitz.Rect(x0 * scale - margin_pt, y0 * scale - margin_pt,
+                         x1 * scale + margin_pt, y1 * scale + margin_pt) & page.rect
+        if not rect.is_empty:
+            regions.append((rect, render(clip=rect)))
+
+    if not regions and fallback_full_page:
+        regions.append((page.rect, render()))
+    return regions
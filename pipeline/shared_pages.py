@@ -0,0 +1,202 @@
+import os
+import sys
+import uuid
+import glob
+import struct
+import logging
+import multiprocessing
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from preprocess_cache import DEFAULT_PARAMS, deskew
+
+# Segment names: <prefix>_<pid of the creator>_<random>, so leftovers of crashed processes can be found
+SEGMENT_PREFIX = 'ocrpage'
+# The first bytes of every segment hold the reference count (int64); the page data starts aligned after it
+HEADER_BYTES = 64
+
+_lock = None
+# Segments attached in this process; views handed out by page_array() point into them
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+# Released segments that could not be closed yet because views were still alive
+_detached: List[shared_memory.SharedMemory] = []
+
+
+@dataclass(frozen=True)
+class PageHandle:
+    """Picklable reference to a page array in shared memory. Only this crosses process boundaries."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+def init_worker(lock):
+    """Pool initializer: use the lock of the parent for reference counting (required with the spawn start method)."""
+    global _lock
+    _lock = lock
+
+
+def get_lock():
+    global _lock
+    if _lock is None:
+        _lock = multiprocessing.Lock()
+    return _lock
+
+
+def page_pool(processes: Optional[int] = None) -> 'multiprocessing.pool.Pool':
+    """Process pool whose workers share the reference-count lock of this process."""
+    return multiprocessing.Pool(processes, initializer=init_worker, initargs=(get_lock(),))
+
+
+def _open(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    # Die Lebensdauer regelt der Referenzzähler; der resource_tracker würde das Segment sonst
+    # beim Ende des erzeugenden bzw. jedes anhängenden Prozesses löschen
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    if sys.version_info < (3, 13):
+        # unlink() meldet das Segment beim resource_tracker ab, also vorher wieder anmelden
+        resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+def _segment(name: str) -> shared_memory.SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = _open(name)
+    return shm
+
+
+def _close_detached():
+    for shm in list(_detached):
+        try:
+            shm.close()
+            _detached.remove(shm)
+        except BufferError:
+            pass
+
+
+def create_page(shape: Tuple[int, ...], dtype=np.uint8) -> Tuple[PageHandle, np.ndarray]:
+    """
+    Allocate a page buffer in shared memory with a reference count of 1.
+
+    Returns:
+    (PageHandle, np.ndarray): Handle and a writable view, e.g. as dst of cv2.warpAffine or to render into.
+    """
+    handle = PageHandle(f"{SEGMENT_PREFIX}_{os.getpid()}_{uuid.uuid4().hex[:12]}", tuple(int(n) for n in shape),
+                        np.dtype(dtype).str)
+    shm = _open(handle.name, create=True, size=HEADER_BYTES + max(1, handle.nbytes))
+    struct.pack_into('q', shm.buf, 0, 1)
+    _attached[handle.name] = shm
+    return handle, page_array(handle)
+
+
+def share_array(array: np.ndarray) -> PageHandle:
+    """Copy an array into a new shared page buffer."""
+    handle, view = create_page(array.shape, array.dtype)
+    view[...] = array
+    return handle
+
+
+def page_array(handle: PageHandle) -> np.ndarray:
+    """Zero-copy view of a shared page; valid until this process releases the handle."""
+    shm = _segment(handle.name)
+    return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=shm.buf, offset=HEADER_BYTES)
+
+
+def refcount(handle: PageHandle) -> int:
+    return struct.unpack_from('q', _segment(handle.name).buf, 0)[0]
+
+
+def retain(handle: PageHandle, count: int = 1):
+    """Add references, e.g. before handing one page to several consumers."""
+    shm = _segment(handle.name)
+    with get_lock():
+        struct.pack_into('q', shm.buf, 0, struct.unpack_from('q', shm.buf, 0)[0] + count)
+
+
+def release(handle: PageHandle):
+    """
+    Drop one reference and detach the page in this process. The last reference removes the segment.
+    Views from page_array() must not be used afterwards.
+    """
+    shm = _segment(handle.name)
+    with get_lock():
+        remaining = struct.unpack_from('q', shm.buf, 0)[0] - 1
+        struct.pack_into('q', shm.buf, 0, remaining)
+        if remaining <= 0:
+            # Unter POSIX bleibt der Speicher gültig, bis der letzte Prozess ihn ausblendet
+            _unlink(shm)
+    del _attached[handle.name]
+    _detached.append(shm)
+    _close_detached()
+
+
+def detach(handle: PageHandle):
+    """Unmap a page in this process without dropping a reference, e.g. after handing it to another process."""
+    shm = _attached.pop(handle.name, None)
+    if shm is not None:
+        _detached.append(shm)
+    _close_detached()
+
+
+def cleanup_orphans() -> int:
+    """Remove segments left behind by processes that no longer exist (Linux /dev/shm). Returns their number."""
+    removed = 0
+    for path in glob.glob(f"/dev/shm/{SEGMENT_PREFIX}_*"):
+        try:
+            pid = int(os.path.basename(path).split('_')[1])
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            os.remove(path)
+            removed += 1
+        except (ValueError, IndexError, PermissionError):
+            continue
+    if removed:
+        logging.info(f"Removed {removed} orphaned page buffers")
+    return removed
+
+
+def share_pdf_pages(pdf_path: str, dpi: int = 200, grayscale: bool = False) -> Iterator[PageHandle]:
+    """pdf2image producer: rasterize one page at a time and yield it as shared page."""
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    for page_number in range(1, pdfinfo_from_path(pdf_path)['Pages'] + 1):
+        image = convert_from_path(pdf_path, dpi=dpi, grayscale=grayscale, first_page=page_number, last_page=page_number)[0]
+        yield share_array(np.asarray(image))
+
+
+def share_fitz_pages(pdf_path: str, dpi: int = 300) -> Iterator[PageHandle]:
+    """PyMuPDF producer: render each page in grayscale and copy the pixmap straight into a shared buffer."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            handle, view = create_page((pix.height, pix.width))
+            view[...] = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+            del view, pix
+            yield handle
+            detach(handle)
+
+
+def deskew_shared(handle: PageHandle, params: Dict = DEFAULT_PARAMS, release_input: bool = True) -> PageHandle:
+    """Deskew a shared grayscale page into a new shared buffer (the rotation writes directly into it)."""
+    handle_out, out = create_page(handle.shape, handle.dtype)
+    deskew(page_array(handle), params, out=out)
+    del out
+    if release_input:
+        release(handle)
+    return handle_out
@@ -0,0 +1,219 @@
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from instrumentation import get_tracer
+
+# End-of-stream marker passed once to every worker of a stage
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a StagePipeline.
+
+    Args:
+    name (str): Stage name, also used for the tracer spans (see instrumentation.STAGES).
+    func (Callable): Called with the output of the previous stage, returns the input of the next one.
+    workers (int): Number of threads running this stage.
+    queue_size (int): Capacity of the input queue; a full queue blocks the previous stage (backpressure).
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 2
+
+
+@dataclass
+class StageStats:
+    """Time the workers of a stage spent working, waiting for input and blocked on a full output queue."""
+    workers: int
+    items: int = 0
+    busy_s: float = 0.0
+    starved_s: float = 0.0
+    blocked_s: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0, items: int = 0):
+        with self.lock:
+            self.busy_s += busy
+            self.starved_s += starved
+            self.blocked_s += blocked
+            self.items += items
+
+
+class StagePipeline:
+    """
+    Runs stages concurrently in threads connected by bounded queues.
+
+    OpenCV, Tesseract and the inference runtimes release the GIL, so rasterizing page n+1,
+    deskewing page n and recognizing page n-1 overlap. Every item keeps its sequence number and
+    run() yields the results in input order. Bounded queues keep at most
+    sum(queue_size + workers) items in flight, however fast the source is.
+    """
+
+    def __init__(self, stages: List[Stage], output_queue_size: int = 2, source_name: str = 'source'):
+        self.stages = stages
+        self.source_name = source_name
+        self.output_queue_size = output_queue_size
+        self.stats: Dict[str, StageStats] = {}
+        self.wall_s = 0.0
+        self._error: Optional[BaseException] = None
+        self._abort = threading.Event()
+
+    def _put(self, q: queue.Queue, item) -> float:
+        """Put with backpressure; returns the time spent blocked. Gives up when the pipeline aborts."""
+        start = time.perf_counter()
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - start
+
+    def _get(self, q: queue.Queue):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def aborted(self) -> bool:
+        """True once a stage failed or the consumer stopped; sources that block can poll this to give up."""
+        return self._abort.is_set()
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._abort.set()
+
+    def _feed(self, items: Iterable, out_q: queue.Queue, downstream_workers: int):
+        stats = self.stats[self.source_name]
+        iterator = iter(items)
+        seq = 0
+        try:
+            while not self._abort.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.add(busy=time.perf_counter() - start, items=1)
+                stats.add(blocked=self._put(out_q, (seq, item)))
+                seq += 1
+        except BaseException as e:
+            self._fail(e)
+        for _ in range(downstream_workers):
+            self._put(out_q, _DONE)
+
+    def _work(self, stage: Stage, in_q: queue.Queue, out_q: queue.Queue, remaining: List[int],
+              remaining_lock: threading.Lock, downstream_workers: int):
+        tracer = get_tracer()
+        stats = self.stats[stage.name]
+        while True:
+            start = time.perf_counter()
+            entry = self._get(in_q)
+            stats.add(starved=time.perf_counter() - start)
+            if entry is _DONE:
+                break
+            seq, item = entry
+            start = time.perf_counter()
+            try:
+                with tracer.span(stage.name, items=1, page=seq + 1):
+                    result = stage.func(item)
+            except BaseException as e:
+                self._fail(e)
+                break
+            stats.add(busy=time.perf_counter() - start, items=1)
+            stats.add(blocked=self._put(out_q, (seq, result)))
+
+        # Der letzte Worker einer Stufe gibt das Ende an alle Worker der nächsten Stufe weiter
+        with remaining_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(downstream_workers):
+                self._put(out_q, _DONE)
+
+    def run(self, items: Iterable) -> Iterator[Any]:
+        """Feed items through all stages and yield the results of the last stage in input order."""
+        self.stats = {self.source_name: StageStats(workers=1)}
+        self.stats.update({stage.name: StageStats(workers=stage.workers) for stage in self.stages})
+        self._error = None
+        self._abort.clear()
+
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue(maxsize=self.output_queue_size))
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], self.stages[0].workers),
+                                    name='stage-source', daemon=True)]
+        for i, stage in enumerate(self.stages):
+            downstream = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            remaining, remaining_lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[i], queues[i + 1], remaining, remaining_lock, downstream),
+                    name=f"stage-{stage.name}-{n + 1}", daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            # Ergebnisse können außer der Reihe ankommen; zurückhalten, bis die Lücke geschlossen ist
+            pending, next_seq = {}, 0
+            while True:
+                entry = self._get(queues[-1])
+                if entry is _DONE:
+                    break
+                seq, result = entry
+                pending[seq] = result
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+        finally:
+            # Beendet auch die Threads, wenn der Verbraucher vorzeitig aufhört
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+            self.wall_s = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+
+    def utilization(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: share of worker time spent busy, starved (waiting for input) and blocked (output full)."""
+        report = {}
+        for name, stats in self.stats.items():
+            capacity = max(self.wall_s * stats.workers, 1e-9)
+            report[name] = {
+                'workers': stats.workers,
+                'items': stats.items,
+                'busy': stats.busy_s / capacity,
+                'starved': stats.starved_s / capacity,
+                'blocked': stats.blocked_s / capacity,
+            }
+        return report
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Log the utilization table; the busiest stage is the bottleneck."""
+        report = self.utilization()
+        logging.info(f"{'stage':<12}{'workers':>8}{'items':>8}{'busy':>8}{'starved':>9}{'blocked':>9}")
+        for name, row in report.items():
+            logging.info(f"{name:<12}{row['workers']:>8}{row['items']:>8}{row['busy']:>8.0%}{row['starved']:>9.0%}{row['blocked']:>9.0%}")
+        if report:
+            bottleneck = max(report, key=lambda name: report[name]['busy'])
+            logging.info(f"Bottleneck: {bottleneck} ({self.wall_s:.1f} s total)")
+        return report
+
+
+def parse_stage_workers(spec: str) -> Dict[str, int]:
+    """Parse 'deskew=2,ocr=1' into {'deskew': 2, 'ocr': 1}."""
+    counts = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        name, _, count = part.partition('=')
+        counts[name.strip()] = int(count) if count else 1
+    return counts
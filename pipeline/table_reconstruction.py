@@ -0,0 +1,61 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+from ocr_backends import OcrWord
+from word_table import WordTable
+
+
+def row_ids(cy_sorted: np.ndarray, row_tolerance: float) -> np.ndarray:
+    """
+    Row number of every word, given the vertical centers in ascending order. A row starts at its
+    first word and takes all words up to row_tolerance below it (bisection, one step per row).
+    """
+    ids = np.empty(len(cy_sorted), dtype=np.int64)
+    start = row = 0
+    while start < len(cy_sorted):
+        end = max(start + 1, int(np.searchsorted(cy_sorted, cy_sorted[start] + row_tolerance, side='right')))
+        ids[start:end] = row
+        start, row = end, row + 1
+    return ids
+
+
+def reconstruct_table(words: Union[List[OcrWord], WordTable], row_tolerance: Optional[float] = None) -> List[List[str]]:
+    """
+    Group words into table rows by their vertical center and sort each row by x.
+    Same approach as reconstruct_table in paddleocr/ocr_table.py_v2, for any backend.
+
+    Args:
+    words (List[OcrWord] | WordTable): Words (or text boxes) of one page in pixel coordinates.
+    row_tolerance (Optional[float]): A word starts a new row if its center is further than this
+        from the first word of the current row. Defaults to half the median word height.
+
+    Returns:
+    List[List[str]]: Rows padded with empty strings to the same number of columns.
+    """
+    table = words if isinstance(words, WordTable) else WordTable.from_words(words)
+    if not len(table):
+        return []
+    if row_tolerance is None:
+        row_tolerance = 0.5 * float(np.median(table.heights))
+
+    # Sortiere nach Y-Koordinate (Zeilen) und nummeriere die Zeilen
+    cy = table.cy.astype(np.float64)
+    by_y = np.argsort(cy, kind='stable')
+    rows = np.empty(len(table), dtype=np.int64)
+    rows[by_y] = row_ids(cy[by_y], row_tolerance)
+
+    # Innerhalb der Zeile nach X-Koordinate sortieren (bei gleichem X in Y-Reihenfolge)
+    rank = np.empty(len(table), dtype=np.int64)
+    rank[by_y] = np.arange(len(table))
+    order = table.argsort(rows, table.cx, rank)
+    texts = table.texts(order)
+
+    # Erstelle eine einheitliche Tabellenstruktur
+    counts = np.bincount(rows).tolist()
+    max_cols = max(counts)
+    result, start = [], 0
+    for count in counts:
+        result.append(texts[start:start + count] + [''] * (max_cols - count))
+        start += count
+    return result
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import math
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ocr_backends import OcrBackend, OcrWord, create_backend
+from word_table import WordTable
+
+# Side of a tile in pixels; the detection models scale larger inputs down (doctr to 1024 px)
+TILE_SIZE = 1280
+# Overlap of neighbouring tiles; should exceed the widest word or number so that each is whole in one tile
+OVERLAP = 192
+# Pages whose longer side is at most this factor above the tile size are recognized in one piece
+TILE_THRESHOLD = 1.25
+# Two words of different tiles are one word if their boxes overlap by this IoU and the texts match ...
+IOU_THRESHOLD = 0.5
+# ... or if this share of the smaller box lies in the other one and its text is part of the other's (cut-off piece)
+CONTAIN_THRESHOLD = 0.8
+# A word closer than this to an inner tile edge is cut off by the tile and loses against a whole reading
+EDGE_MARGIN = 2
+# Engines whose loaded models can be called from several threads at once; others get one backend per thread
+THREAD_SAFE_ENGINES = ('tesseract', 'ocrmypdf', 'doctr', 'doctr_onnx', 'paddle_onnx')
+
+
+def axis_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    """Start offsets of the tiles along one axis; the last tile ends flush with the page edge."""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    count = math.ceil((length - overlap) / step)
+    return sorted({min(i * step, length - tile_size) for i in range(count)})
+
+
+def tile_grid(width: int, height: int, tile_size: int = TILE_SIZE, overlap: int = OVERLAP) -> List[Tuple[int, int, int, int]]:
+    """Overlapping tiles (x0, y0, x1, y1) covering a page, row by row."""
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in axis_starts(height, tile_size, overlap) for x in axis_starts(width, tile_size, overlap)]
+
+
+def _same_word(a: str, b: str, contained: bool) -> bool:
+    a, b = a.strip().casefold(), b.strip().casefold()
+    if not a or not b:
+        return False
+    return a == b if not contained else (a in b or b in a)
+
+
+def merge_tiles(tables: List[WordTable], tiles: List[Tuple[int, int, int, int]], width: int, height: int) -> Tuple[WordTable, int]:
+    """
+    Merge the words of overlapping tiles (boxes already in page coordinates) into one page.
+
+    Only words reaching into another tile can be read twice. Among those, whole readings win over
+    ones cut off at an inner tile edge, then higher confidence and longer text; a word is dropped
+    if a kept word of another tile has the same box (IoU) and text, or contains it as a cut-off piece.
+
+    Returns:
+    (WordTable, int): Words of the page (line ids reset to -1, they are per tile) and the number of duplicates dropped.
+    """
+    words = WordTable.concat(tables)
+    words.line = np.full(len(words), -1, dtype=np.int32)
+    if len(tables) < 2 or not len(words):
+        return words, 0
+
+    grid = np.asarray(tiles, dtype=np.float32)
+    tile_of = np.repeat(np.arange(len(tables)), [len(t) for t in tables])
+    boxes = words.boxes
+    own = grid[tile_of]
+    cut = (((boxes[:, 0] <= own[:, 0] + EDGE_MARGIN) & (own[:, 0] > 0))
+           | ((boxes[:, 1] <= own[:, 1] + EDGE_MARGIN) & (own[:, 1] > 0))
+           | ((boxes[:, 2] >= own[:, 2] - EDGE_MARGIN) & (own[:, 2] < width))
+           | ((boxes[:, 3] >= own[:, 3] - EDGE_MARGIN) & (own[:, 3] < height)))
+    reaches = ((boxes[:, None, 0] < grid[None, :, 2]) & (boxes[:, None, 2] > grid[None, :, 0])
+               & (boxes[:, None, 1] < grid[None, :, 3]) & (boxes[:, None, 3] > grid[None, :, 1]))
+    candidates = np.flatnonzero(reaches.sum(axis=1) > 1)
+    if not len(candidates):
+        return words, 0
+
+    lengths = words.char_lengths()
+    order = candidates[np.lexsort((-lengths[candidates], -words.confidence[candidates], cut[candidates]))]
+    texts = dict(zip(order.tolist(), words.texts(order)))
+    areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-6)
+    kept: List[int] = []
+    dropped = np.zeros(len(words), dtype=bool)
+    for i in order.tolist():
+        if kept:
+            k = np.asarray(kept)
+            iw = np.minimum(boxes[k, 2], boxes[i, 2]) - np.maximum(boxes[k, 0], boxes[i, 0])
+            ih = np.minimum(boxes[k, 3], boxes[i, 3]) - np.maximum(boxes[k, 1], boxes[i, 1])
+            inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+            iou = inter / (areas[k] + areas[i] - inter)
+            contain = inter / np.minimum(areas[k], areas[i])
+            other = tile_of[k] != tile_of[i]
+            # Texte nur für die wenigen geometrischen Treffer vergleichen
+            hits = np.flatnonzero(other & ((iou >= IOU_THRESHOLD) | (contain >= CONTAIN_THRESHOLD)))
+            if any((iou[j] >= IOU_THRESHOLD and _same_word(texts[i], texts[int(k[j])], False))
+                   or (contain[j] >= CONTAIN_THRESHOLD and _same_word(texts[i], texts[int(k[j])], True))
+                   for j in hits.tolist()):
+                dropped[i] = True
+                continue
+        kept.append(i)
+    return words.filter(~dropped), int(dropped.sum())
+
+
+class TiledRecognizer(OcrBackend):
+    """
+    Wraps a backend and recognizes oversized pages in overlapping tiles.
+
+    Every tile is read at full resolution, so the detection model does not shrink small digits
+    away and the page layout cannot merge unrelated columns. The tiles run in a thread pool (or,
+    with one worker, as one batch) and the words are merged back into page coordinates.
+    Pages that fit into a tile are passed through unchanged.
+    """
+
+    def __init__(self, backend: OcrBackend, tile_size: int = TILE_SIZE, overlap: int = OVERLAP, workers: int = 1,
+                 factory: Optional[Callable[[], OcrBackend]] = None):
+        if not 0 <= overlap < tile_size:
+            raise ValueError(f"Overlap {overlap} must be smaller than the tile size {tile_size}")
+        self.backend = backend
+        self.name = f"tiled+{backend.name}"
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.workers = workers
+        self.factory = factory
+        self.stats = {'pages': 0, 'tiled': 0, 'tiles': 0, 'duplicates': 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='tile') if workers > 1 else None
+
+    def _thread_backend(self) -> OcrBackend:
+        if self.factory is None:
+            return self.backend
+        backend = getattr(self._local, 'backend', None)
+        if backend is None:
+            backend = self._local.backend = self.factory()
+        return backend
+
+    def _read_tile(self, image: np.ndarray, tile: Tuple[int, int, int, int]) -> List[OcrWord]:
+        x0, y0, x1, y1 = tile
+        return self._thread_backend().recognize(np.ascontiguousarray(image[y0:y1, x0:x1]))
+
+    def recognize_tiles(self, image: np.ndarray) -> WordTable:
+        """Words of a page as WordTable in page coordinates, tiled if the page is larger than a tile."""
+        height, width = image.shape[:2]
+        if max(height, width) <= self.tile_size * TILE_THRESHOLD:
+            with self._lock:
+                self.stats['pages'] += 1
+            return WordTable.from_words(self.backend.recognize(image))
+
+        tiles = tile_grid(width, height, self.tile_size, self.overlap)
+        if self._pool is not None:
+            results = list(self._pool.map(lambda tile: self._read_tile(image, tile), tiles))
+        else:
+            results = self.backend.recognize_batch([np.ascontiguousarray(image[y0:y1, x0:x1]) for x0, y0, x1, y1 in tiles])
+        tables = []
+        for (x0, y0, _, _), words in zip(tiles, results):
+            table = WordTable.from_words(words)
+            tables.append(table.with_boxes(table.boxes + np.array([x0, y0, x0, y0], dtype=np.float32)))
+        words, duplicates = merge_tiles(tables, tiles, width, height)
+        with self._lock:
+            self.stats['pages'] += 1
+            self.stats['tiled'] += 1
+            self.stats['tiles'] += len(tiles)
+            self.stats['duplicates'] += duplicates
+        logging.debug(f"{width}x{height} page in {len(tiles)} tiles, {len(words)} words, {duplicates} duplicates dropped")
+        return words
+
+    def recognize(self, image: np.ndarray, pdf_page=None) -> List[OcrWord]:
+        return self.recognize_tiles(image).to_words()
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            report = dict(self.stats)
+        logging.info(f"Tiled OCR: {report}")
+        return report
+
+
+def create_tiled_backend(engine: str, tile_size: int = TILE_SIZE, overlap: int = OVERLAP, workers: int = 1,
+                         **kwargs) -> TiledRecognizer:
+    """Backend by name wrapped in a TiledRecognizer; engines that are not thread-safe get one instance per tile thread."""
+    factory = None
+    if workers > 1 and engine not in THREAD_SAFE_ENGINES:
+        factory = lambda: create_backend(engine, **kwargs)
+    return TiledRecognizer(create_backend(engine, **kwargs), tile_size, overlap, workers, factory)
+
+
+def main():
+    from page_source import open_source
+    from table_reconstruction import reconstruct_table
+
+    parser = argparse.ArgumentParser(description="OCR oversized pages in overlapping tiles and write one table per page.")
+    parser.add_argument("inputs", nargs="+", help="Page images, multi-page TIFFs or PDFs")
+    parser.add_argument("--engine", default="doctr", help="OCR backend for the tiles")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="Side of a tile in pixels")
+    parser.add_argument("--overlap", type=int, default=OVERLAP, help="Overlap of neighbouring tiles in pixels")
+    parser.add_argument("--workers", type=int, default=1, help="Tiles recognized in parallel")
+    parser.add_argument("--dpi", type=int, default=400, help="Render resolution of PDF pages")
+    parser.add_argument("--output-dir", default=".", help="Directory for <name>_seite<n>.csv")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    os.makedirs(args.output_dir, exist_ok=True)
+    backend = create_tiled_backend(args.engine, args.tile_size, args.overlap, args.workers)
+    for path in args.inputs:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open_source(path, args.dpi) as source:
+            for number, image in enumerate(source.pages('RGB'), start=1):
+                rows = reconstruct_table(backend.recognize_tiles(image))
+                output_path = os.path.join(args.output_dir, f"{name}_seite{number}.csv")
+                with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerows(rows)
+                logging.info(f"{path} page {number}: {len(rows)} rows -> {output_path}")
+    backend.report()
+
+
+if __name__ == "__main__":
+    main()
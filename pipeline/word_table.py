@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ocr_backends import OcrWord
+
+
+def split_by_key(keys: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """Positions per distinct key, ascending by key; within a group the positions stay in order."""
+    keys = np.asarray(keys)
+    if not len(keys):
+        return []
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    return [(int(sorted_keys[part[0]]), order[part]) for part in np.split(np.arange(len(keys)), bounds)]
+
+
+class WordTable:
+    """
+    Columnar store of OCR words.
+
+    One NumPy array per attribute instead of one Python object per word: boxes (N, 4) float32 as
+    x0, y0, x1, y1; confidence (N,) float32; page and line (N,) int32 (-1 if unknown); the texts as
+    one UTF-8 buffer (uint8) with N + 1 offsets, word i being text[offsets[i]:offsets[i + 1]].
+    Filtering, sorting and grouping are index operations over these arrays. save() writes one .npy
+    file per column and load() maps them back with np.load(mmap_mode='r'), without a copy.
+    """
+    COLUMNS = ('boxes', 'confidence', 'page', 'line', 'offsets', 'text')
+
+    def __init__(self, boxes: np.ndarray, confidence: np.ndarray, page: np.ndarray, line: np.ndarray,
+                 offsets: np.ndarray, text: np.ndarray):
+        if not len(boxes) == len(confidence) == len(page) == len(line) == len(offsets) - 1:
+            raise ValueError("All columns of a WordTable need one entry per word (offsets one more)")
+        self.boxes = boxes
+        self.confidence = confidence
+        self.page = page
+        self.line = line
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_columns(cls, texts: Sequence[str], boxes, confidence, line=None, page=None) -> 'WordTable':
+        """Build a table from per-word texts and array-likes of boxes, confidences and (optional) page and line ids."""
+        encoded = [t.encode('utf-8') for t in texts]
+        n = len(encoded)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        def ids(values):
+            if values is None or np.isscalar(values):
+                return np.full(n, -1 if values is None else values, dtype=np.int32)
+            return np.asarray(values, dtype=np.int32).reshape(n)
+
+        return cls(np.asarray(boxes, dtype=np.float32).reshape(n, 4),
+                   np.asarray(confidence, dtype=np.float32).reshape(n),
+                   ids(page), ids(line), offsets,
+                   np.frombuffer(b''.join(encoded), dtype=np.uint8).copy())
+
+    @classmethod
+    def from_words(cls, words: Sequence[OcrWord], page: Optional[int] = None) -> 'WordTable':
+        return cls.from_columns([w.text for w in words], [(w.x0, w.y0, w.x1, w.y1) for w in words],
+                                [w.confidence for w in words], [w.line for w in words], page)
+
+    @classmethod
+    def concat(cls, tables: Iterable['WordTable']) -> 'WordTable':
+        tables = list(tables)
+        if not tables:
+            return cls.from_columns([], [], [])
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for table in tables:
+            offsets.append(np.asarray(table.offsets[1:]) + base)
+            base += int(table.offsets[-1])
+        return cls(np.concatenate([t.boxes for t in tables]).astype(np.float32, copy=False),
+                   np.concatenate([t.confidence for t in tables]),
+                   np.concatenate([t.page for t in tables]),
+                   np.concatenate([t.line for t in tables]),
+                   np.concatenate(offsets),
+                   np.concatenate([t.text for t in tables]))
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    @property
+    def x0(self) -> np.ndarray:
+        return self.boxes[:, 0]
+
+    @property
+    def y0(self) -> np.ndarray:
+        return self.boxes[:, 1]
+
+    @property
+    def x1(self) -> np.ndarray:
+        return self.boxes[:, 2]
+
+    @property
+    def y1(self) -> np.ndarray:
+        return self.boxes[:, 3]
+
+    @property
+    def cx(self) -> np.ndarray:
+        return (self.boxes[:, 0] + self.boxes[:, 2]) / 2
+
+    @property
+    def cy(self) -> np.ndarray:
+        return (self.boxes[:, 1] + self.boxes[:, 3]) / 2
+
+    @property
+    def heights(self) -> np.ndarray:
+        return self.boxes[:, 3] - self.boxes[:, 1]
+
+    def char_lengths(self) -> np.ndarray:
+        """Number of characters per word (UTF-8 lead bytes, so umlauts count once)."""
+        lead = np.zeros(len(self.text) + 1, dtype=np.int64)
+        np.cumsum((np.asarray(self.text) & 0xC0) != 0x80, out=lead[1:])
+        return lead[self.offsets[1:]] - lead[self.offsets[:-1]]
+
+    def texts(self, indices: Optional[Sequence[int]] = None) -> List[str]:
+        """Decode the texts of all words, or of the given indices in that order."""
+        # memoryview: Ausschnitte ohne Kopie des ganzen Puffers, auch bei Memory-Maps
+        raw = memoryview(np.ascontiguousarray(self.text))
+        starts = np.asarray(self.offsets[:-1])
+        ends = np.asarray(self.offsets[1:])
+        if indices is not None:
+            starts, ends = starts[indices], ends[indices]
+        return [str(raw[a:b], 'utf-8') for a, b in zip(starts.tolist(), ends.tolist())]
+
+    def take(self, indices) -> 'WordTable':
+        """New table with the words at indices (in that order); the text buffer is gathered in one step."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = np.asarray(self.offsets[:-1])[indices]
+        lengths = np.asarray(self.offsets[1:])[indices] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Byte i des neuen Puffers stammt aus start(Wort) + (i - neuer Anfang(Wort))
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return WordTable(self.boxes[indices], self.confidence[indices], self.page[indices], self.line[indices],
+                         offsets, np.asarray(self.text)[positions])
+
+    def filter(self, mask: np.ndarray) -> 'WordTable':
+        return self.take(np.flatnonzero(mask))
+
+    def with_boxes(self, boxes: np.ndarray) -> 'WordTable':
+        """Same words with other boxes (e.g. moved into page coordinates); all other columns are shared."""
+        return WordTable(np.asarray(boxes, dtype=np.float32), self.confidence, self.page, self.line, self.offsets, self.text)
+
+    def argsort(self, *keys: np.ndarray) -> np.ndarray:
+        """Stable order by several keys, the first key being the primary one."""
+        return np.lexsort(tuple(reversed(keys)))
+
+    def groups(self, keys: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Word indices per distinct key (one key per word, e.g. self.line), in table order within a group."""
+        return split_by_key(keys)
+
+    def join_groups(self, keys: np.ndarray, order: Optional[np.ndarray] = None, sep: str = ' ') -> Dict[int, str]:
+        """
+        Join the texts per group key. keys holds one key per entry of order (default: all words in
+        table order); within a group the words keep their position in order.
+        """
+        order = np.arange(len(self)) if order is None else np.asarray(order)
+        texts = self.texts(order)
+        return {key: sep.join(texts[i] for i in positions.tolist()) for key, positions in split_by_key(keys)}
+
+    def to_words(self) -> List[OcrWord]:
+        """Back to OcrWord records, for backends and callers that expect the list form."""
+        return [OcrWord(text, float(b[0]), float(b[1]), float(b[2]), float(b[3]), float(c), int(l))
+                for text, b, c, l in zip(self.texts(), self.boxes.tolist(), self.confidence.tolist(), self.line.tolist())]
+
+    def save(self, directory: str):
+        """Write one .npy file per column; atomically via a temporary directory that is renamed into place."""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+        try:
+            for column in self.COLUMNS:
+                np.save(os.path.join(tmp_dir, f"{column}.npy"), np.ascontiguousarray(getattr(self, column)))
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'WordTable':
+        """Load a saved table; with mmap the columns are read-only memory maps of the files."""
+        mode = 'r' if mmap else None
+        return cls(*(np.load(os.path.join(directory, f"{column}.npy"), mmap_mode=mode) for column in cls.COLUMNS))
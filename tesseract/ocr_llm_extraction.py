@@ -8,26 +8,30 @@ import base64
 import csv
 from PIL import Image
 import pytesseract
-from pdf2image import convert_from_path
 import requests
 import time
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from instrumentation import configure_tracing, get_tracer
+from ocr_backends import TesseractBackend, create_backend
+from ocr_cascade import CascadeRecognizer
+from batch_cli import add_batch_arguments, parse_batch_args, claimed_inputs, output_path_for
+from page_source import DEFAULT_DPI, PAGE_EXTENSIONS, open_source
+from table_reconstruction import reconstruct_table
+from deadline_scheduler import CostModel, DeadlinePlan, deadline_in, llm_ladder, render_level
 
 # Logging-Konfiguration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Ollama API-Endpunkt
 OLLAMA_URL = "http://sonne.lan:8000"
-
-def get_user_input(prompt: str, default: str) -> str:
-    """Fordert den Benutzer zur Eingabe mit einem Standardwert auf."""
-    user_input = input(f"{prompt} [{default}]: ").strip()
-    return user_input if user_input else default
-
-def set_tesseract_language():
-    """Setzt die Sprache für Tesseract OCR."""
-    lang = get_user_input("Geben Sie die Sprache für Tesseract ein (z.B. 'deu' für Deutsch)", "deu")
-    pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'  # Pfad zu Tesseract anpassen, falls nötig
-    return lang
+# Spalten der Ausgabe-CSV
+FIELDNAMES = ["page", "title", "content", "tables"]
+# Neben der CSV: Seiten, die unter einer Deadline herabgestuft wurden (für den Nachlauf mit --refine)
+DEGRADED_SUFFIX = ".degraded.json"
 
 def perform_ocr(image: Image, lang: str) -> str:
     """Führt OCR auf einem Bild mit Tesseract durch."""
@@ -141,66 +145,205 @@ Beachte, dass alle Ausgaben auf Deutsch sein müssen. Bitte stelle sicher, dass
         logging.error(f"Fehler bei der Kommunikation mit der Ollama API für Seite {page_num}: {e}")
         return {"page": str(page_num), "content": ocr_text}
 
-def process_pdf(input_file: str, output_file: str, lang: str) -> bool:
-    """Verarbeitet eine einzelne PDF-Datei mit OCR und LLM-Verbesserung und speichert sie als CSV."""
+def llm_crop_reader(crop: np.ndarray) -> str:
+    """Liest einen einzelnen unsicheren Ausschnitt über das LLM (letzte Stufe der Kaskade)."""
+    temp_image_path = f"temp_crop_{os.getpid()}_{time.monotonic_ns()}.png"
+    Image.fromarray(crop).save(temp_image_path)
     try:
-        images = convert_from_path(input_file)
-        
-        csv_data = []
-        
-        for i, image in enumerate(images, start=1):
-            # OCR durchführen
-            ocr_text = perform_ocr(image, lang)
-            
-            # Bild temporär speichern
-            temp_image_path = f"temp_image_{i}.jpg"
-            image.save(temp_image_path)
-            
-            # Mit LLM verarbeiten
-            enhanced_content = process_with_llm(temp_image_path, ocr_text, i)
-            csv_data.append(enhanced_content)
-            
-            # Temporäres Bild entfernen
-            os.remove(temp_image_path)
-            
-            # Kleine Verzögerung, um den Server nicht zu überlasten
-            time.sleep(1)
-        
-        # In CSV-Datei schreiben
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=["page", "title", "content", "tables"])
+        response = send_image_to_llm(temp_image_path, "Gib ausschließlich den Text in diesem Bildausschnitt wieder, ohne Erklärung.")
+        return response.get('response', '').strip()
+    finally:
+        os.remove(temp_image_path)
+
+def process_page_words(image: Image, recognizer, page_num: int, mode: str = 'cascade') -> Dict[str, str]:
+    """
+    Seite ohne LLM-Anfrage als Tabelle: im Kaskadenmodus liest Tesseract die Seite und nur unsichere Wörter
+    gehen an die schwerere Engine bzw. das LLM; herabgestufte Seiten liest Tesseract allein.
+    """
+    tracer = get_tracer()
+    with tracer.span('ocr', items=1, page=page_num, mode=mode):
+        words = recognizer.recognize(np.array(image.convert('L')))
+    with tracer.span('structure', page=page_num) as span:
+        table = reconstruct_table(words)
+        span.items = len(table)
+    table_content = '\n'.join('\t'.join(row) for row in table)
+    return {
+        "page": str(page_num),
+        "title": "",
+        "content": table_content,
+        "tables": json.dumps([{"table_title": "", "table_content": table_content}], ensure_ascii=False)
+    }
+
+def process_page_llm(image: Image, lang: str, page_num: int) -> Dict[str, str]:
+    """Volle Qualität: Tesseract-Text und Seitenbild gehen zur Korrektur und Strukturierung an das LLM."""
+    tracer = get_tracer()
+    # OCR durchführen
+    with tracer.span('ocr', items=1, page=page_num):
+        ocr_text = perform_ocr(image, lang)
+
+    # Bild temporär speichern
+    temp_image_path = f"temp_image_{page_num}.jpg"
+    image.save(temp_image_path)
+
+    # Mit LLM verarbeiten
+    with tracer.span('llm', items=1, page=page_num):
+        enhanced_content = process_with_llm(temp_image_path, ocr_text, page_num)
+
+    # Temporäres Bild entfernen
+    os.remove(temp_image_path)
+    return enhanced_content
+
+def load_degraded(output_file: str) -> Dict[int, str]:
+    """Herabgestufte Seiten (Seitennummer -> Stufe) eines früheren Laufs mit Deadline."""
+    try:
+        with open(output_file + DEGRADED_SUFFIX, encoding='utf-8') as f:
+            return {int(page): level for page, level in json.load(f)['pages'].items()}
+    except FileNotFoundError:
+        return {}
+
+def save_degraded(output_file: str, input_file: str, degraded: Dict[int, str]):
+    path = output_file + DEGRADED_SUFFIX
+    if not degraded:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"input": input_file, "pages": {str(page): degraded[page] for page in sorted(degraded)}}, f, indent=2)
+
+def process_pdf(input_file: str, output_file: str, lang: str, cascade: CascadeRecognizer = None, dpi: int = DEFAULT_DPI,
+                deadline: float = None, pages: List[int] = None, costs: CostModel = None) -> bool:
+    """
+    Verarbeitet eine einzelne PDF-Datei (oder ein mehrseitiges TIFF bzw. Bild) mit OCR und LLM-Verbesserung
+    und speichert sie als CSV. Die Seiten werden einzeln gerastert bzw. dekodiert, wenn sie an der Reihe sind,
+    und jede Seite wird sofort geschrieben, sodass die CSV schon während der Verarbeitung lesbar ist.
+    Mit cascade wird statt einer LLM-Anfrage pro Seite nur bei unsicheren Wörtern nachgelesen.
+    PDF-Seiten werden mit dpi gerastert.
+
+    Mit deadline (Epochensekunden) wählt deadline_scheduler.py pro Seite die beste Stufe, die noch in die
+    Restzeit passt: LLM bzw. Kaskade, nur Tesseract mit Tabellenrekonstruktion, dasselbe mit niedrigerer DPI;
+    die Pause zwischen den LLM-Anfragen entfällt. Herabgestufte Seiten werden in <ausgabe>.degraded.json
+    vermerkt. Mit pages werden nur diese Seiten (wieder in voller Qualität) gelesen und in der vorhandenen
+    CSV ersetzt; costs sind die gemessenen Sekunden pro Seite und Stufe über alle Dateien.
+    """
+    tracer = get_tracer()
+    source = None
+    ladder = llm_ladder(dpi, cascade is not None)
+    costs = costs or CostModel()
+    try:
+        with tracer.span('rasterize', pdf=input_file) as span:
+            source = open_source(input_file, dpi)
+            span.items = len(source)
+
+        previous = {}
+        if pages and os.path.exists(output_file):
+            with open(output_file, newline='', encoding='utf-8') as f:
+                previous = {row['page']: row for row in csv.DictReader(f)}
+        selected = set(pages or range(1, len(source) + 1))
+        plan = DeadlinePlan(len(selected), deadline, ladder, costs)
+        fast = TesseractBackend(lang)
+
+        # Der Nachlauf schreibt in eine temporäre Datei, damit die bisherige CSV bis zum Ende vollständig bleibt
+        target = f"{output_file}.tmp" if pages else output_file
+        with open(target, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
-            writer.writerows(csv_data)
-        
+            for i in range(1, len(source) + 1):
+                if i not in selected:
+                    if str(i) in previous:
+                        writer.writerow(previous[str(i)])
+                    continue
+                level = plan.next_level()
+                start = time.perf_counter()
+                image = Image.fromarray(render_level(source, i - 1, level, 'RGB'))
+                if level.llm:
+                    row = process_page_llm(image, lang, i)
+                    if deadline is None:
+                        # Kleine Verzögerung, um den Server nicht zu überlasten
+                        time.sleep(1)
+                elif cascade is not None and level == ladder[0]:
+                    row = process_page_words(image, cascade, i)
+                else:
+                    row = process_page_words(image, fast, i, level.name)
+                plan.finish_page(i, level, time.perf_counter() - start)
+                with tracer.span('export', items=1, page=i):
+                    writer.writerow(row)
+                    # Teilergebnis sofort sichtbar machen
+                    f.flush()
+        if pages:
+            os.replace(target, output_file)
+
+        degraded = {page: level for page, level in load_degraded(output_file).items() if page not in selected} if pages else {}
+        degraded.update(plan.degraded)
+        save_degraded(output_file, input_file, degraded)
+        if deadline is not None:
+            logging.info(f"Deadline {'verfehlt' if plan.remaining() < 0 else 'eingehalten'}: {plan.summary()}")
         logging.info(f"Erfolgreich verarbeitet: {input_file}")
         return True
     except Exception as e:
         logging.error(f"Fehler bei der Verarbeitung von {input_file}: {e}")
         return False
+    finally:
+        if source is not None:
+            source.close()
 
 def main():
-    """Hauptfunktion zur Verarbeitung aller PDF-Dateien im Eingabeverzeichnis."""
-    input_dir = get_user_input("Geben Sie das Eingabeverzeichnis ein", "/home/aaron/Anuk_neu_zu_verarbeiten_08_08_24")
-    output_dir = get_user_input("Geben Sie das Ausgabeverzeichnis ein", "/home/aaron/Anuk_neu_hochladen_08_08_24")
-    tesseract_lang = set_tesseract_language()
+    """Hauptfunktion zur Verarbeitung aller PDF-Dateien der Eingabe (Verzeichnis oder Manifest, optional als Shard)."""
+    global OLLAMA_URL
+    parser = argparse.ArgumentParser(description="Extract tables from PDFs with Tesseract and an LLM (Ollama) into CSV files.")
+    add_batch_arguments(parser)
+    parser.add_argument("--lang", default="deu", help="Tesseract language (e.g. 'deu')")
+    parser.add_argument("--tesseract-cmd", default="/usr/bin/tesseract", help="Path to the tesseract binary")
+    parser.add_argument("--ollama-url", default=OLLAMA_URL, help="Ollama API endpoint")
+    parser.add_argument("--cascade", action="store_true", help="Cascade mode: Tesseract, weak words re-read by --heavy and the LLM")
+    parser.add_argument("--heavy", default="doctr", help="Backend for weak words in cascade mode")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="Render resolution of PDF pages")
+    parser.add_argument("--deadline", type=float,
+                        help="Latency budget per document in seconds; pages fall back to cheaper settings when time runs short")
+    parser.add_argument("--refine", action="store_true",
+                        help="Redo only the pages degraded by an earlier --deadline run (<output>.degraded.json) at full quality")
+    args = parse_batch_args(parser, engine='tesseract')
+    if args.refine and args.deadline:
+        parser.error("--refine redoes pages at full quality and cannot be combined with --deadline")
+
+    pytesseract.pytesseract.tesseract_cmd = args.tesseract_cmd
+    OLLAMA_URL = args.ollama_url
+    cascade = None
+    if args.cascade:
+        cascade = CascadeRecognizer(TesseractBackend(args.lang), create_backend(args.heavy), llm=llm_crop_reader)
+    # Zeitmessung pro Verarbeitungsschritt über OCR_TRACE_FILE / OCR_METRICS_FILE einschalten
+    tracer = configure_tracing()
+    # Gemessene Sekunden pro Seite und Stufe, über alle Dateien dieses Laufs
+    costs = CostModel()
 
     failed_files: List[str] = []
 
     # Stelle sicher, dass das Ausgabeverzeichnis existiert
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
 
-    # Verarbeite jede PDF-Datei im Eingabeverzeichnis
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.csv")
-            
-            logging.info(f"Verarbeite: {filename}")
-            
-            if not process_pdf(input_path, output_path, tesseract_lang):
-                failed_files.append(filename)
-            else:
-                logging.info(f"Erfolgreich verarbeitet und gespeichert: {output_path}")
+    # Verarbeite jede PDF-/TIFF-/Bilddatei dieses Shards, die kein anderer Knoten beansprucht hat
+    # Der Nachlauf betrifft gerade die Dateien mit .done-Markierung des ersten Durchgangs, daher eigene Locks
+    for input_path, claim in claimed_inputs(args, PAGE_EXTENSIONS, '.refine' if args.refine else ''):
+        filename = os.path.basename(input_path)
+        output_path = output_path_for(args, input_path, ".csv")
+
+        pages = None
+        if args.refine:
+            pages = sorted(load_degraded(output_path))
+            if not pages:
+                if claim is not None:
+                    claim.done()
+                continue
+
+        logging.info(f"Verarbeite: {filename}" + (f" (Seiten {pages})" if pages else ""))
+
+        if not process_pdf(input_path, output_path, args.lang, cascade, args.dpi, deadline_in(args.deadline), pages, costs):
+            failed_files.append(filename)
+            if claim is not None:
+                claim.release()
+        else:
+            logging.info(f"Erfolgreich verarbeitet und gespeichert: {output_path}")
+            if claim is not None:
+                claim.done()
 
     # Bericht über fehlgeschlagene Dateien
     if failed_files:
@@ -210,7 +353,10 @@ def main():
     else:
         logging.info("Alle Dateien wurden erfolgreich verarbeitet.")
 
-    logging.info(f"Verarbeitung abgeschlossen. Verarbeitete Dateien befinden sich in: {output_dir}")
+    if cascade is not None:
+        cascade.report()
+    tracer.close()
+    logging.info(f"Verarbeitung abgeschlossen. Verarbeitete Dateien befinden sich in: {args.output_dir}")
 
 if __name__ == "__main__":
     main()
@@ -3,9 +3,12 @@ import pytesseract
 import pandas as pd
 import re
 from PIL import Image
-import io
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+from adaptive_dpi import render_page_adaptive
+
 # Funktion zur Extraktion der Tabellen
 def extract_tables_from_image(image, lang='deu'):
     # OCR auf dem Bild anwenden
@@ -42,8 +45,9 @@ def process_pdf(pdf_path, output_md_path, lang='deu'):
     # Jede Seite der PDF durchlaufen
     for page_num in range(len(pdf_document)):
         page = pdf_document.load_page(page_num)
-        pix = page.get_pixmap()
-        img = Image.open(io.BytesIO(pix.tobytes()))
+        # Auflösung pro Seite aus einer Vorschau der Schriftgröße bestimmen statt fest 72 dpi
+        gray, dpi = render_page_adaptive(page, engine='tesseract')
+        img = Image.fromarray(gray)
 
         df = extract_tables_from_image(img, lang=lang)
         md_table = dataframe_to_markdown(df)